@@ -35,6 +35,60 @@ ALTER TABLE IF EXISTS public.documents
     OWNER to postgres;
 
 
+-- Counter incremented by each statement changing the documents table, read by the GUI to know whether its copy of the
+-- table is up to date
+CREATE TABLE public.documents_version
+(
+    "VERSION" bigint NOT NULL
+);
+
+INSERT INTO public.documents_version ("VERSION") VALUES (0);
+
+ALTER TABLE IF EXISTS public.documents_version
+    OWNER to postgres;
+
+CREATE FUNCTION public.increment_documents_version() RETURNS trigger
+    LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE public.documents_version SET "VERSION" = "VERSION" + 1;
+    RETURN NULL;
+END;
+$$;
+
+ALTER FUNCTION public.increment_documents_version()
+    OWNER TO postgres;
+
+CREATE TRIGGER documents_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.documents
+    FOR EACH STATEMENT EXECUTE FUNCTION public.increment_documents_version();
+
+
+CREATE TABLE public.ingestion_hashes
+(
+    "SOURCE" character varying(20) NOT NULL,
+    "ID" character varying(25) NOT NULL,
+    "HASH" bigint NOT NULL,
+    PRIMARY KEY ("SOURCE", "ID")
+);
+
+ALTER TABLE IF EXISTS public.ingestion_hashes
+    OWNER to postgres;
+
+
+CREATE TABLE public.ingestion_quarantine
+(
+    "SOURCE" character varying(20) NOT NULL,
+    "ID" character varying(25),
+    "REASONS" text NOT NULL,
+    "ROW_DATA" text NOT NULL,
+    "QUARANTINED_AT" timestamp without time zone NOT NULL
+);
+
+ALTER TABLE IF EXISTS public.ingestion_quarantine
+    OWNER to postgres;
+
+
 CREATE TABLE public.test
 (
     "ID" character varying(25) NOT NULL,
@@ -0,0 +1,173 @@
+import argparse
+import collections
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+import main
+from src import DatabaseManager, PipelineMetrics
+from src.pipeline_metrics import peak_memory
+from src.extract_formatting import read_and_format_extract
+from src.extract_history import find_historical_extracts
+
+# Number of extracts parsed ahead of the one being written, per worker process. The formatted extracts wait in memory
+# until they are written, so this bounds the memory used whatever the number of archived extracts
+prefetch_per_worker = 2
+
+
+def parse_in_order(extracts, workers):
+    """
+    Reads and formats the archived extracts in worker processes, a few at a time ahead of the one being written. The
+    results are yielded in the order of `extracts`, so that the database writes stay serialized and ordered. Each
+    extract is formatted as of its own date
+
+    :param extracts: (extract date, file path, extraction type) tuples, in the order in which they are written
+    :param workers: The number of worker processes, 1 to read and format the files in the main process
+
+    :return: generator: (extract date, file path, extraction type, formatted DataFrame, read report) tuples
+    """
+
+    if workers <= 1:
+        for extract in extracts:
+            yield *extract, *read_and_format_extract(extract[1], extract[2], main.cache_directory,
+                                                     main.cache_max_size, as_of=extract[0])
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        remaining = iter(extracts)
+        try:
+            while True:
+                # Keeps the workers busy with the next extracts while the current one is written
+                while len(pending) < workers * prefetch_per_worker:
+                    extract = next(remaining, None)
+                    if extract is None:
+                        break
+                    pending.append((extract, executor.submit(read_and_format_extract, extract[1], extract[2],
+                                                             main.cache_directory, main.cache_max_size,
+                                                             as_of=extract[0])))
+                if not pending:
+                    break
+
+                extract, future = pending.popleft()
+                yield *extract, *future.result()
+        finally:
+            # The extracts not started yet are dropped when the backfill stops early
+            for _, future in pending:
+                future.cancel()
+
+
+def backfill(workers, delta, since=None, until=None, dry_run=False):
+    """
+    Replays every archived Histo, Backlog and Navy extract into the documents table, by extract date, to rebuild the
+    database. Each extract is applied as a delta on the state left by the previous ones, and is formatted as of its
+    date: its new full_backlog_data rows, the 14-day window of its approved histo_perfo rows and their validation
+    stamp use the date of the extract. The backfill stops at the first extract which fails, so that the
+    later ones are not applied on an incomplete state, and can be restarted from it with `since`
+
+    :param workers: The number of worker processes parsing the extracts
+    :param delta: Whether only the rows new or changed since the previous extract of the same type are written
+    :param since: The first extract date to be replayed, or None
+    :param until: The last extract date to be replayed, or None
+    :param dry_run: Whether to only log the extracts in the order in which they would be replayed
+
+    :return: int: The number of extracts applied
+    """
+
+    start_time = time.time()
+
+    # Create a DatabaseManager instance
+    db_manager = DatabaseManager(main.db_name, main.db_user, main.db_password, main.db_host,
+                                 declared_schema=main.declared_schema, backend=main.db_backend,
+                                 log_format=main.log_format)
+
+    extracts = find_historical_extracts(main.folders_path, main.file_types, since, until)
+    db_manager.logger.info(f"{len(extracts)} archived extracts to replay"
+                           + (f", from {extracts[0][0]} to {extracts[-1][0]}" if extracts else ""))
+
+    if dry_run:
+        for extract_date, file_path, df_type in extracts:
+            db_manager.logger.info(f"{extract_date} {df_type} {file_path}")
+        return 0
+
+    # Wall time, CPU time, rows and peak memory of each stage
+    metrics = PipelineMetrics(prometheus_path=main.metrics_textfile)
+    applied = rows_read = rows_written = 0
+
+    # A backfill, a run or the watch service never write to the documents table at the same time
+    with db_manager.ingestion_lock() as acquired:
+        if not acquired:
+            db_manager.logger.error("Another ingestion is running, the archived extracts are not replayed")
+            return 0
+
+        parsed_extracts = parse_in_order(extracts, workers)
+        try:
+            for extract_date, file_path, df_type, df_formatted, read_report in parsed_extracts:
+                extract_start = time.time()
+                first_record = len(metrics.records)
+
+                # The read and format stages are measured where they ran, possibly in a worker process
+                for record in read_report['metrics']:
+                    metrics.record(record)
+
+                written = main.write_formatted_rows(db_manager, metrics, df_formatted, df_type, delta,
+                                                    extract_date=extract_date)
+                if not written:
+                    db_manager.logger.error(f"The {file_path} extract of {extract_date} failed, the backfill can be "
+                                            f"restarted with --since {extract_date}")
+                    break
+
+                # Rows written by this extract, all of them without delta
+                changed_rows = next((record['rows_out'] for record in metrics.records[first_record:]
+                                     if record['stage'] == 'detect_changes'), len(df_formatted))
+
+                applied += 1
+                rows_read += len(df_formatted)
+                rows_written += changed_rows
+                elapsed = time.time() - start_time
+                metrics.record({'stage': 'backfill_extract', 'source': df_type, 'extract_date': extract_date,
+                                'wall_seconds': round(time.time() - extract_start, 6),
+                                'rows_in': len(df_formatted), 'rows_out': changed_rows})
+
+                # Progress, throughput since the start, and remaining time at this pace
+                remaining_seconds = elapsed / applied * (len(extracts) - applied)
+                db_manager.logger.info(f"[{applied}/{len(extracts)}] {extract_date} {os.path.basename(file_path)}: "
+                                       f"{len(df_formatted)} rows read, {changed_rows} written - "
+                                       f"{rows_read / elapsed:.0f} rows/s, {applied / elapsed:.2f} extracts/s, "
+                                       f"~{remaining_seconds:.0f} s remaining")
+        except Exception as e:
+            # The extracts which were not reached are not applied
+            db_manager.logger.error(f"An error occurred while replaying the archived extracts: {e}")
+        finally:
+            parsed_extracts.close()
+
+    execution_time = time.time() - start_time
+    db_manager.logger.info(f"{applied} of {len(extracts)} archived extracts replayed in {execution_time:.1f} "
+                           f"secondes: {rows_read} rows read ({rows_read / execution_time:.0f} rows/s), "
+                           f"{rows_written} rows written ({rows_written / execution_time:.0f} rows/s)")
+
+    # Whole backfill, then the optional export for Prometheus
+    metrics.record({'stage': 'backfill', 'source': None, 'wall_seconds': round(execution_time, 6),
+                    'cpu_seconds': round(time.process_time(), 6), 'rows_in': rows_read, 'rows_out': rows_written,
+                    'peak_rss_bytes': peak_memory()})
+    metrics.write_prometheus()
+    db_manager.logger.info(f"Metrics of the backfill written to {metrics.metrics_path}")
+
+    return applied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replays every archived extract into the documents table, by "
+                                                 "extract date, to rebuild the database")
+    parser.add_argument("--workers", type=int, default=main.parse_workers,
+                        help="Number of worker processes parsing and formatting the extracts (1 to disable)")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="Rewrite every row of each extract instead of the new and changed rows only")
+    parser.add_argument("--since", type=date.fromisoformat,
+                        help="First extract date to replay (YYYY-MM-DD), to restart a backfill which stopped")
+    parser.add_argument("--until", type=date.fromisoformat, help="Last extract date to replay (YYYY-MM-DD)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only list the extracts in the order in which they would be replayed")
+    args = parser.parse_args()
+
+    backfill(args.workers, main.delta_ingestion and not args.full_refresh, args.since, args.until, args.dry_run)
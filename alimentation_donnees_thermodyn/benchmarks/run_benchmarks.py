@@ -0,0 +1,259 @@
+"""
+Benchmarks the stages of the pipeline on synthetic extracts, without the real files.
+
+Run from the alimentation_donnees_thermodyn directory:
+
+    python -m benchmarks.run_benchmarks --sizes 10000 100000 1000000
+    python -m benchmarks.run_benchmarks --sizes 10000 --no-database --update-baseline
+    python -m benchmarks.run_benchmarks --sizes 10000 100000 --backend sqlite
+
+The database stages run against a dedicated benchmark database (created if needed), whose documents and
+ingestion_hashes tables are emptied before each size. With the sqlite backend the database is a file of a temporary
+directory, so the benchmark needs no server. The timings are compared with the baseline file and the
+stages slower than the tolerance are flagged, the command then exits with the status 1.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import create_engine, text, MetaData
+from benchmarks.synthetic_extracts import generate_extract, write_extract
+from src import DatabaseManager, DocumentsSchema
+from src.db_manager_class import ingestion_hashes_table
+from src.documents_schema import create_table_path
+from src.extract_formatting import format_extract
+from src.extract_reader import read_extract
+from src.pipeline_metrics import measure
+pd.options.mode.copy_on_write = True
+
+# Benchmark database, never the production one since its tables are emptied
+benchmark_db_name = "cellule_doc_benchmark"
+db_user = "user_connection"
+db_password = "thermodyn"
+db_host = "localhost"
+
+benchmarks_directory = os.path.dirname(os.path.abspath(__file__))
+baseline_path = os.path.join(benchmarks_directory, "baseline.json")
+results_directory = os.path.join(benchmarks_directory, "results")
+
+# Extraction types, in the order in which main.py writes them
+sources = ['histo_perfo', 'full_backlog_data', 'navy_check']
+
+
+def prepare_database(dbname, backend="postgresql"):
+    """
+    Creates the benchmark database and its documents and ingestion_hashes tables if they don't exist, then empties
+    the tables
+
+    :param dbname: The name of the benchmark database, or the path of the SQLite database file
+    :param backend: The database backend, 'postgresql' or 'sqlite'
+    """
+
+    if backend == "sqlite":
+        # Same tables as the production database, declared from the SQL script
+        engine = create_engine(f"sqlite:///{dbname}")
+        metadata = MetaData()
+        documents_table = DocumentsSchema().to_table(metadata)
+        with engine.begin() as connection:
+            metadata.create_all(connection)
+            ingestion_hashes_table.create(connection, checkfirst=True)
+            connection.execute(documents_table.delete())
+            connection.execute(ingestion_hashes_table.delete())
+        engine.dispose()
+        return
+
+    server_engine = create_engine(f"postgresql+psycopg://{db_user}:{db_password}@{db_host}/postgres",
+                                  isolation_level="AUTOCOMMIT")
+    with server_engine.connect() as connection:
+        if not connection.execute(text("SELECT 1 FROM pg_database WHERE datname = :name"), {'name': dbname}).scalar():
+            connection.execute(text(f'CREATE DATABASE "{dbname}"'))
+    server_engine.dispose()
+
+    # Same tables as the production database, taken from the SQL script
+    with open(create_table_path, encoding='utf-8') as sql_file:
+        statements = re.findall(r'CREATE TABLE public\.(?:documents|ingestion_hashes)\s*\(.*?\n\);', sql_file.read(),
+                                re.DOTALL)
+
+    engine = create_engine(f"postgresql+psycopg://{db_user}:{db_password}@{db_host}/{dbname}")
+    with engine.begin() as connection:
+        for statement in statements:
+            connection.execute(text(statement.replace('CREATE TABLE', 'CREATE TABLE IF NOT EXISTS', 1)))
+        connection.execute(text('TRUNCATE public.documents, public.ingestion_hashes'))
+    engine.dispose()
+
+
+def run_size(rows, excel_max_rows, db_manager, working_directory):
+    """
+    Runs every stage of the pipeline on synthetic extracts of a given size
+
+    :param rows: The number of rows of each extract
+    :param excel_max_rows: Above this size the extracts are not written to Excel, the read stage is then skipped
+    :param db_manager: The DatabaseManager of the benchmark database, or None to skip the database stages
+    :param working_directory: The directory of the generated Excel files
+
+    :return: list: The records of the stages, as built by `measure`
+    """
+
+    records = []
+
+    for df_type in sources:
+        df_extract = generate_extract(df_type, rows)
+
+        # Writing a large Excel file takes far longer than the pipeline itself, so it is limited in size
+        if rows <= excel_max_rows:
+            file_path = os.path.join(working_directory, f'{df_type}_{rows}.xlsx')
+            write_extract(df_extract, file_path)
+            with measure("read_extract", df_type) as record:
+                df_extract, _ = read_extract(file_path, df_type)
+                record['rows_out'] = len(df_extract)
+            records.append(record)
+
+        with measure("format_extract", df_type, rows_in=len(df_extract)) as record:
+            df_formatted = format_extract(df_extract, df_type)
+            record['rows_out'] = len(df_formatted)
+        records.append(record)
+
+        if db_manager is None:
+            continue
+
+        # Same sequence of DatabaseManager calls as main.py
+        if df_type == "full_backlog_data":
+            with measure("date_new_backlog_rows", df_type, rows_in=len(df_formatted)) as record:
+                df_formatted = db_manager.date_new_backlog_rows(df_formatted, id_lookup="server")
+            records.append(record)
+
+        with measure("validate_rows", df_type, rows_in=len(df_formatted)) as record:
+            df_formatted = db_manager.validate_rows(df_formatted, df_type)
+            record['rows_out'] = len(df_formatted)
+        records.append(record)
+
+        with measure("detect_changes", df_type, rows_in=len(df_formatted)) as record:
+            df_formatted, row_hashes, _ = db_manager.detect_changes(df_formatted, df_type)
+            record['rows_out'] = len(df_formatted)
+        records.append(record)
+
+        with measure("concatenated_dataframes", df_type, rows_in=len(df_formatted)) as record:
+            inserted = db_manager.concatenated_dataframes(df_formatted, "documents", loader="copy",
+                                                          id_lookup="server")
+            record['status'] = 'ok' if inserted else 'error'
+        records.append(record)
+
+        with measure("update_database_from_dataframe", df_type, rows_in=len(df_formatted)) as record:
+            updated = db_manager.update_database_from_dataframe(df_formatted, "documents", mode="bulk")
+            record['status'] = 'ok' if updated else 'error'
+        records.append(record)
+
+        with measure("store_row_hashes", df_type, rows_in=len(row_hashes)) as record:
+            db_manager.store_row_hashes(row_hashes, df_type)
+        records.append(record)
+
+    return records
+
+
+def compare_with_baseline(results, baseline, tolerance, min_seconds):
+    """
+    Compares the wall time of each stage with the baseline
+
+    :param results: The wall times of the run, by size then by 'source.stage'
+    :param baseline: The wall times of the baseline, in the same layout
+    :param tolerance: The relative slowdown above which a stage is flagged, 0.25 for 25 %
+    :param min_seconds: The absolute slowdown below which a stage is never flagged, to ignore the noise of short stages
+
+    :return: list: (size, stage, baseline seconds, seconds) tuples of the regressions
+    """
+
+    regressions = []
+
+    for size, stages in results.items():
+        for stage, seconds in stages.items():
+            reference = baseline.get(size, {}).get(stage)
+            if reference is None:
+                continue
+            if seconds > reference * (1 + tolerance) and seconds - reference > min_seconds:
+                regressions.append((size, stage, reference, seconds))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the pipeline stages on synthetic extracts")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000],
+                        help="Number of rows of each generated extract")
+    parser.add_argument("--excel-max-rows", type=int, default=100000,
+                        help="Largest size written to Excel to benchmark the read stage")
+    parser.add_argument("--backend", choices=["postgresql", "sqlite"], default="postgresql",
+                        help="Database backend of the database stages")
+    parser.add_argument("--dbname", default=None,
+                        help=f"Benchmark database, emptied before each size ({benchmark_db_name} by default, a "
+                             f"temporary file with the sqlite backend)")
+    parser.add_argument("--no-database", action="store_true", help="Only benchmark the read and format stages")
+    parser.add_argument("--baseline", default=baseline_path, help="Baseline file the timings are compared with")
+    parser.add_argument("--update-baseline", action="store_true", help="Save the timings of this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Relative slowdown flagged as a regression")
+    parser.add_argument("--min-seconds", type=float, default=0.05,
+                        help="Absolute slowdown below which a stage is never flagged")
+    args = parser.parse_args()
+
+    if not args.no_database and args.backend == "postgresql" and args.dbname == "cellule_doc":
+        parser.error("the benchmark empties its tables, it cannot run on the production database")
+
+    all_records = {}
+    results = {}
+
+    with tempfile.TemporaryDirectory() as working_directory:
+        dbname = args.dbname
+        if dbname is None:
+            dbname = os.path.join(working_directory, "benchmark.sqlite3") if args.backend == "sqlite" \
+                else benchmark_db_name
+
+        for rows in args.sizes:
+            db_manager = None
+            if not args.no_database:
+                prepare_database(dbname, args.backend)
+                db_manager = DatabaseManager(dbname, db_user, db_password, db_host, declared_schema=True,
+                                             backend=args.backend)
+
+            records = run_size(rows, args.excel_max_rows, db_manager, working_directory)
+            all_records[str(rows)] = records
+            results[str(rows)] = {f"{record['source']}.{record['stage']}": record['wall_seconds']
+                                  for record in records}
+
+            if db_manager is not None:
+                db_manager.engine.dispose()
+
+            for record in records:
+                print(f"{rows:>9} {record['source']:<18} {record['stage']:<31} {record['wall_seconds']:>9.3f} s "
+                      f"{record['cpu_seconds']:>9.3f} s CPU {record['status']}")
+
+    # Every run is kept with the full records, the baseline only holds the wall times
+    os.makedirs(results_directory, exist_ok=True)
+    results_path = os.path.join(results_directory, f"results_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+    with open(results_path, 'w', encoding='utf-8') as results_file:
+        json.dump(all_records, results_file, indent=2, default=str)
+    print(f"Results written to {results_path}")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+
+    regressions = compare_with_baseline(results, baseline, args.tolerance, args.min_seconds)
+    for size, stage, reference, seconds in regressions:
+        print(f"REGRESSION {size} rows {stage}: {seconds:.3f} s instead of {reference:.3f} s")
+
+    if args.update_baseline:
+        # The sizes which were not run keep their previous baseline
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+
+    return 1 if regressions and not args.update_baseline else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+from src.lists_initialisation import (histo_perfo_column_to_delete, histo_perfo_column_for_ID,
+                                      full_backlog_data_column_to_delete, full_backlog_data_column_for_ID,
+                                      navy_check_column_to_delete, navy_check_column_for_ID)
+
+# Lines per purchase order, the ID of a row is derived from its position so that the sources share rows
+lines_per_order = 40
+
+# Position of the first row of each source, so that Backlog and Navy update part of the Histo rows
+source_offsets = {'histo_perfo': 0.0, 'full_backlog_data': 0.3, 'navy_check': 0.6}
+
+# Supplier names and descriptions drawn for the text columns
+vendors = np.array([f'{name} {code}' for name, code in zip(
+    ['CORREGE', 'H ZOBEL SAS', 'SOFRAGRAF', 'NAVAL GROUP', 'ATLANTIQUE METAL', 'BRETAGNE USINAGE', 'ACIERIES DU NORD',
+     'ELECTRO OUEST'], range(916115, 916123))])
+words = np.array(['VALVE', 'PUMP', 'FLANGE', 'GASKET', 'SENSOR', 'CABLE', 'MOTOR', 'BEARING', 'PIPE', 'BOLT', 'DN50',
+                  'INOX', '316L', 'ASSEMBLY', 'KIT'])
+
+
+def order_keys(start, rows):
+    """
+    Builds the purchase order, line, release and project of consecutive row positions, the same position giving the
+    same key in every source
+
+    :param start: The position of the first row
+    :param rows: The number of rows
+    :return: tuple: The purchase order, line, release and project arrays
+    """
+
+    position = np.arange(start, start + rows)
+    order = position // lines_per_order
+    purchase_order = 400000000 + order
+    line = position % lines_per_order + 1
+    release = (order * 7) % 999 + 1
+    project = np.char.add('SMP', np.char.zfill((order % 10000).astype(str), 4))
+
+    return purchase_order, line, release, project
+
+
+def random_dates(rng, rows, start, days, missing=0.0):
+    """
+    Draws dates in the `days` days following `start`, with a share of missing dates
+
+    :param rng: The random generator
+    :param rows: The number of dates
+    :param start: The first possible date
+    :param days: The number of possible days
+    :param missing: The share of missing dates
+    :return: pandas.Series: The dates
+    """
+
+    dates = pd.Series(pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, rows), unit='D'))
+    return dates.mask(rng.random(rows) < missing)
+
+
+def descriptions(rng, rows):
+    """
+    Draws line descriptions of three words
+
+    :param rng: The random generator
+    :param rows: The number of descriptions
+    :return: numpy.ndarray: The descriptions
+    """
+
+    return np.char.add(np.char.add(rng.choice(words, rows), ' '),
+                       np.char.add(np.char.add(rng.choice(words, rows), ' '), rng.choice(words, rows)))
+
+
+def filler_columns(df, columns, rng):
+    """
+    Adds the columns dropped by the formatting, filled with short texts, since they are still part of the files
+
+    :param df: The DataFrame of the extract
+    :param columns: The names of the columns to be added
+    :param rng: The random generator
+    :return: pandas.DataFrame: The DataFrame with the columns added
+    """
+
+    fillers = np.array(['N/A', 'OK', 'CLOSED', 'OPEN', 'SEE COMMENTS', '0', '1'])
+    return df.assign(**{column: rng.choice(fillers, len(df)) for column in columns})
+
+
+def generate_extract(df_type, rows, seed=0):
+    """
+    Generates an extract with the columns of the real files, those kept by the formatting followed by those listed
+    to be deleted in `lists_initialisation.py`
+
+    :param df_type: The extraction type: 'histo_perfo', 'full_backlog_data' or 'navy_check'
+    :param rows: The number of rows
+    :param seed: The seed of the random generator, the same seed giving the same extract
+    :return: pandas.DataFrame: The extract as it would be read from the Excel file
+    """
+
+    rng = np.random.default_rng([seed, list(source_offsets).index(df_type)])
+    purchase_order, line, release, project = order_keys(int(rows * source_offsets[df_type]), rows)
+    today = pd.Timestamp.now().normalize()
+
+    match df_type:
+        case "histo_perfo":
+            # A third of the lines are approved, partly within the last 14 days kept by the formatting
+            df = pd.DataFrame(dict(zip(histo_perfo_column_for_ID, [purchase_order, line, release, project])))
+            df['CURR_PO_SUPPLIER'] = rng.choice(vendors, rows)
+            df['PO_LINE_DESCRIPTION'] = descriptions(rng, rows)
+            df['FIRST_MAT_DELIVERY_DATE'] = random_dates(rng, rows, today - pd.Timedelta(days=730), 700, 0.1)
+            df['FIRST_ISP'] = random_dates(rng, rows, today - pd.Timedelta(days=730), 700, 0.5)
+            df['CURRENT_STATUS'] = pd.Series(rng.choice(['In Approval', 'APPROVED', 'REJECTED', ''], rows,
+                                                        p=[0.4, 0.35, 0.15, 0.1])).replace('', None)
+            df['LAST_EDM_MANAGEMENT_DATE'] = random_dates(rng, rows, today - pd.Timedelta(days=30), 30)
+            return filler_columns(df, histo_perfo_column_to_delete, rng)
+
+        case "full_backlog_data":
+            # Lines without material reception are filtered out by the formatting
+            df = pd.DataFrame(dict(zip(full_backlog_data_column_for_ID, [purchase_order, line, release, project])))
+            df['VENDOR_NAME'] = rng.choice(vendors, rows)
+            df['ACTUAL_MAT_DELIVERY_DATE'] = random_dates(rng, rows, today - pd.Timedelta(days=365), 365, 0.2)
+            return filler_columns(df, full_backlog_data_column_to_delete, rng)
+
+        case "navy_check":
+            # The receiving date is written as a dd/mm/yyyy text in the real files
+            df = pd.DataFrame(dict(zip(navy_check_column_for_ID, [purchase_order, line, release, project])))
+            df['CURR_VENDOR_NAME'] = rng.choice(vendors, rows)
+            df['MAX_RECEIVING_DATE'] = random_dates(rng, rows, today - pd.Timedelta(days=365), 365).dt.strftime(
+                '%d/%m/%Y')
+            df['FIRST_PO_APPROVED_DATE'] = random_dates(rng, rows, today - pd.Timedelta(days=900), 500, 0.1)
+            df['PO_REL_LINE_FIRST_APPRO_DATE'] = random_dates(rng, rows, today - pd.Timedelta(days=900), 500, 0.1)
+            return filler_columns(df, navy_check_column_to_delete, rng)
+
+    raise ValueError(f"Unknown extraction type {df_type}")
+
+
+def write_extract(df, file_path):
+    """
+    Writes a generated extract as an Excel file, like the files exported by the ERP
+
+    :param df: The generated extract
+    :param file_path: The path of the Excel file
+    """
+
+    df.to_excel(file_path, index=False)
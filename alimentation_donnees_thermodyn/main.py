@@ -1,16 +1,41 @@
+import argparse
+import itertools
 import pandas as pd
 import time
 import os
-from src import DatabaseManager
+from concurrent.futures import ProcessPoolExecutor
+from src import DatabaseManager, PipelineMetrics
+from src.pipeline_metrics import peak_memory
+from src.extract_formatting import read_and_format_extract
+from src.chunked_ingestion import iter_formatted_chunks
+from src.run_checkpoint import RunCheckpoint
 pd.options.mode.copy_on_write = True
 
-# Database parameters
+# Database parameters, with 'sqlite' as backend db_name is the path of an embedded database file
+db_backend = "postgresql"
 db_name = "cellule_doc"
 db_user = "user_connection"
 db_password = "thermodyn"
 db_host = "localhost"
 
-start_time = time.time()
+# The documents table is declared from SQL/create_table.sql instead of being reflected at each run
+declared_schema = True
+
+# Number of rows staged and applied at once by the bulk update
+update_batch_size = 10000
+
+# Cache of the parsed extracts, so that a rerun on the same files does not parse them again
+cache_directory = "./cache"
+cache_max_size = 2 * 1024 ** 3
+
+# Number of worker processes parsing and formatting the extracts, 1 to run everything in the main process
+parse_workers = 3
+
+# Number of rows read, formatted and written at once for very large extracts, None to load each file at once
+chunk_size = None
+
+# Only the new and changed rows are written when True, every row of the extracts is rewritten when False
+delta_ingestion = True
 
 # Specify the path to the directory containing the files to be checked
 folders_path = {
@@ -19,52 +44,325 @@ folders_path = {
     'Navy': '/Users/edouardvieillard/Agap2/THERMODYN/Extracts/',
 }
 
-# Initialiser la liste pour suivre les chemins complets des fichiers les plus récents
-most_recent_files = []
+# Extraction type of the files of each key, in the order in which they are written to the database
+file_types = {
+    'Histo': 'histo_perfo',
+    'Backlog': 'full_backlog_data',
+    'Navy': 'navy_check',
+}
+
+table_name = "documents"
 
-# Parcourir chaque dossier et chaque clé
-for key, folder in folders_path.items():
-    most_recent_file = None
-    most_recent_time = None
+# Output of each completed stage of a run, so that a failed run can be resumed with --resume, None to disable
+checkpoint_directory = "./checkpoints"
 
-    # Assurer que le dossier existe et contient des fichiers
-    if os.path.exists(folder):
-        for nom_fichier in os.listdir(folder):
-            if key in nom_fichier:  # Vérifier si la clé est dans le nom du fichier
-                file_path = os.path.join(folder, nom_fichier)
-                modification_time = os.path.getmtime(file_path)
+# Textfile exported for the node_exporter textfile collector, None to only write the JSON-lines metrics in logs/METRICS
+metrics_textfile = None
 
-                if most_recent_file is None or modification_time > most_recent_time:
-                    most_recent_file = file_path
-                    most_recent_time = modification_time
+# Format of the INFO and ERROR log files, 'text' or 'json' for one JSON object per line
+log_format = "text"
 
-    # Ajouter le chemin du fichier le plus récent à la liste
-    if most_recent_file:
-        most_recent_files.append(most_recent_file)
 
+def find_most_recent_files():
+    """
+    Finds the most recent file of each key of `folders_path`
 
-# Create a DatabaseManager instance
-db_manager = DatabaseManager(db_name, db_user, db_password, db_host)
-table_name = "documents"
+    :return: list: (file path, extraction type) tuples, in the order of `folders_path`
+    """
+
+    # Initialiser la liste pour suivre les chemins complets des fichiers les plus récents
+    most_recent_files = []
+
+    # Parcourir chaque dossier et chaque clé
+    for key, folder in folders_path.items():
+        most_recent_file = None
+        most_recent_time = None
+
+        # Assurer que le dossier existe et contient des fichiers
+        if os.path.exists(folder):
+            for nom_fichier in os.listdir(folder):
+                if key in nom_fichier:  # Vérifier si la clé est dans le nom du fichier
+                    file_path = os.path.join(folder, nom_fichier)
+                    modification_time = os.path.getmtime(file_path)
+
+                    if most_recent_file is None or modification_time > most_recent_time:
+                        most_recent_file = file_path
+                        most_recent_time = modification_time
+
+        # Ajouter le chemin du fichier le plus récent à la liste
+        if most_recent_file:
+            most_recent_files.append((most_recent_file, file_types[key]))
+
+    return most_recent_files
+
+
+def parse_and_format_files(files, workers):
+    """
+    Reads and formats the extracts, in worker processes when more than one worker is requested. The results are
+    yielded in the order of `files`, as soon as each one is ready, so that the database writes stay serialized
+
+    :param files: (file path, extraction type) tuples
+    :param workers: The number of worker processes, 1 to read and format the files in the main process
+
+    :return: generator: (file path, extraction type, formatted DataFrame, read report) tuples
+    """
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Every file is submitted at once so that all the sources are parsed at the same time
+            futures = [(file_path, df_type, executor.submit(read_and_format_extract, file_path, df_type,
+                                                            cache_directory, cache_max_size))
+                       for file_path, df_type in files]
+
+            for file_path, df_type, future in futures:
+                yield file_path, df_type, *future.result()
+    else:
+        for file_path, df_type in files:
+            yield file_path, df_type, *read_and_format_extract(file_path, df_type, cache_directory, cache_max_size)
+
+
+def write_formatted_rows(db_manager, metrics, df_formatted, df_type, delta, whole_extract=True, checkpoint=None,
+                         stage_key=None, extract_date=None):
+    """
+    Writes formatted rows to the documents table: the new full_backlog_data rows are dated, the rows are coerced to
+    the types of the table and the invalid ones quarantined, then the others are inserted or updated, only the new
+    and changed ones in delta mode. With a checkpoint, each completed stage is recorded and skipped when the run is
+    resumed
+
+    :param db_manager: The DatabaseManager of the database
+    :param metrics: The PipelineMetrics of the run
+    :param df_formatted: The formatted rows, of a whole extract or of a chunk of it
+    :param df_type: The extraction type of the rows
+    :param delta: Whether only the new and changed rows are written
+    :param whole_extract: False when the rows are a chunk of the extract, the vanished rows are then not counted
+    :param checkpoint: The RunCheckpoint of the run, or None
+    :param stage_key: The prefix of the checkpoint keys of these rows, the extraction type by default
+    :param extract_date: The date given to the new full_backlog_data rows, the current date by default
+
+    :return: bool: True if the rows have been inserted and updated, False if an error occurred
+    """
+
+    stage_key = stage_key or df_type
+    row_hashes = None
+
+    if checkpoint is not None and checkpoint.is_completed(f"{stage_key}.prepared"):
+        # The rows to be written were already dated and compared with the previous ingestion
+        frames, _ = checkpoint.load(f"{stage_key}.prepared")
+        df_formatted, row_hashes = frames['rows'], frames.get('hashes')
+        db_manager.logger.info(f"Rows to be written for {stage_key} loaded from the checkpoint")
+    else:
+        # The new full_backlog_data rows are dated once the previous files have been written to the database
+        if df_type == "full_backlog_data":
+            with metrics.stage("date_new_backlog_rows", df_type, rows_in=len(df_formatted)) as stage:
+                df_formatted = db_manager.date_new_backlog_rows(df_formatted, id_lookup="server",
+                                                                as_of=extract_date)
+                stage['rows_out'] = len(df_formatted)
+
+        # Converted once to the column types of the documents table, for the hashes, the inserts and the updates. The
+        # invalid rows are quarantined, so that the valid ones are written in one pass
+        with metrics.stage("validate_rows", df_type, rows_in=len(df_formatted)) as stage:
+            df_formatted = db_manager.validate_rows(df_formatted, df_type)
+            stage['rows_out'] = len(df_formatted)
+
+        # Keeps only the rows which are new or changed since the previous ingestion of this source
+        if delta:
+            with metrics.stage("detect_changes", df_type, rows_in=len(df_formatted)) as stage:
+                df_formatted, row_hashes, _ = db_manager.detect_changes(df_formatted, df_type,
+                                                                        count_vanished=whole_extract)
+                stage['rows_out'] = len(df_formatted)
+
+        if checkpoint is not None:
+            checkpoint.complete(f"{stage_key}.prepared", frames={'rows': df_formatted, **(
+                {'hashes': row_hashes} if row_hashes is not None else {})})
+
+    inserted = checkpoint is not None and checkpoint.is_completed(f"{stage_key}.inserted")
+    if not inserted:
+        with metrics.stage("concatenated_dataframes", df_type, rows_in=len(df_formatted)) as stage:
+            inserted = db_manager.concatenated_dataframes(df_formatted, table_name, loader="copy",
+                                                          id_lookup="server")
+            stage['status'] = 'ok' if inserted else 'error'
+        if inserted and checkpoint is not None:
+            checkpoint.complete(f"{stage_key}.inserted")
+
+    updated = checkpoint is not None and checkpoint.is_completed(f"{stage_key}.updated")
+    if not updated:
+        # The applied batches are tracked per batch size, since the batches of another size hold other rows
+        batch_tracker = None if checkpoint is None else checkpoint.batches(f"{stage_key}.update.{update_batch_size}")
+        with metrics.stage("update_database_from_dataframe", df_type, rows_in=len(df_formatted)) as stage:
+            updated = db_manager.update_database_from_dataframe(df_formatted, table_name, mode="bulk",
+                                                                batch_size=update_batch_size,
+                                                                batch_tracker=batch_tracker)
+            stage['status'] = 'ok' if updated else 'error'
+        if updated and checkpoint is not None:
+            checkpoint.complete(f"{stage_key}.updated")
+
+    # The hashes are only stored once the rows are written, so that failed rows are sent again next time
+    if delta and inserted and updated and not (checkpoint is not None and
+                                               checkpoint.is_completed(f"{stage_key}.hashes_stored")):
+        with metrics.stage("store_row_hashes", df_type, rows_in=len(row_hashes)) as stage:
+            db_manager.store_row_hashes(row_hashes, df_type)
+            stage['rows_out'] = len(row_hashes)
+        if checkpoint is not None:
+            checkpoint.complete(f"{stage_key}.hashes_stored")
+
+    if inserted and updated and checkpoint is not None:
+        checkpoint.complete(f"{stage_key}.written")
+
+    return inserted and updated
+
+
+def ingest_files(db_manager, metrics, files, workers, delta, chunk_rows=None, checkpoint=None):
+    """
+    Reads, formats and writes extracts to the documents table, in the order of `files`. With a checkpoint, the files
+    and chunks already written by a previous attempt of the run are skipped, and the formatted files are loaded from
+    the checkpoint instead of being parsed again
+
+    :param db_manager: The DatabaseManager of the database
+    :param metrics: The PipelineMetrics of the run
+    :param files: (file path, extraction type) tuples, in the order in which they are written
+    :param workers: The number of worker processes parsing the files, when they are not read by chunks
+    :param delta: Whether only the new and changed rows are written
+    :param chunk_rows: The number of rows read at once, or None to load each file at once
+    :param checkpoint: The RunCheckpoint of the run, or None
+
+    :return: dict: Whether each file path has been written without error
+    """
+
+    def completed(stage_key):
+        return checkpoint is not None and checkpoint.is_completed(stage_key)
+
+    results = {file_path: completed(f"{df_type}.written") for file_path, df_type in files}
+    pending_files = [(file_path, df_type) for file_path, df_type in files if not results[file_path]]
+
+    try:
+        if chunk_rows:
+            # Each file is streamed by chunks of rows, so the memory used does not depend on its size
+            for extraction_file_path, df_type in pending_files:
+                db_manager.logger.info(f"Loading file {extraction_file_path} by chunks of {chunk_rows} rows")
+
+                written = True
+                chunks = iter_formatted_chunks(extraction_file_path, df_type, chunk_rows)
+                for chunk_number in itertools.count(1):
+                    with metrics.stage("read_and_format_chunk", df_type) as stage:
+                        df_formatted, stage['rows_in'] = next(chunks, (None, None))
+                        stage['rows_out'] = None if df_formatted is None else len(df_formatted)
+                    if df_formatted is None:
+                        break
+
+                    # The chunks written by a previous attempt are read again but not written
+                    chunk_key = f"{df_type}.chunk{chunk_number}"
+                    if not completed(f"{chunk_key}.written"):
+                        written &= write_formatted_rows(db_manager, metrics, df_formatted, df_type, delta,
+                                                        whole_extract=False, checkpoint=checkpoint,
+                                                        stage_key=chunk_key)
+
+                results[extraction_file_path] = written
+                if written and checkpoint is not None:
+                    checkpoint.complete(f"{df_type}.written")
+                db_manager.logger.info(f"The {extraction_file_path} file loaded")
+        else:
+            # Only the files without a formatted checkpoint are parsed
+            parsed_files = parse_and_format_files([(file_path, df_type) for file_path, df_type in pending_files
+                                                   if not completed(f"{df_type}.formatted")
+                                                   and not completed(f"{df_type}.prepared")], workers)
+
+            for extraction_file_path, df_type in pending_files:
+                if completed(f"{df_type}.prepared"):
+                    # The rows to be written are loaded from the checkpoint by `write_formatted_rows`
+                    df_formatted = None
+                elif completed(f"{df_type}.formatted"):
+                    frames, _ = checkpoint.load(f"{df_type}.formatted")
+                    df_formatted = frames['rows']
+                    db_manager.logger.info(f"The {extraction_file_path} file loaded from the checkpoint")
+                else:
+                    _, _, df_formatted, read_report = next(parsed_files)
+                    db_manager.logger.info(f"Loading file {extraction_file_path}"
+                                           f"{' from the cache' if read_report['cache_hit'] else ''}")
+                    db_manager.logger.info(f"{read_report['columns_read']} columns read, "
+                                           f"{read_report['columns_skipped']} columns skipped "
+                                           f"(~{read_report['estimated_bytes_skipped']} bytes) for {df_type}")
+
+                    # The read and format stages are measured where they ran, possibly in a worker process
+                    for record in read_report['metrics']:
+                        metrics.record(record)
+                    db_manager.logger.info(f"The {extraction_file_path} file formatted")
+
+                    if checkpoint is not None:
+                        checkpoint.complete(f"{df_type}.formatted", frames={'rows': df_formatted})
+
+                results[extraction_file_path] = write_formatted_rows(db_manager, metrics, df_formatted, df_type,
+                                                                     delta, checkpoint=checkpoint)
+    except Exception as e:
+        # The files which were not reached are reported as not written
+        db_manager.logger.error(f"An error occurred while ingesting the extracts: {e}")
+
+    return results
+
+
+def main(workers, delta, chunk_rows=None, resume=None):
+    start_time = time.time()
+
+    # Create a DatabaseManager instance
+    db_manager = DatabaseManager(db_name, db_user, db_password, db_host, declared_schema=declared_schema,
+                                 backend=db_backend, log_format=log_format)
+
+    # Wall time, CPU time, rows and peak memory of each stage
+    metrics = PipelineMetrics(prometheus_path=metrics_textfile)
 
-file_type = ['histo_perfo', 'full_backlog_data', 'navy_check']
+    if resume:
+        # A resumed run keeps the files and the settings of its first attempt
+        run_id = RunCheckpoint.latest_unfinished_run(checkpoint_directory) if resume == "latest" else resume
+        if run_id is None:
+            db_manager.logger.error("There is no unfinished run to resume")
+            return
+        checkpoint = RunCheckpoint(checkpoint_directory, run_id)
+        most_recent_files = checkpoint.files
+        delta, chunk_rows = checkpoint.settings['delta'], checkpoint.settings['chunk_rows']
+        db_manager.logger.info(f"Resuming the run {run_id}")
+    else:
+        most_recent_files = find_most_recent_files()
+        checkpoint = None
+        if checkpoint_directory:
+            checkpoint = RunCheckpoint(checkpoint_directory, files=most_recent_files,
+                                       settings={'delta': delta, 'chunk_rows': chunk_rows})
 
-for i in range(len(most_recent_files)):
+    # Two runs, by hand or by the watch service, never write to the documents table at the same time
+    with db_manager.ingestion_lock() as acquired:
+        if not acquired:
+            db_manager.logger.error("Another ingestion is running, the extracts are not loaded")
+            return
+        results = ingest_files(db_manager, metrics, most_recent_files, workers, delta, chunk_rows, checkpoint)
 
-    extraction_file_path = most_recent_files[i]
+    if checkpoint is not None:
+        if all(results.values()):
+            checkpoint.finish()
+        else:
+            db_manager.logger.error(f"The run {checkpoint.run_id} failed, it can be resumed with "
+                                    f"--resume {checkpoint.run_id}")
 
-    df_excel = pd.read_excel(extraction_file_path, header=0)
-    db_manager.logger.info(f"Loading file {most_recent_files[i]}")
+    end_time = time.time()
 
-    df_formatted = db_manager.formatting_dataframe(df_excel, file_type[i])
-    db_manager.logger.info(f"The {most_recent_files[i]} file formatted")
+    # Timer
+    execution_time = end_time - start_time
+    db_manager.logger.info(f"Temps d'exécution: {execution_time} secondes")
 
-    db_manager.concatenated_dataframes(df_formatted, table_name)
+    # Whole run, then the optional export for Prometheus
+    metrics.record({'stage': 'run', 'source': None, 'wall_seconds': round(execution_time, 6),
+                    'cpu_seconds': round(time.process_time(), 6), 'peak_rss_bytes': peak_memory()})
+    metrics.write_prometheus()
+    db_manager.logger.info(f"Metrics of the run written to {metrics.metrics_path}")
 
-    db_manager.update_database_from_dataframe(df_formatted, table_name)
 
-end_time = time.time()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Loads the most recent extracts into the documents table")
+    parser.add_argument("--workers", type=int, default=parse_workers,
+                        help="Number of worker processes parsing and formatting the extracts (1 to disable)")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="Rewrite every row of the extracts instead of the new and changed rows only")
+    parser.add_argument("--chunk-size", type=int, default=chunk_size,
+                        help="Stream each extract by chunks of this many rows instead of loading it at once")
+    parser.add_argument("--resume", nargs="?", const="latest",
+                        help="Resume a failed run from its last completed stage, the latest one without a run ID")
+    args = parser.parse_args()
 
-# Timer
-execution_time = end_time - start_time
-db_manager.logger.info(f"Temps d'exécution: {execution_time} secondes")
+    main(args.workers, delta_ingestion and not args.full_refresh, args.chunk_size, args.resume)
@@ -1 +1,13 @@
 from src.db_manager_class import DatabaseManager
+from src.extract_reader import read_extract
+from src.extract_cache import ExtractCache
+from src.composite_key import build_composite_key, build_key_from_values, key_surrogate
+from src.documents_schema import DocumentsSchema
+from src.pipeline_metrics import PipelineMetrics, measure
+from src.chunked_ingestion import SeenIds, iter_formatted_chunks
+from src.extract_watcher import ExtractWatcher
+from src.ingestion_state import IngestionState
+from src.run_checkpoint import RunCheckpoint, BatchTracker
+from src.database_backends import PostgresqlBackend, SqliteBackend, get_backend
+from src.logging_setup import configure_logging, stop_logging
+from src.extract_history import extract_date, find_historical_extracts
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+from src.composite_key import key_surrogate
+from src.extract_formatting import format_extract
+from src.extract_reader import iter_extract_chunks
+pd.options.mode.copy_on_write = True
+
+
+class SeenIds:
+    def __init__(self):
+        """
+        Set of the IDs already met in an extract, held as a sorted array of their 64-bit surrogates (8 bytes per ID
+        instead of a Python string in a set), so that a file read by chunks can be deduplicated on its ID
+        """
+
+        self.surrogates = np.empty(0, dtype='int64')
+
+    def __len__(self):
+        return len(self.surrogates)
+
+    def first_occurrences(self, ids):
+        """
+        Finds the IDs met for the first time, then adds them to the set. As `drop_duplicates(keep='first')` on the
+        whole file, only the first occurrence of an ID is kept, even when its duplicates are in later chunks
+
+        :param ids: The IDs of a chunk
+        :return: numpy.ndarray: A boolean mask of the IDs which were not met before, nor earlier in the chunk
+        """
+
+        surrogates = key_surrogate(ids)
+
+        # First occurrence within the chunk, then not already met in the previous chunks
+        first_in_chunk = ~pd.Series(surrogates).duplicated().to_numpy()
+        is_new = first_in_chunk & ~np.isin(surrogates, self.surrogates)
+
+        self.surrogates = np.union1d(self.surrogates, surrogates[is_new])
+        return is_new
+
+
+def iter_formatted_chunks(file_path, df_type, chunk_size=50000):
+    """
+    Reads, formats and deduplicates an Excel extract by chunks of rows, so that the memory used does not depend on
+    the size of the file. The rows kept are those `format_extract` keeps from the whole file, except for a
+    histo_perfo ID duplicated over several chunks, whose formatting reorders the rows by status within each chunk
+
+    :param file_path: The path of the Excel file to be read
+    :param df_type: The extraction type, which determines the read specification and the formatting
+    :param chunk_size: The number of rows read at once
+
+    :return: generator: (formatted DataFrame, number of rows read) tuples, one per chunk
+    """
+
+    seen_ids = SeenIds()
+
+    for df_chunk in iter_extract_chunks(file_path, df_type, chunk_size):
+        rows_read = len(df_chunk)
+
+        # The filters of the formatting only depend on the row itself, so they are applied chunk by chunk
+        df_formatted = format_extract(df_chunk, df_type)
+        df_formatted = df_formatted[seen_ids.first_occurrences(df_formatted['ID'])]
+
+        yield df_formatted, rows_read
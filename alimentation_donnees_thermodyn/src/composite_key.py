@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+pd.options.mode.copy_on_write = True
+
+# Variable-width strings of NumPy 2 are concatenated much faster than the fixed-width ones of older versions
+text_dtype = np.dtypes.StringDType() if hasattr(np.dtypes, 'StringDType') else str
+
+
+def key_part_as_text(series, integer=False):
+    """
+    Converts a key column to a NumPy array of strings, with the same text as `astype(int).astype(str)` or
+    `astype(str)`
+
+    :param series: The key column
+    :param integer: Whether the values are converted to integers first, as for the order and line numbers
+    :return: numpy.ndarray: The text of each value
+    """
+
+    if integer:
+        return series.astype('int64').to_numpy().astype(text_dtype)
+
+    # Numeric columns are converted by NumPy without going through Python objects
+    if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_extension_array_dtype(series.dtype):
+        return series.to_numpy().astype(text_dtype)
+
+    # Text or mixed columns, which only hold Python objects anyway
+    return series.astype(str).to_numpy().astype(text_dtype)
+
+
+def build_composite_key(df, key_columns):
+    """
+    Builds the ID of each row by concatenating its order, line, release and project values
+
+    :param df: The DataFrame holding the key columns
+    :param key_columns: The names of the order, line, release and project columns, in this order
+    :return: pandas.Series: The ID of each row, indexed like the DataFrame
+    """
+
+    order, line, release, project = key_columns
+
+    # Element-wise concatenation of NumPy string arrays
+    # The order and line numbers are converted to integers, the release and the project keep their text form
+    key = np.char.add(key_part_as_text(df[order], integer=True), key_part_as_text(df[line], integer=True))
+    key = np.char.add(key, key_part_as_text(df[release]))
+    key = np.char.add(key, key_part_as_text(df[project]))
+
+    return pd.Series(key, index=df.index, dtype=object)
+
+
+def build_key_from_values(values, key_columns=("NUMERO_COMMANDE", "LIGNE", "RELEASE", "NUMERO_PROJET")):
+    """
+    Builds the ID of a single document from a dictionary of column values
+
+    :param values: A dictionary containing the key column values
+    :param key_columns: The names of the order, line, release and project columns, in this order
+    :return: str: The ID of the document
+    """
+
+    return build_composite_key(pd.DataFrame([{column: values.get(column) for column in key_columns}]),
+                               key_columns).iloc[0]
+
+
+def key_surrogate(keys):
+    """
+    Computes a 64-bit integer surrogate of each ID, to look up large sets of IDs on integers instead of strings
+
+    :param keys: The IDs, as a pandas Series or any array-like
+    :return: numpy.ndarray: The signed 64-bit surrogate of each ID
+    """
+
+    return pd.util.hash_array(np.asarray(keys, dtype=object), categorize=False).view('int64')
@@ -0,0 +1,270 @@
+from contextlib import contextmanager
+import pyarrow as pa
+from sqlalchemy import select, func, insert, Date
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert, DATE as SQLITE_DATE
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, where the lock file is locked with msvcrt instead
+    fcntl = None
+    import msvcrt
+
+
+class PostgresqlBackend:
+    """
+    PostgreSQL server, the production database. The rows are streamed with COPY FROM STDIN, read through server-side
+    cursors, and the ingestions are serialised by a session-level advisory lock
+    """
+
+    name = "postgresql"
+
+    @staticmethod
+    def url(dbname, user, password, host):
+        return f"postgresql+psycopg://{user}:{password}@{host}/{dbname}"
+
+    @staticmethod
+    def adapt_table(table):
+        return table
+
+    @staticmethod
+    def upsert(table, index_elements, update_columns):
+        """
+        Builds an INSERT which updates the given columns of the rows whose key already exists
+
+        :param table: The table in which the rows are inserted
+        :param index_elements: The names of the columns of the key
+        :param update_columns: The names of the columns updated when the key exists
+        :return: sqlalchemy.Insert: The statement
+        """
+
+        stmt = postgresql_insert(table)
+        return stmt.on_conflict_do_update(index_elements=index_elements,
+                                          set_={column: stmt.excluded[column] for column in update_columns})
+
+    @staticmethod
+    def create_staging_table(connection, staging_table):
+        # The staging tables are declared ON COMMIT DROP, so they never exist at the start of a transaction
+        staging_table.create(connection)
+
+    @staticmethod
+    def copy_rows(cursor, dataframe, table_name, chunk_size=10000):
+        """
+        Writes the rows of a DataFrame to a table through the COPY FROM STDIN stream of a psycopg cursor, within the
+        transaction of this cursor
+
+        :param cursor: The psycopg cursor used to send the rows
+        :param dataframe: The DataFrame containing the rows to be sent
+        :param table_name: The name of the PostgreSQL table where the rows must be written
+        :param chunk_size: Number of rows converted from the DataFrame at once
+        """
+
+        # Explicit column list so that the DataFrame does not need to follow the table column order
+        columns = ", ".join(f'"{column}"' for column in dataframe.columns)
+        copy_statement = f'COPY "{table_name}" ({columns}) FROM STDIN'
+
+        with cursor.copy(copy_statement) as copy:
+            for start in range(0, len(dataframe), chunk_size):
+                # Replaces NaN or NaT values with None so that they are sent as NULL
+                chunk = dataframe.iloc[start:start + chunk_size]
+                chunk = chunk.astype(object).where(chunk.notna(), None)
+
+                # psycopg encodes each row and flushes its buffer to the server as the stream grows
+                for row in chunk.itertuples(index=False, name=None):
+                    copy.write_row(row)
+
+    def write_rows(self, connection, dataframe, table, chunk_size=10000):
+        """
+        Appends the rows of a DataFrame to a table within the transaction of a connection
+
+        :param connection: The SQLAlchemy connection of the transaction
+        :param dataframe: The DataFrame containing the rows to be written
+        :param table: The `Table` instance where the rows must be written
+        :param chunk_size: Number of rows converted from the DataFrame at once
+        """
+
+        with connection.connection.cursor() as cursor:
+            self.copy_rows(cursor, dataframe, table.name, chunk_size)
+
+    @staticmethod
+    @contextmanager
+    def cursor(dbapi_connection, name):
+        # A named psycopg cursor is a server-side cursor, the rows stay in PostgreSQL until they are fetched
+        with dbapi_connection.cursor(name=name) as cursor:
+            yield cursor
+
+    @staticmethod
+    def to_arrow(values, arrow_type):
+        return pa.array(values, type=arrow_type)
+
+    @staticmethod
+    @contextmanager
+    def ingestion_lock(engine, lock_key):
+        """
+        Tries to take the session-level PostgreSQL advisory lock of the ingestions without waiting. The lock is held
+        by a dedicated connection until the end of the `with` block, and released by PostgreSQL if the process dies
+
+        :param engine: The SQLAlchemy engine of the database
+        :param lock_key: The key of the advisory lock
+        :return: bool: True if the lock has been taken, False if another run holds it
+        """
+
+        connection = engine.connect()
+        acquired = False
+        try:
+            acquired = connection.execute(select(func.pg_try_advisory_lock(lock_key))).scalar()
+            connection.commit()
+            yield acquired
+        finally:
+            if acquired:
+                connection.execute(select(func.pg_advisory_unlock(lock_key)))
+                connection.commit()
+            connection.close()
+
+
+class SqliteBackend:
+    """
+    Embedded SQLite database file, or in memory with ':memory:', used to run the pipeline and its tests without a
+    server. The upserts and the set-based updates have the same semantics as on PostgreSQL, the rows being sent with
+    executemany instead of COPY
+    """
+
+    name = "sqlite"
+
+    @staticmethod
+    def url(dbname, user=None, password=None, host=None):
+        # The database name is the path of the file, the server parameters are ignored
+        return f"sqlite:///{dbname}"
+
+    @staticmethod
+    def adapt_table(table):
+        """
+        Reads the date columns of a table with a pattern instead of `date.fromisoformat`, because the dates written by
+        pandas `to_sql` are stored with a time part
+
+        :param table: The reflected or declared `Table` instance
+        :return: sqlalchemy.Table: The same table
+        """
+
+        for column in table.c:
+            if isinstance(column.type, Date):
+                column.type = SQLITE_DATE(regexp=r"(\d+)-(\d+)-(\d+)")
+
+        return table
+
+    @staticmethod
+    def upsert(table, index_elements, update_columns):
+        """
+        Builds an INSERT which updates the given columns of the rows whose key already exists
+
+        :param table: The table in which the rows are inserted
+        :param index_elements: The names of the columns of the key
+        :param update_columns: The names of the columns updated when the key exists
+        :return: sqlalchemy.Insert: The statement
+        """
+
+        stmt = sqlite_insert(table)
+        return stmt.on_conflict_do_update(index_elements=index_elements,
+                                          set_={column: stmt.excluded[column] for column in update_columns})
+
+    @staticmethod
+    def create_staging_table(connection, staging_table):
+        # SQLite keeps the temporary tables until the pooled connection is closed, ON COMMIT DROP does not exist
+        connection.exec_driver_sql(f'DROP TABLE IF EXISTS temp."{staging_table.name}"')
+        staging_table.create(connection)
+
+    @staticmethod
+    def write_rows(connection, dataframe, table, chunk_size=10000):
+        """
+        Appends the rows of a DataFrame to a table within the transaction of a connection
+
+        :param connection: The SQLAlchemy connection of the transaction
+        :param dataframe: The DataFrame containing the rows to be written
+        :param table: The `Table` instance where the rows must be written
+        :param chunk_size: Number of rows converted from the DataFrame at once
+        """
+
+        for start in range(0, len(dataframe), chunk_size):
+            # Replaces NaN or NaT values with None so that they are written as NULL
+            chunk = dataframe.iloc[start:start + chunk_size]
+            chunk = chunk.astype(object).where(chunk.notna(), None)
+            connection.execute(insert(table), chunk.to_dict('records'))
+
+    @staticmethod
+    @contextmanager
+    def cursor(dbapi_connection, name):
+        # sqlite3 already steps through the result as the rows are fetched
+        cursor = dbapi_connection.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def to_arrow(values, arrow_type):
+        # SQLite stores the dates as ISO texts, with a time part when they were written by pandas
+        if pa.types.is_temporal(arrow_type):
+            return pa.array(values, type=pa.string()).cast(pa.timestamp('us')).cast(arrow_type, safe=False)
+        return pa.array(values, type=arrow_type)
+
+    @staticmethod
+    @contextmanager
+    def ingestion_lock(engine, lock_key):
+        """
+        Tries to take an exclusive lock on a file next to the database without waiting. The lock is released at the
+        end of the `with` block, or by the system if the process dies
+
+        :param engine: The SQLAlchemy engine of the database
+        :param lock_key: The key of the lock, which names the lock file
+        :return: bool: True if the lock has been taken, False if another run holds it
+        """
+
+        database = engine.url.database
+        if not database or database == ":memory:":
+            # An in-memory database belongs to a single process
+            yield True
+            return
+
+        lock_file = open(f"{database}.{lock_key:x}.lock", 'a+b')
+        acquired = False
+        try:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                acquired = True
+            except OSError:
+                acquired = False
+            yield acquired
+        finally:
+            if acquired:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            lock_file.close()
+
+
+# Backend of each name accepted by `DatabaseManager`
+backends = {
+    PostgresqlBackend.name: PostgresqlBackend,
+    SqliteBackend.name: SqliteBackend,
+}
+
+
+def get_backend(name):
+    """
+    Returns the backend of a database engine
+
+    :param name: 'postgresql' or 'sqlite'
+    :return: The backend instance
+    """
+
+    if name not in backends:
+        raise ValueError(f"Unknown database backend {name!r}, expected one of {', '.join(backends)}")
+
+    return backends[name]()
@@ -1,271 +1,621 @@
-import numpy as np
-from sqlalchemy import create_engine, MetaData, Table, update
+from sqlalchemy import (create_engine, MetaData, Table, Column, String, BigInteger, Text, DateTime, update, insert,
+                        delete, select, exists, func)
 from sqlalchemy.orm import sessionmaker
 import pandas as pd
 pd.options.mode.copy_on_write = True
-import os
-from datetime import datetime
-import logging
-from src.lists_initialisation import (histo_perfo_column_to_delete, full_backlog_data_column_for_ID,
-                                      navy_check_column_for_ID, full_backlog_data_column_to_delete,
-                                      navy_check_column_to_delete, histo_perfo_column_for_ID)
+import pyarrow as pa
+import json
+import time
+from datetime import date, datetime
+from src.extract_formatting import format_extract
+from src.documents_schema import DocumentsSchema
+from src.database_backends import get_backend
+from src.logging_setup import configure_logging
+
+# Content hash of the last ingested version of each row, per extraction source
+ingestion_hashes_table = Table(
+    "ingestion_hashes", MetaData(),
+    Column("SOURCE", String(20), primary_key=True),
+    Column("ID", String(25), primary_key=True),
+    Column("HASH", BigInteger, nullable=False),
+)
+
+# Rows rejected by the validation before being written, with the reasons and the values of each row
+quarantine_table = Table(
+    "ingestion_quarantine", MetaData(),
+    Column("SOURCE", String(20), nullable=False),
+    Column("ID", String(25)),
+    Column("REASONS", Text, nullable=False),
+    Column("ROW_DATA", Text, nullable=False),
+    Column("QUARANTINED_AT", DateTime, nullable=False),
+)
+
+# Key of the PostgreSQL advisory lock taken by the ingestions, so that two runs never overlap
+ingestion_lock_key = 0x7468657264
+
+# Arrow type of the Python type of each column type, the values of the other types are converted to strings
+arrow_types = {
+    str: pa.string(),
+    int: pa.int64(),
+    float: pa.float64(),
+    bool: pa.bool_(),
+    date: pa.date32(),
+    datetime: pa.timestamp('us'),
+}
 
 
 class DatabaseManager:
-    def __init__(self, dbname, user, password, host):
+    def __init__(self, dbname, user=None, password=None, host=None, declared_schema=False, backend="postgresql",
+                 log_format="text"):
+        """
+        :param dbname: The name of the PostgreSQL database, or the path of the SQLite database file
+        :param user: The user of the connection
+        :param password: The password of the user
+        :param host: The host of the PostgreSQL server
+        :param declared_schema: Whether the documents table is declared from `SQL/create_table.sql` instead of being
+        reflected from the database
+        :param backend: 'postgresql' for the PostgreSQL server, 'sqlite' for an embedded SQLite database, see
+        `database_backends`
+        :param log_format: 'text' or 'json' log lines, taken into account by the first manager of the process
+        """
+
         self.dbname = dbname
         self.user = user
         self.password = password
         self.host = host
-        self.conn_string = f"postgresql+psycopg://{user}:{password}@{host}/{dbname}"
+
+        # Statements and transfers which depend on the database engine
+        self.backend = get_backend(backend)
+        self.conn_string = self.backend.url(dbname, user, password, host)
         self.engine = create_engine(self.conn_string)
         self.metadata = MetaData()
 
-        # Create a directory for log files if it doesn't already exist
-        log_directory = "./logs"
-        if not os.path.exists(log_directory):
-            os.makedirs(f'{log_directory}/INFO')
-            os.makedirs(f'{log_directory}/ERROR')
+        # Column types of the documents table, used to coerce the DataFrames before they are written
+        self.documents_schema = DocumentsSchema()
+        self.declared_schema = declared_schema
+
+        # Tables reflected (or declared) once per manager, until `invalidate_tables` is called
+        self.tables = {}
 
-        # Current date for naming log files
-        current_date = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        # Session factory shared by every method
+        self.session_maker = sessionmaker(bind=self.engine)
 
-        # Logger configuration
-        self.logger = logging.getLogger('DataManager')
-        self.logger.setLevel(logging.DEBUG)  # Niveau le plus bas capté par le logger
+        # Shared 'DataManager' logger, configured once per process whatever the number of managers
+        self.logger = configure_logging(log_format=log_format)
 
-        # Logger configuration
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    def get_table(self, table_name):
+        """
+        Returns the `Table` instance of a database table, reflected on the first call then taken from the cache
+
+        :param table_name: The name of the table
+        :return: sqlalchemy.Table: The table
+        """
 
-        # Log file for INFO
-        info_file_handler = logging.FileHandler(f'{log_directory}/INFO/info_{current_date}.log')
-        info_file_handler.setLevel(logging.INFO)
-        info_file_handler.setFormatter(formatter)
-        self.logger.addHandler(info_file_handler)
+        if table_name not in self.tables:
+            # A declared documents table saves the catalog queries of the reflection
+            if self.declared_schema and table_name == self.documents_schema.table_name:
+                self.tables[table_name] = self.documents_schema.to_table(self.metadata)
+            else:
+                self.tables[table_name] = Table(table_name, self.metadata, autoload_with=self.engine)
+            self.backend.adapt_table(self.tables[table_name])
 
-        # Log file for ERROR
-        error_file_handler = logging.FileHandler(f'{log_directory}/ERROR/error_{current_date}.log')
-        error_file_handler.setLevel(logging.ERROR)
-        error_file_handler.setFormatter(formatter)
-        self.logger.addHandler(error_file_handler)
+        return self.tables[table_name]
+
+    def invalidate_tables(self, table_name=None):
+        """
+        Forgets the cached `Table` instances, to be called after the schema of a table has been changed
 
-    def dataframe_to_sql(self, dataframe, table_name):
+        :param table_name: The name of the table to forget, or None to forget every table
+        """
+
+        table_names = list(self.tables) if table_name is None else [table_name]
+
+        for name in table_names:
+            table = self.tables.pop(name, None)
+            if table is not None:
+                self.metadata.remove(table)
+
+        self.logger.info(f"Cached schema invalidated for {', '.join(table_names) or 'no table'}")
+
+    def ingestion_lock(self, lock_key=ingestion_lock_key):
+        """
+        Tries to take the lock of the ingestions without waiting, a PostgreSQL advisory lock or a lock file next to
+        the SQLite database. The lock is held until the end of the `with` block, and released if the process dies
+
+        :param lock_key: The key of the lock
+        :return: bool: True if the lock has been taken, False if another run holds it
+        """
+
+        return self.backend.ingestion_lock(self.engine, lock_key)
+
+    def dataframe_to_sql(self, dataframe, table_name, loader="to_sql", chunk_size=10000):
         """
         Transfers data from a Pandas DataFrame to a specified PostgreSQL table
 
         :param dataframe: The DataFrame containing the data to be transferred
         :param table_name: Le nom de la table de la base de données PostgreSQL où les données doivent être transférées
+        :param loader: 'to_sql' uses pandas parameterised INSERTs, 'copy' streams the rows with COPY FROM STDIN (with
+        executemany on SQLite)
+        :param chunk_size: Number of rows converted at once by the 'copy' loader
+
+        :return: bool: True if the data has been transferred, False if an error occurred
         """
 
         try:
-            # Attempts to transfer DataFrame data to the specified PostgreSQL table
-            # 'index=False' indicates not to include the DataFrame index as a column in the table
-            # 'if_exists='append'' adds the data to the table if it already exists, without deleting existing data
-            dataframe.to_sql(table_name, self.engine, index=False, if_exists='append')
+            if loader == "copy":
+                # Streams the DataFrame rows into the table through the psycopg COPY protocol
+                self.copy_dataframe_to_table(dataframe, table_name, chunk_size)
+            else:
+                # Attempts to transfer DataFrame data to the specified PostgreSQL table
+                # 'index=False' indicates not to include the DataFrame index as a column in the table
+                # 'if_exists='append'' adds the data to the table if it already exists, without deleting existing data
+                dataframe.to_sql(table_name, self.engine, index=False, if_exists='append')
 
             self.logger.info(f"The data has been successfully transferred to the {table_name} table")
+            return True
         except Exception as e:
             self.logger.error(f"An error occurred during data transfer: {e}")
+            return False
+
+    def copy_dataframe_to_table(self, dataframe, table_name, chunk_size=10000):
+        """
+        Appends the rows of a DataFrame to a table in a single transaction, with COPY FROM STDIN on PostgreSQL. Rows
+        are converted chunk by chunk, so the whole payload is never held in memory
+
+        :param dataframe: The DataFrame containing the data to be transferred
+        :param table_name: The name of the table where the data must be transferred
+        :param chunk_size: Number of rows converted from the DataFrame at once
+        """
+
+        # The transaction is committed once every row is sent
+        with self.engine.begin() as connection:
+            self.backend.write_rows(connection, dataframe, self.get_table(table_name), chunk_size)
+
+    def select_existing_ids(self, ids, table_name):
+        """
+        Returns the IDs which are already present in a table. The IDs are copied into a temporary staging table and
+        compared with the table inside PostgreSQL, so that only the matching IDs come back to the client instead of the
+        whole table
+
+        :param ids: The IDs to be looked up, as a pandas Series
+        :param table_name: The name of the PostgreSQL table in which the IDs are searched
+
+        :return: set: The IDs of `ids` that are present in the table
+        """
+
+        # `Table` instance of the specified table
+        table = self.get_table(table_name)
+
+        # Temporary staging table holding only the incoming IDs, dropped at the end of the transaction
+        staging_table = Table(f"staging_ids_{table_name}", MetaData(), Column("ID", table.c.ID.type),
+                              prefixes=["TEMPORARY"], postgresql_on_commit="DROP")
+        id_matches = exists().where(table.c.ID == staging_table.c.ID)
+
+        with self.engine.begin() as connection:
+            self.backend.create_staging_table(connection, staging_table)
+            # Streams the IDs (with COPY on PostgreSQL) within the transaction that owns the temporary table
+            self.backend.write_rows(connection, ids.dropna().to_frame("ID"), staging_table)
+
+            # Semi-join for the IDs already in the table, anti-join only counted for the log
+            existing_ids = set(connection.execute(select(staging_table.c.ID).where(id_matches)).scalars())
+            new_ids_count = connection.execute(
+                select(func.count(func.distinct(staging_table.c.ID))).where(~id_matches)).scalar()
+
+        self.logger.info(f"{len(existing_ids)} IDs already present and {new_ids_count} new IDs for the {table_name} "
+                         f"table")
+        return existing_ids
 
-    def select_from_table(self, table_name):
+    def selection(self, table_name, columns=None, where=None):
+        """
+        Builds the selection of some columns of a table, filtered by conditions
+
+        :param table_name: The name of the table
+        :param columns: The names of the columns to be selected, or None to select every column
+        :param where: The conditions on the rows, as a dict of column name to a value or a list of values, or as an
+        SQLAlchemy expression on the columns of `get_table(table_name)`. None selects every row
+
+        :return: sqlalchemy.Select: The selection
+        """
+
+        # `Table` instance of the specified table
+        table = self.get_table(table_name)
+        statement = select(*(table.c[column] for column in columns)) if columns else select(table)
+
+        if isinstance(where, dict):
+            for column, value in where.items():
+                if value is None:
+                    statement = statement.where(table.c[column].is_(None))
+                elif isinstance(value, (list, tuple, set, pd.Series)):
+                    statement = statement.where(table.c[column].in_(list(value)))
+                else:
+                    statement = statement.where(table.c[column] == value)
+        elif where is not None:
+            statement = statement.where(where)
+
+        return statement
+
+    def stream_record_batches(self, table_name, columns=None, where=None, batch_rows=50000):
+        """
+        Streams the selected rows of a table as Arrow record batches, one batch of rows being held in memory at once
+
+        :param table_name: The name of the PostgreSQL table from which to select data
+        :param columns: The names of the columns to be selected, or None to select every column
+        :param where: The conditions on the rows, as taken by `selection`
+        :param batch_rows: The number of rows fetched and converted at once
+
+        :return: generator: The pyarrow.RecordBatch of the rows, with the schema of `arrow_schema`
+        """
+
+        statement = self.selection(table_name, columns, where)
+        schema = self.arrow_schema(statement)
+
+        # The values of the column types without an Arrow type (numeric, UUID, JSON...) are converted to strings
+        as_text = [self.arrow_type(column) is None for column in statement.selected_columns]
+
+        # Bound values and expanded lists are sent as parameters of the query, by position for SQLite
+        compiled = statement.compile(dialect=self.engine.dialect, compile_kwargs={"render_postcompile": True})
+        parameters = [compiled.params[name] for name in compiled.positiontup] if compiled.positional \
+            else compiled.params
+
+        with self.engine.connect() as connection:
+            # Server-side cursor on PostgreSQL, the rows stay in the database until they are fetched
+            with self.backend.cursor(connection.connection, f"stream_{table_name}") as cursor:
+                cursor.execute(str(compiled), parameters)
+                while rows := cursor.fetchmany(batch_rows):
+                    # One list per column, which the garbage collector scans less than the tuples of `zip(*rows)`
+                    yield pa.RecordBatch.from_arrays(
+                        [self.backend.to_arrow(self.column_values(rows, position, as_text[position]), field.type)
+                         for position, field in enumerate(schema)], schema=schema)
+
+    @staticmethod
+    def column_values(rows, position, as_text=False):
+        # Values of a column of the fetched rows, converted to strings for the column types read as text
+        if as_text:
+            return [None if row[position] is None else str(row[position]) for row in rows]
+        return [row[position] for row in rows]
+
+    @staticmethod
+    def arrow_type(column):
+        """
+        Returns the Arrow type of a selected column
+
+        :param column: The SQLAlchemy column
+        :return: pyarrow.DataType: The Arrow type, or None if the values of the column are read as strings
+        """
+
+        try:
+            return arrow_types.get(column.type.python_type)
+        except NotImplementedError:
+            return None
+
+    @classmethod
+    def arrow_schema(cls, statement):
+        """
+        Returns the Arrow schema of the columns of a selection
+
+        :param statement: The SQLAlchemy selection
+        :return: pyarrow.Schema: The schema, with one field per selected column
+        """
+
+        return pa.schema([pa.field(column.name, cls.arrow_type(column) or pa.string())
+                          for column in statement.selected_columns])
+
+    def read_arrow_table(self, table_name, columns=None, where=None):
+        """
+        Reads the selected rows of a table into an Arrow table, streamed by `stream_record_batches`
+
+        :param table_name: The name of the PostgreSQL table from which to select data
+        :param columns: The names of the columns to be selected, or None to select every column
+        :param where: The conditions on the rows, as taken by `selection`
+
+        :return: pyarrow.Table: The selected rows
+        """
+
+        schema = self.arrow_schema(self.selection(table_name, columns, where))
+        return pa.Table.from_batches(self.stream_record_batches(table_name, columns, where), schema=schema)
+
+    def select_from_table(self, table_name, columns=None, where=None, reader="orm"):
         """
         Selects rows from a specified PostgreSQL table and returns them as pandas DataFrame
 
         :param table_name: The name of the PostgreSQL table from which to select data
+        :param columns: The names of the columns to be selected, or None to select every column
+        :param where: The conditions on the rows, as taken by `selection`
+        :param reader: 'orm' reads the rows with `pd.read_sql`, 'arrow' reads them with `read_arrow_table`
 
         :return: pandas.DataFrame: A DataFrame containing selected rows from the specified table
         """
 
-        # Creates a `Table` instance for the specified table, using the database engine and metadata
-        table = Table(table_name, self.metadata, autoload_with=self.engine)
+        if reader == "arrow":
+            try:
+                result = self.read_arrow_table(table_name, columns, where).to_pandas()
+                self.logger.info(f"{len(result)} rows of the {table_name} table have been read with Arrow")
+                return result
+            except Exception as e:
+                self.logger.error(f"An error occurred during data selection: {e}")
+                return None
 
-        # Prepares an SQLAlchemy session to interact with the database
-        session_maker = sessionmaker(bind=self.engine)
-        session = session_maker()
         try:
-            # Creates a selection query for the table specified via the session
-            query = session.query(table)
+            # Creates a selection query of the requested columns and rows
+            statement = self.selection(table_name, columns, where)
 
             # Executes the query and converts the result into DataFrame pandas
-            result = pd.read_sql(query.statement, self.engine)
+            result = pd.read_sql(statement, self.engine)
             return result
         except Exception as e:
             self.logger.error(f"An error occurred during data selection: {e}")
         finally:
-            # Closes the session to release resources
-            session.close()
             self.logger.info("The data has been successfully retrieved and transformed into a Dataframe from the "
                              "database")
 
-    def formatting_dataframe(self, df, df_type):
+    def formatting_dataframe(self, df, df_type, id_lookup="client"):
         """
         Formats a DataFrame according to the extraction source
 
         :param df: The DataFrame to be formatted
         :param df_type: The extraction type, which determines the specific formatting to be applied
+        :param id_lookup: 'client' downloads the IDs of the documents table to find the existing ones, 'server' looks
+        them up inside PostgreSQL with `select_existing_ids`
         :return: pandas.DataFrame: DataFrame formatted and filtered according to the specified type
         """
 
-        # Initialization of the final filtered dataframe
-        df_filtered = pd.DataFrame()
-
-        # Specific formatting according to extraction type
-        match df_type:
-            case "histo_perfo":
-                # Drop useless columns
-                df.drop(histo_perfo_column_to_delete, axis=1, inplace=True)
-                # Delete null value for the PO_NUMBER column
-                df.dropna(subset=histo_perfo_column_for_ID[0], inplace=True)
-                # Create ID
-                df['ID'] = (df[histo_perfo_column_for_ID[0]].astype(int).astype(str) +
-                            df[histo_perfo_column_for_ID[1]].astype(int).astype(str) +
-                            df[histo_perfo_column_for_ID[2]].astype(str) +
-                            df[histo_perfo_column_for_ID[3]].astype(str))
-
-                # Rename columns
-                df.rename(columns={'PO_NUMBER': 'NUMERO_COMMANDE', 'PO_LINE_NUMBER': 'LIGNE',
-                                   'RELEASE_NUMBER': 'RELEASE', 'PO_JOB': 'NUMERO_PROJET',
-                                   'CURR_PO_SUPPLIER': 'FOURNISSEUR', 'PO_LINE_DESCRIPTION': 'DESCRIPTION',
-                                   'FIRST_MAT_DELIVERY_DATE': 'DATE_RECEPTION_MATERIEL',
-                                   'FIRST_ISP': 'DATE_OBTENTION_DOC'}, inplace=True)
-
-                df['LAST_EDM_MANAGEMENT_DATE'] = pd.to_datetime(df['LAST_EDM_MANAGEMENT_DATE'])
-                date_limite = pd.Timestamp.now() - pd.Timedelta(days=14)
-
-                # Apply a filter to select specific lines based on 'CURRENT_STATUS' and 'LAST_EDM_MANAGEMENT_DATE'
-                df_current_status_filter = df[df['CURRENT_STATUS'].isin(['In Approval']) | df['CURRENT_STATUS'].isna()]
-
-                df_approved_filter = df[df['CURRENT_STATUS'].isin(['APPROVED'])]
-                df_on_approved_filter_with_date = df_approved_filter[
-                    df_approved_filter['LAST_EDM_MANAGEMENT_DATE'] >= date_limite]
-
-                # Concatenation of the two filtered dataframes
-                df_filtered = pd.concat([df_current_status_filter, df_on_approved_filter_with_date], ignore_index=True)
-
-                # Add new column with today's date for lines where CURRENT_STATUS is 'APPROVED'
-                current_date = pd.Timestamp.now().normalize().strftime('%Y-%m-%d')
-                df_filtered['HOROD_CONTROLE_VALIDE_SYSTEME'] = np.where(df_filtered['CURRENT_STATUS'] == 'APPROVED',
-                                                                        current_date, None)
-
-                # Drop final useless columns
-                df_filtered.drop(['CURRENT_STATUS', 'LAST_EDM_MANAGEMENT_DATE'],
-                                 axis=1, inplace=True)
-
-            case "full_backlog_data":
-                # Drop useless columns
-                df.drop(full_backlog_data_column_to_delete, axis=1, inplace=True)
-                # Delete null value for the PO column
-                df.dropna(subset=full_backlog_data_column_for_ID[0], inplace=True)
-                # Create ID
-                df['ID'] = (df[full_backlog_data_column_for_ID[0]].astype(int).astype(str) +
-                            df[full_backlog_data_column_for_ID[1]].astype(int).astype(str) +
-                            df[full_backlog_data_column_for_ID[2]].astype(str) +
-                            df[full_backlog_data_column_for_ID[3]].astype(str))
-
-                # Rename columns
-                df.rename(columns={'PO': 'NUMERO_COMMANDE', 'LINE': 'LIGNE',
-                                   'PROJECT_NUM': 'NUMERO_PROJET', 'VENDOR_NAME': 'FOURNISSEUR',
-                                   'ACTUAL_MAT_DELIVERY_DATE': 'DATE_RECEPTION_MATERIEL'}, inplace=True)
-
-                # Application of a filter based on 'DATE_RECEPTION_MATERIEL'
-                df_filtered_reception_materiel = df[df['DATE_RECEPTION_MATERIEL'].notna()]
-
-                # Retrieves data from the database
-                df_db = self.select_from_table("documents")
-
-                # Filter the dataframes based on the ID column
-                unique_rows = df_filtered_reception_materiel[~df_filtered_reception_materiel['ID'].isin(df_db['ID'])]
-
-                # Add the current date to the 'HOROD_ATTENTE_DOC' column for the filtered rows
-                current_date = pd.Timestamp.now().normalize().strftime('%Y-%m-%d')
-                unique_rows['HOROD_ATTENTE_DOC'] = current_date
-
-                # Identify common lines (present in both DataFrames)
-                common_rows = df_filtered_reception_materiel[df_filtered_reception_materiel['ID'].isin(df_db['ID'])]
-
-                # Concatenate unique_rows and common_rows
-                df_filtered = pd.concat([unique_rows, common_rows], ignore_index=True)
-
-            case "navy_check":
-                # Drop useless columns
-                df.drop(navy_check_column_to_delete, axis=1, inplace=True)
-                # Delete null value for the PO column
-                df.dropna(subset=navy_check_column_for_ID[0], inplace=True)
-                # Create ID
-                df['ID'] = (df[navy_check_column_for_ID[0]].astype(int).astype(str) +
-                            df[navy_check_column_for_ID[1]].astype(int).astype(str) +
-                            df[navy_check_column_for_ID[2]].astype(str) +
-                            df[navy_check_column_for_ID[3]].astype(str))
-
-                df['MAX_RECEIVING_DATE'] = pd.to_datetime(df['MAX_RECEIVING_DATE'], format='%d/%m/%Y')
-                df['MAX_RECEIVING_DATE'] = df['MAX_RECEIVING_DATE'].dt.strftime('%Y-%m-%d')
-
-                # Rename columns
-                df.rename(columns={'PO': 'NUMERO_COMMANDE', 'LINE_NUM': 'LIGNE', 'RELEASE_NUM': 'RELEASE',
-                                   'DIST_PROJECT': 'NUMERO_PROJET', 'CURR_VENDOR_NAME': 'FOURNISSEUR',
-                                   'MAX_RECEIVING_DATE': 'DATE_RECEPTION_MATERIEL'}, inplace=True)
-
-                # Application of filters based on 'FIRST_PO_APPROVED_DATE' and 'PO_REL_LINE_FIRST_APPRO_DATE'
-                df_filtered = df[df['FIRST_PO_APPROVED_DATE'].notna() & df['PO_REL_LINE_FIRST_APPRO_DATE'].notna()]
-
-                # Drop final useless columns
-                df_filtered.drop(['FIRST_PO_APPROVED_DATE', 'PO_REL_LINE_FIRST_APPRO_DATE'], axis=1,
-                                 inplace=True)
-
-        # Delete duplicate IDs, keeping the first occurrence
-        df_filtered.drop_duplicates(subset=['ID'], keep='first', inplace=True)
+        # Formatting which does not depend on the database
+        df_filtered = format_extract(df, df_type)
+
+        if df_type == "full_backlog_data":
+            df_filtered = self.date_new_backlog_rows(df_filtered, id_lookup)
 
         return df_filtered
 
-    def concatenated_dataframes(self, df_excel, table_name):
+    def date_new_backlog_rows(self, df, id_lookup="client", as_of=None):
+        """
+        Adds the current date to the 'HOROD_ATTENTE_DOC' column of the formatted full_backlog_data rows which are not
+        yet in the documents table
+
+        :param df: The full_backlog_data DataFrame formatted by `format_extract`
+        :param id_lookup: 'client' downloads the IDs of the documents table to find the existing ones, 'server' looks
+        them up inside PostgreSQL with `select_existing_ids`
+        :param as_of: The date given to the new rows instead of the current date, that of the extract when archived
+        extracts are replayed
+        :return: pandas.DataFrame: The new rows, dated, followed by the rows already in the database
+        """
+
+        # Retrieves the IDs already present in the database
+        if id_lookup == "server":
+            existing_ids = self.select_existing_ids(df['ID'], "documents")
+        else:
+            existing_ids = self.select_from_table("documents", columns=["ID"], reader="arrow")['ID']
+
+        # Filter the dataframes based on the ID column
+        unique_rows = df[~df['ID'].isin(existing_ids)]
+
+        # Add the current date to the 'HOROD_ATTENTE_DOC' column for the filtered rows
+        unique_rows['HOROD_ATTENTE_DOC'] = pd.Timestamp.now().normalize() if as_of is None else pd.Timestamp(as_of)
+
+        # Identify common lines (present in both DataFrames)
+        common_rows = df[df['ID'].isin(existing_ids)]
+
+        # Concatenate unique_rows and common_rows
+        return pd.concat([unique_rows, common_rows], ignore_index=True)
+
+    def concatenated_dataframes(self, df_excel, table_name, loader="to_sql", id_lookup="client"):
         """
         Merges a DataFrame from Excel with data from a database table, then saves the result in this database table
 
         :param df_excel: The DataFrame loaded from an Excel file
         :param table_name: The name of the database table with which to merge the data and where to save the result
+        :param loader: The loader used by `dataframe_to_sql` to save the result, 'to_sql' or 'copy'
+        :param id_lookup: 'client' downloads the IDs of the table to find the existing ones, 'server' looks them up
+        inside PostgreSQL with `select_existing_ids`
+
+        :return: bool: True if the new rows have been saved, False if an error occurred
         """
 
-        # Selects data from the specified table in the database and stores it in df_result
-        df_result = self.select_from_table(table_name)
-
-        # Concatenate the two DataFrames df_excel and df_result
-        # Filter rows, keeping only those with an 'ID' not present in df_result
-        df_concatenated = pd.concat([df_excel, df_result])[
-            ~pd.concat([df_excel, df_result])['ID'].isin(df_result['ID'])]
-
-        # Date conversion to avoid type issues
-        df_concatenated['DATE_RECEPTION_MATERIEL'] = pd.to_datetime(df_concatenated['DATE_RECEPTION_MATERIEL'])
-        df_concatenated['DATE_OBTENTION_DOC'] = pd.to_datetime(df_concatenated['HOROD_CONTROLE_VALIDE_SYSTEME'])
-        df_concatenated['HOROD_CONTROLE_VALIDE_SYSTEME'] = pd.to_datetime(
-            df_concatenated['HOROD_CONTROLE_VALIDE_SYSTEME'])
-        df_concatenated['HOROD_CONTROLE_VALIDE_CELLULE_DOC'] = pd.to_datetime(
-            df_concatenated['HOROD_CONTROLE_VALIDE_CELLULE_DOC'])
-        df_concatenated['HOROD_ATTENTE_RETOUR_FOURNISSEUR'] = pd.to_datetime(
-            df_concatenated['HOROD_ATTENTE_RETOUR_FOURNISSEUR'])
-        df_concatenated['HOROD_ATTENTE_DOC'] = pd.to_datetime(df_concatenated['HOROD_ATTENTE_DOC'])
-        df_concatenated['HOROD_ATTENTE_RETOUR_INTERNE'] = pd.to_datetime(
-            df_concatenated['HOROD_ATTENTE_RETOUR_INTERNE'])
-        df_concatenated['HOROD_LIGNE_INVALIDABLE'] = pd.to_datetime(df_concatenated['HOROD_LIGNE_INVALIDABLE'])
+        if id_lookup == "server":
+            # Only the IDs already present in the table come back from the database
+            existing_ids = self.select_existing_ids(df_excel['ID'], table_name)
+        else:
+            # Only the ID column of the table is downloaded, its rows are all filtered out of the result
+            existing_ids = self.select_from_table(table_name, columns=["ID"], reader="arrow")['ID']
+
+        # Keeps the new rows, with the columns of the table which are missing from the extract
+        table = self.get_table(table_name)
+        df_concatenated = df_excel[~df_excel['ID'].isin(existing_ids)].reindex(
+            columns=list(df_excel.columns) + [column for column in table.c.keys() if column not in df_excel])
+
+        # Conversion to the column types of the documents table, in a single pass, to avoid type issues
+        df_concatenated = self.coerce_to_schema(df_concatenated)
 
         self.logger.info("The two dataframes have been concatenated")
 
         # Saves the merged DataFrame in the specified database table
-        self.dataframe_to_sql(df_concatenated, table_name)
+        return self.dataframe_to_sql(df_concatenated, table_name, loader=loader)
+
+    def coerce_to_schema(self, dataframe):
+        """
+        Coerces a DataFrame to the column types of the documents table with `DocumentsSchema.coerce`, logging the
+        values which cannot be converted and the texts too long for their column
+
+        :param dataframe: The DataFrame to be coerced
+        :return: pandas.DataFrame: The coerced DataFrame
+        """
+
+        dataframe, issues = self.documents_schema.coerce(dataframe)
+
+        for column, index in issues['type'].items():
+            self.logger.error(f"{len(index)} values of the column {column} cannot be converted to "
+                              f"{self.documents_schema.columns[column]['type']}")
+        for column, index in issues['length'].items():
+            self.logger.error(f"{len(index)} values of the column {column} are longer than "
+                              f"{self.documents_schema.columns[column]['length']} characters")
+
+        return dataframe
+
+    def validate_rows(self, dataframe, source):
+        """
+        Coerces a DataFrame to the column types of the documents table and validates its rows with
+        `DocumentsSchema.validate`. The invalid rows are moved to the ingestion_quarantine table with their reasons, so
+        that a single bad value no longer makes the whole insert or update fail
+
+        :param dataframe: The DataFrame to be validated
+        :param source: The extraction type of the rows, recorded with the quarantined rows
+        :return: pandas.DataFrame: The valid rows, coerced
+        """
+
+        # The invalid rows are selected by their labels, which must then be unique
+        dataframe = dataframe.reset_index(drop=True)
+        coerced, reasons = self.documents_schema.validate(dataframe)
+        if reasons.empty:
+            return coerced
+
+        self.quarantine_rows(dataframe.loc[reasons.index], reasons, source)
+
+        # Number of rows per reason, a row with several reasons being counted for each
+        for reason, count in reasons.str.split('; ').explode().value_counts().items():
+            self.logger.error(f"{count} rows of {source} quarantined: {reason}")
+
+        return coerced.drop(index=reasons.index)
+
+    def quarantine_rows(self, dataframe, reasons, source):
+        """
+        Records rejected rows in the ingestion_quarantine table, with their original values as JSON
+
+        :param dataframe: The rejected rows, as they were before being coerced
+        :param reasons: The reasons of each row, indexed like the DataFrame
+        :param source: The extraction type of the rows
+        """
+
+        values = dataframe.astype(object).where(dataframe.notna(), None)
+        quarantined_at = datetime.now()
+        records = [{'SOURCE': source, 'ID': None if row.get('ID') is None else str(row.get('ID'))[:25],
+                    'REASONS': reason, 'ROW_DATA': json.dumps(row, ensure_ascii=False, default=str),
+                    'QUARANTINED_AT': quarantined_at}
+                   for row, reason in zip(values.to_dict('records'), reasons[dataframe.index])]
+
+        try:
+            with self.engine.begin() as connection:
+                quarantine_table.create(connection, checkfirst=True)
+                connection.execute(insert(quarantine_table), records)
+            self.logger.info(f"{len(records)} rows of {source} written to the {quarantine_table.name} table")
+        except Exception as e:
+            # The rows are still left out of the write, the reasons stay in the log
+            self.logger.error(f"An error occurred while quarantining the rows of {source}: {e}")
+
+    @staticmethod
+    def compute_row_hashes(dataframe):
+        """
+        Computes a 64-bit content hash of each row of a DataFrame, in a single vectorised pass over its columns
 
-    def update_database_from_dataframe(self, dataframe, table_name):
+        :param dataframe: The DataFrame whose rows are hashed
+        :return: pandas.Series: The signed 64-bit hash of each row, indexed like the DataFrame
+        """
+
+        # Columns sorted by name so that the hash does not depend on the column order of the extract
+        hashes = pd.util.hash_pandas_object(dataframe[sorted(dataframe.columns)], index=False)
+
+        # Unsigned hashes reinterpreted as signed integers to fit in a BIGINT column
+        return hashes.astype('int64')
+
+    def detect_changes(self, dataframe, source, count_vanished=True):
+        """
+        Compares the content hash of each incoming row with the hash stored for its ID by the previous ingestion of
+        the same source. The incoming hashes are copied into a temporary staging table and compared inside PostgreSQL
+
+        :param dataframe: The formatted DataFrame of the source
+        :param source: The extraction type of the DataFrame, the hashes of each source being stored separately
+        :param count_vanished: Whether the stored IDs missing from the DataFrame are counted, which is only meaningful
+        when the DataFrame holds the whole extract and not a chunk of it
+
+        :return: tuple: The new and changed rows of the DataFrame, their hashes as an ID/HASH DataFrame to be stored
+        with `store_row_hashes` once written, and the counts of new, changed, unchanged and vanished rows
+        """
+
+        ingestion_hashes_table.create(self.engine, checkfirst=True)
+
+        row_hashes = pd.DataFrame({'ID': dataframe['ID'], 'HASH': self.compute_row_hashes(dataframe)})
+
+        # Temporary staging table holding the incoming hashes, dropped at the end of the transaction
+        staging_table = Table("staging_hashes", MetaData(), Column("ID", String(25)), Column("HASH", BigInteger),
+                              prefixes=["TEMPORARY"], postgresql_on_commit="DROP")
+        stored_hashes = ingestion_hashes_table.alias("stored_hashes")
+        join_condition = (stored_hashes.c.SOURCE == source) & (stored_hashes.c.ID == staging_table.c.ID)
+
+        with self.engine.begin() as connection:
+            self.backend.create_staging_table(connection, staging_table)
+            self.backend.write_rows(connection, row_hashes, staging_table)
+
+            # IDs whose hash is missing (new row) or different (changed row)
+            delta = connection.execute(
+                select(staging_table.c.ID, stored_hashes.c.HASH.is_(None)).
+                select_from(staging_table.outerjoin(stored_hashes, join_condition)).
+                where(stored_hashes.c.HASH.is_distinct_from(staging_table.c.HASH))
+            ).all()
+
+            # IDs ingested previously for this source which are no longer in the extract
+            vanished_count = connection.execute(
+                select(func.count()).select_from(ingestion_hashes_table).where(
+                    (ingestion_hashes_table.c.SOURCE == source) &
+                    ~exists().where(staging_table.c.ID == ingestion_hashes_table.c.ID))
+            ).scalar() if count_vanished else None
+
+        delta_ids = {row_id for row_id, _ in delta}
+        new_count = sum(1 for _, is_new in delta if is_new)
+        counts = {
+            'new': new_count,
+            'changed': len(delta_ids) - new_count,
+            'unchanged': len(dataframe) - len(delta_ids),
+            'vanished': vanished_count,
+        }
+        self.logger.info(f"Change detection for {source}: {counts['new']} new, {counts['changed']} changed, "
+                         f"{counts['unchanged']} unchanged"
+                         f"{'' if vanished_count is None else f' and {vanished_count} vanished'} rows")
+
+        is_delta = dataframe['ID'].isin(delta_ids)
+        return dataframe[is_delta], row_hashes[is_delta], counts
+
+    def store_row_hashes(self, row_hashes, source, batch_size=10000):
+        """
+        Stores the content hashes of the rows written to the database, replacing the previous hash of each ID
+
+        :param row_hashes: The ID/HASH DataFrame returned by `detect_changes`
+        :param source: The extraction type of the rows
+        :param batch_size: Number of hashes sent at once
+        """
+
+        records = [{'SOURCE': source, 'ID': row_id, 'HASH': int(row_hash)}
+                   for row_id, row_hash in zip(row_hashes['ID'], row_hashes['HASH'])]
+        stmt = self.backend.upsert(ingestion_hashes_table, ['SOURCE', 'ID'], ['HASH'])
+
+        with self.engine.begin() as connection:
+            for start in range(0, len(records), batch_size):
+                connection.execute(stmt, records[start:start + batch_size])
+
+        self.logger.info(f"{len(records)} row hashes stored for {source}")
+
+    def update_database_from_dataframe(self, dataframe, table_name, mode="row", batch_size=10000,
+                                       batch_tracker=None):
         """
         Update existing rows in a PostgreSQL table from a pandas DataFrame
 
         :param dataframe: The DataFrame containing the data to be used for updating
         :param table_name: The name of the table in the database to be updated
+        :param mode: 'row' sends one UPDATE statement per row, 'bulk' stages the DataFrame in a temporary table and
+        applies it with a set-based UPDATE ... FROM statement
+        :param batch_size: Number of rows staged and applied at once in 'bulk' mode
+        :param batch_tracker: An optional `BatchTracker` of the run in 'bulk' mode, each batch is then committed on its
+        own and the batches already applied by a previous attempt are skipped
+
+        :return: bool: True if the rows have been updated, False if an error occurred
         """
 
-        # Creates a `Table` instance for the specified table, using the database engine and metadata
-        table = Table(table_name, self.metadata, autoload_with=self.engine)
+        # `Table` instance of the specified table
+        table = self.get_table(table_name)
+
+        if mode == "bulk":
+            return self.bulk_update_from_dataframe(dataframe, table, batch_size, batch_tracker)
 
         # Prepares an SQLAlchemy session to interact with the database
-        session_maker = sessionmaker(bind=self.engine)
-        session = session_maker()
+        session = self.session_maker()
         try:
             # Iteration on each line of the DataFrame to update line by line
             for index, row in dataframe.iterrows():
@@ -285,10 +635,86 @@ class DatabaseManager:
             # Applies all changes made in this session to the database
             session.commit()
             self.logger.info(f"The existing data has been successfully updated in the {table_name} table")
+            return True
         except Exception as e:
             # In the event of an error, cancels all modifications made during this session
             session.rollback()
             self.logger.error(f"An error occurred while updating the data: {e}")
+            return False
         finally:
             # Closes the session to release resources
             session.close()
+
+    def bulk_update_from_dataframe(self, dataframe, table, batch_size=10000, batch_tracker=None):
+        """
+        Update existing rows of a table from a pandas DataFrame with set-based statements. Each batch is inserted
+        into a temporary staging table, then applied to the target table with a single UPDATE ... FROM statement
+
+        :param dataframe: The DataFrame containing the data to be used for updating
+        :param table: The reflected `Table` instance to be updated
+        :param batch_size: Number of rows staged and applied at once
+        :param batch_tracker: An optional `BatchTracker`, each batch is then committed on its own and recorded, and the
+        batches already applied are skipped
+
+        :return: bool: True if the rows have been updated, False if an error occurred
+        """
+
+        # Only the columns that exist in the target table are staged
+        columns = [column for column in dataframe.columns if column in table.c]
+
+        # Temporary staging table with the same column types as the target table, dropped at the end of the transaction
+        staging_table = Table(f"staging_{table.name}", MetaData(),
+                              *[Column(column, table.c[column].type) for column in columns],
+                              prefixes=["TEMPORARY"], postgresql_on_commit="DROP")
+
+        # Set-based statement updating every row of the target table whose ID is present in the staging table
+        stmt = (
+            update(table).
+            where(table.c.ID == staging_table.c.ID).
+            values({column: staging_table.c[column] for column in columns if column != 'ID'})
+        )
+
+        # Replaces NaN or NaT values with None once for the whole DataFrame instead of row by row
+        records = dataframe[columns].astype(object)
+        records = records.where(dataframe[columns].notna(), None)
+
+        def apply_batch(connection, batch_number, start):
+            batch_start_time = time.perf_counter()
+
+            # Stage the batch, apply it to the target table, then empty the staging table for the next batch
+            batch = records.iloc[start:start + batch_size].to_dict('records')
+            connection.execute(insert(staging_table), batch)
+            result = connection.execute(stmt)
+            connection.execute(delete(staging_table))
+
+            self.logger.info(f"Batch {batch_number}: {len(batch)} rows staged, {result.rowcount} rows updated "
+                             f"in {time.perf_counter() - batch_start_time:.3f} seconds")
+            return result.rowcount
+
+        batch_starts = list(enumerate(range(0, len(records), batch_size), start=1))
+
+        try:
+            updated_rows = 0
+            if batch_tracker is None:
+                # A single transaction covers every batch, so a failure leaves the table untouched
+                with self.engine.begin() as connection:
+                    self.backend.create_staging_table(connection, staging_table)
+                    for batch_number, start in batch_starts:
+                        updated_rows += apply_batch(connection, batch_number, start)
+            else:
+                # Each batch is committed then recorded, so that a resumed run only applies the remaining batches
+                for batch_number, start in batch_starts:
+                    if batch_tracker.is_applied(batch_number):
+                        self.logger.info(f"Batch {batch_number}: already applied, skipped")
+                        continue
+                    with self.engine.begin() as connection:
+                        self.backend.create_staging_table(connection, staging_table)
+                        updated_rows += apply_batch(connection, batch_number, start)
+                    batch_tracker.mark_applied(batch_number)
+
+            self.logger.info(f"The existing data has been successfully updated in the {table.name} table "
+                             f"({updated_rows} rows)")
+            return True
+        except Exception as e:
+            self.logger.error(f"An error occurred while updating the data: {e}")
+            return False
@@ -0,0 +1,179 @@
+import os
+import re
+import pandas as pd
+from sqlalchemy import Table, Column, String, BigInteger, Integer, Date
+pd.options.mode.copy_on_write = True
+
+# SQL script creating the tables of the database
+create_table_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'SQL', 'create_table.sql')
+
+# Column definition of a CREATE TABLE statement, e.g. '"FOURNISSEUR" character varying(100),'
+column_pattern = re.compile(r'^\s*"(\w+)"\s+(character varying|bigint|integer|date)(?:\((\d+)\))?(\s+NOT NULL)?,?\s*$')
+
+# SQLAlchemy type of each column type of the script
+column_types = {'bigint': BigInteger, 'integer': Integer, 'date': Date}
+
+# Any column definition, to report those whose type or clauses are not supported by `column_pattern`
+column_line_pattern = re.compile(r'^\s*"(\w+)"')
+
+# Primary key definition of a CREATE TABLE statement, e.g. 'PRIMARY KEY ("ID")'
+primary_key_pattern = re.compile(r'PRIMARY KEY \(([^)]*)\)')
+
+
+class DocumentsSchema:
+    def __init__(self, table_name="documents", sql_path=create_table_path):
+        """
+        Column types of a table, read from its CREATE TABLE statement in `create_table.sql`, used to coerce a
+        DataFrame to the types of the table before it is written. A column whose type or clauses are not supported
+        raises a ValueError, rather than being left out of the coercion and of the declared table
+
+        :param table_name: The name of the table in the SQL script
+        :param sql_path: The path of the SQL script creating the tables
+        """
+
+        self.table_name = table_name
+        self.columns = {}
+        self.primary_key = []
+
+        with open(sql_path, encoding='utf-8') as sql_file:
+            statement = re.search(rf'CREATE TABLE public\.{table_name}\s*\((.*?)\n\);', sql_file.read(), re.DOTALL)
+
+        for line in statement.group(1).splitlines():
+            column = column_pattern.match(line)
+            if column:
+                name, sql_type, length, not_null = column.groups()
+                self.columns[name] = {'type': 'varchar' if sql_type == 'character varying' else sql_type,
+                                      'length': int(length) if length else None,
+                                      'nullable': not_null is None}
+                continue
+
+            unsupported_column = column_line_pattern.match(line)
+            if unsupported_column:
+                raise ValueError(f"Unsupported definition of the {unsupported_column.group(1)} column of the "
+                                 f"{table_name} table: {line.strip()!r}")
+
+            primary_key = primary_key_pattern.search(line)
+            if primary_key:
+                self.primary_key = [name.strip().strip('"') for name in primary_key.group(1).split(',')]
+
+        # Primary key columns cannot be null
+        for name in self.primary_key:
+            self.columns[name]['nullable'] = False
+
+    def to_table(self, metadata):
+        """
+        Declares the table in a SQLAlchemy MetaData from the column types of the script
+
+        :param metadata: The MetaData in which the table is declared
+        :return: sqlalchemy.Table: The declared table
+        """
+
+        columns = []
+        for name, column in self.columns.items():
+            column_type = String(column['length']) if column['type'] == 'varchar' else column_types[column['type']]()
+            columns.append(Column(name, column_type, primary_key=name in self.primary_key,
+                                  nullable=column['nullable']))
+
+        return Table(self.table_name, metadata, *columns)
+
+    @staticmethod
+    def as_text(series):
+        """
+        Converts a numeric column to text, integral floats being written without decimals as PostgreSQL would do.
+        Text and mixed columns are returned unchanged
+
+        :param series: The column to be converted
+        :return: pandas.Series: The column as Python strings and None
+        """
+
+        if pd.api.types.is_bool_dtype(series) or not pd.api.types.is_numeric_dtype(series):
+            return series
+
+        if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+            series = series.astype('Int64')
+
+        return series.astype('string').astype(object).where(series.notna(), None)
+
+    def coerce(self, df):
+        """
+        Coerces the columns of a DataFrame to the types of the table in a single pass, with explicit formats and
+        without converting dates to strings. The values which cannot be converted and the texts longer than their
+        VARCHAR column are reported at the same time
+
+        :param df: The DataFrame to be coerced, the columns which are not in the table are left unchanged
+        :return: tuple: The coerced DataFrame and a dictionary with the row index of the 'type' and 'length' issues of
+        each column
+        """
+
+        coerced = {}
+        issues = {'type': {}, 'length': {}}
+
+        for name, column in self.columns.items():
+            if name not in df:
+                continue
+            series = df[name]
+
+            match column['type']:
+                case 'date':
+                    # Dates are either already parsed or written as ISO 8601 strings by the formatting
+                    if not pd.api.types.is_datetime64_dtype(series):
+                        series = pd.to_datetime(series, format='ISO8601', errors='coerce')
+                    series = series.dt.normalize()
+                case 'bigint' | 'integer':
+                    series = pd.to_numeric(series, errors='coerce')
+                    # Non integral numbers are not valid integers either
+                    series = series.where(series % 1 == 0).astype('Int64')
+                case 'varchar':
+                    series = self.as_text(series)
+                    too_long = series.dropna().astype(str).str.len() > column['length']
+                    if too_long.any():
+                        issues['length'][name] = too_long.index[too_long]
+
+            # Values which were present but could not be converted
+            if column['type'] != 'varchar':
+                lost = df[name].notna() & series.isna()
+                if lost.any():
+                    issues['type'][name] = df.index[lost]
+
+            coerced[name] = series
+
+        return df.assign(**coerced), issues
+
+    def validate(self, df):
+        """
+        Coerces a DataFrame with `coerce`, then checks every row against the table in one vectorised pass per rule:
+        values which cannot be converted, texts too long for their column, missing values of the NOT NULL columns
+        and repeated primary keys, the first occurrence of a key being kept
+
+        :param df: The DataFrame to be validated, the columns which are not in the table are not checked
+        :return: tuple: The coerced DataFrame of every row, and the reasons of the invalid rows as a Series of texts
+        indexed like the DataFrame
+        """
+
+        # The rules select the rows by position, since the labels of the index may be repeated by a concatenation
+        coerced, issues = self.coerce(df.reset_index(drop=True))
+
+        # (rows, reason) of each rule, the rows being a boolean mask or an index
+        violations = []
+        for name, index in issues['type'].items():
+            violations.append((index, f"{name}: not a valid {self.columns[name]['type']}"))
+        for name, index in issues['length'].items():
+            violations.append((index, f"{name}: longer than {self.columns[name]['length']} characters"))
+        for name, column in self.columns.items():
+            if name in coerced and not column['nullable']:
+                violations.append((coerced[name].isna(), f"{name}: missing"))
+
+        primary_key = [name for name in self.primary_key if name in coerced]
+        if primary_key:
+            violations.append((coerced.duplicated(subset=primary_key, keep='first') &
+                               coerced[primary_key].notna().all(axis=1), f"{', '.join(primary_key)}: duplicate"))
+
+        # Reasons joined per row, only the rows breaking at least one rule are kept
+        reasons = pd.Series('', index=coerced.index, dtype=object)
+        for rows, reason in violations:
+            mask = rows.to_numpy() if isinstance(rows, pd.Series) else coerced.index.isin(rows)
+            reasons[mask] = reasons[mask] + reason + '; '
+
+        coerced.index = reasons.index = df.index
+        reasons = reasons[reasons != ''].str.rstrip('; ')
+        return coerced, reasons
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import pandas as pd
+from src.lists_initialisation import read_specs
+pd.options.mode.copy_on_write = True
+
+
+class ExtractCache:
+    # Version of the parsed extracts, to be increased when `read_extract` changes how it parses the files
+    version = 1
+
+    def __init__(self, cache_directory="./cache", max_size=2 * 1024 ** 3):
+        """
+        Local cache of parsed Excel extracts stored as Parquet files. An entry is keyed by the extraction type, the
+        version of its read specification and the fingerprint of the Excel file (path, size, modification time and
+        content hash), and the least recently used entries are evicted once the cache exceeds its maximum size. The
+        formatting is applied after the cache, so it never needs to invalidate the entries
+
+        :param cache_directory: The directory where the cached files are stored
+        :param max_size: The maximum size of the cache in bytes
+        """
+
+        self.cache_directory = cache_directory
+        self.max_size = max_size
+        os.makedirs(cache_directory, exist_ok=True)
+
+    @staticmethod
+    def fingerprint(file_path, block_size=1024 * 1024):
+        """
+        Computes the fingerprint of a file from its absolute path, size, modification time and content hash
+
+        :param file_path: The path of the file
+        :param block_size: Number of bytes hashed at once, so that the file is never fully loaded in memory
+
+        :return: str: The hexadecimal fingerprint of the file
+        """
+
+        stat = os.stat(file_path)
+
+        # Content hash computed block by block
+        content_hash = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(block_size), b''):
+                content_hash.update(block)
+
+        key = f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}|{content_hash.hexdigest()}"
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def spec_version(cls, df_type):
+        """
+        Computes the version of the read specification of an extraction type, which changes with `read_specs` or
+        with the version of the cache
+
+        :param df_type: The extraction type
+        :return: str: A short hexadecimal hash of the specification
+        """
+
+        spec = repr(sorted((key, repr(value)) for key, value in read_specs[df_type].items()))
+        return hashlib.sha256(f"{cls.version}|{spec}".encode('utf-8')).hexdigest()[:16]
+
+    def entry_paths(self, file_path, df_type, fingerprint=None):
+        """
+        Returns the paths of the Parquet file and of the JSON read report of a cache entry
+
+        :param file_path: The path of the Excel file
+        :param df_type: The extraction type of the file
+        :param fingerprint: The fingerprint of the file, computed from the file when it is not given
+
+        :return: tuple: The Parquet file path and the report file path
+        """
+
+        if fingerprint is None:
+            fingerprint = self.fingerprint(file_path)
+
+        entry_name = f"{df_type}_{self.spec_version(df_type)}_{fingerprint}"
+        return (os.path.join(self.cache_directory, f"{entry_name}.parquet"),
+                os.path.join(self.cache_directory, f"{entry_name}.json"))
+
+    def load(self, file_path, df_type, fingerprint=None):
+        """
+        Loads a parsed extract from the cache
+
+        :param file_path: The path of the Excel file
+        :param df_type: The extraction type of the file
+        :param fingerprint: The fingerprint of the file, so that a file read after a cache miss is hashed only once
+
+        :return: tuple: The cached DataFrame and its read report, or (None, None) if the file is not in the cache
+        """
+
+        parquet_path, report_path = self.entry_paths(file_path, df_type, fingerprint)
+        if not (os.path.exists(parquet_path) and os.path.exists(report_path)):
+            return None, None
+
+        df = pd.read_parquet(parquet_path)
+        with open(report_path, encoding='utf-8') as report_file:
+            report = json.load(report_file)
+
+        # The modification time of the entry marks its last use for the LRU eviction
+        os.utime(parquet_path)
+        os.utime(report_path)
+
+        return df, report
+
+    def store(self, file_path, df_type, df, report, fingerprint=None):
+        """
+        Stores a parsed extract and its read report in the cache, then evicts the least recently used entries if the
+        cache is larger than its maximum size
+
+        :param file_path: The path of the Excel file
+        :param df_type: The extraction type of the file
+        :param df: The parsed DataFrame
+        :param report: The read report returned by `read_extract`
+        :param fingerprint: The fingerprint of the file given to `load`, computed again when it is not given
+
+        :return: bool: True if the extract has been cached, False if it cannot be converted to Parquet
+        """
+
+        parquet_path, report_path = self.entry_paths(file_path, df_type, fingerprint)
+        try:
+            df.to_parquet(parquet_path, index=False)
+        except Exception:
+            # Columns mixing several Python types cannot be converted, the extract is then simply not cached
+            if os.path.exists(parquet_path):
+                os.remove(parquet_path)
+            return False
+
+        with open(report_path, 'w', encoding='utf-8') as report_file:
+            json.dump(report, report_file)
+
+        self.evict()
+        return True
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache size is below its maximum size
+        """
+
+        # Groups the Parquet file and the report of each entry, with their total size and last use
+        entries = {}
+        for file_name in os.listdir(self.cache_directory):
+            entry_name, extension = os.path.splitext(file_name)
+            if extension not in ('.parquet', '.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_directory, file_name))
+            except FileNotFoundError:
+                # Entry evicted in the meantime by another process sharing the cache
+                continue
+            size, last_use, files = entries.get(entry_name, (0, 0, []))
+            entries[entry_name] = (size + stat.st_size, max(last_use, stat.st_mtime_ns), files + [file_name])
+
+        cache_size = sum(size for size, _, _ in entries.values())
+
+        # Oldest entries first
+        for size, _, files in sorted(entries.values(), key=lambda entry: entry[1]):
+            if cache_size <= self.max_size:
+                break
+            for file_name in files:
+                try:
+                    os.remove(os.path.join(self.cache_directory, file_name))
+                except FileNotFoundError:
+                    pass
+            cache_size -= size
@@ -0,0 +1,142 @@
+import pandas as pd
+from src.composite_key import build_composite_key
+from src.extract_cache import ExtractCache
+from src.extract_reader import read_extract
+from src.pipeline_metrics import measure
+from src.lists_initialisation import (histo_perfo_column_to_delete, full_backlog_data_column_for_ID,
+                                      navy_check_column_for_ID, full_backlog_data_column_to_delete,
+                                      navy_check_column_to_delete, histo_perfo_column_for_ID)
+pd.options.mode.copy_on_write = True
+
+
+def format_extract(df, df_type, as_of=None):
+    """
+    Formats a DataFrame according to the extraction source. This formatting does not access the database, so it can
+    run in a worker process. The full_backlog_data rows which are new to the database are dated afterward by
+    `DatabaseManager.formatting_dataframe` or `DatabaseManager.date_new_backlog_rows`
+
+    :param df: The DataFrame to be formatted
+    :param df_type: The extraction type, which determines the specific formatting to be applied
+    :param as_of: The date of the extract, used instead of the current date for the 14-day window of the approved
+    histo_perfo rows and for their validation stamp, when archived extracts are replayed
+    :return: pandas.DataFrame: DataFrame formatted and filtered according to the specified type
+    """
+
+    # Initialization of the final filtered dataframe
+    df_filtered = pd.DataFrame()
+
+    # Date at which the extract is formatted, that of the extract when it is replayed
+    now = pd.Timestamp.now() if as_of is None else pd.Timestamp(as_of)
+
+    # Specific formatting according to extraction type
+    match df_type:
+        case "histo_perfo":
+            # Drop useless columns (already skipped when the file is read with `read_extract`)
+            df.drop(histo_perfo_column_to_delete, axis=1, inplace=True, errors='ignore')
+            # Delete null value for the PO_NUMBER column
+            df.dropna(subset=histo_perfo_column_for_ID[0], inplace=True)
+            # Create ID
+            df['ID'] = build_composite_key(df, histo_perfo_column_for_ID)
+
+            # Rename columns
+            df.rename(columns={'PO_NUMBER': 'NUMERO_COMMANDE', 'PO_LINE_NUMBER': 'LIGNE',
+                               'RELEASE_NUMBER': 'RELEASE', 'PO_JOB': 'NUMERO_PROJET',
+                               'CURR_PO_SUPPLIER': 'FOURNISSEUR', 'PO_LINE_DESCRIPTION': 'DESCRIPTION',
+                               'FIRST_MAT_DELIVERY_DATE': 'DATE_RECEPTION_MATERIEL',
+                               'FIRST_ISP': 'DATE_OBTENTION_DOC'}, inplace=True)
+
+            df['LAST_EDM_MANAGEMENT_DATE'] = pd.to_datetime(df['LAST_EDM_MANAGEMENT_DATE'])
+            date_limite = now - pd.Timedelta(days=14)
+
+            # Apply a filter to select specific lines based on 'CURRENT_STATUS' and 'LAST_EDM_MANAGEMENT_DATE'
+            df_current_status_filter = df[df['CURRENT_STATUS'].isin(['In Approval']) | df['CURRENT_STATUS'].isna()]
+
+            df_approved_filter = df[df['CURRENT_STATUS'].isin(['APPROVED'])]
+            df_on_approved_filter_with_date = df_approved_filter[
+                df_approved_filter['LAST_EDM_MANAGEMENT_DATE'] >= date_limite]
+
+            # Concatenation of the two filtered dataframes
+            df_filtered = pd.concat([df_current_status_filter, df_on_approved_filter_with_date], ignore_index=True)
+
+            # Add new column with today's date for lines where CURRENT_STATUS is 'APPROVED'
+            current_date = now.normalize()
+            df_filtered['HOROD_CONTROLE_VALIDE_SYSTEME'] = pd.Series(current_date, index=df_filtered.index).where(
+                df_filtered['CURRENT_STATUS'] == 'APPROVED')
+
+            # Drop final useless columns
+            df_filtered.drop(['CURRENT_STATUS', 'LAST_EDM_MANAGEMENT_DATE'],
+                             axis=1, inplace=True)
+
+        case "full_backlog_data":
+            # Drop useless columns (already skipped when the file is read with `read_extract`)
+            df.drop(full_backlog_data_column_to_delete, axis=1, inplace=True, errors='ignore')
+            # Delete null value for the PO column
+            df.dropna(subset=full_backlog_data_column_for_ID[0], inplace=True)
+            # Create ID
+            df['ID'] = build_composite_key(df, full_backlog_data_column_for_ID)
+
+            # Rename columns
+            df.rename(columns={'PO': 'NUMERO_COMMANDE', 'LINE': 'LIGNE',
+                               'PROJECT_NUM': 'NUMERO_PROJET', 'VENDOR_NAME': 'FOURNISSEUR',
+                               'ACTUAL_MAT_DELIVERY_DATE': 'DATE_RECEPTION_MATERIEL'}, inplace=True)
+
+            # Application of a filter based on 'DATE_RECEPTION_MATERIEL'
+            # The rows new to the database are dated afterward by `DatabaseManager.formatting_dataframe`
+            df_filtered = df[df['DATE_RECEPTION_MATERIEL'].notna()]
+
+        case "navy_check":
+            # Drop useless columns (already skipped when the file is read with `read_extract`)
+            df.drop(navy_check_column_to_delete, axis=1, inplace=True, errors='ignore')
+            # Delete null value for the PO column
+            df.dropna(subset=navy_check_column_for_ID[0], inplace=True)
+            # Create ID
+            df['ID'] = build_composite_key(df, navy_check_column_for_ID)
+
+            # Kept as a datetime, the documents schema converts it to a date when the rows are written
+            df['MAX_RECEIVING_DATE'] = pd.to_datetime(df['MAX_RECEIVING_DATE'], format='%d/%m/%Y')
+
+            # Rename columns
+            df.rename(columns={'PO': 'NUMERO_COMMANDE', 'LINE_NUM': 'LIGNE', 'RELEASE_NUM': 'RELEASE',
+                               'DIST_PROJECT': 'NUMERO_PROJET', 'CURR_VENDOR_NAME': 'FOURNISSEUR',
+                               'MAX_RECEIVING_DATE': 'DATE_RECEPTION_MATERIEL'}, inplace=True)
+
+            # Application of filters based on 'FIRST_PO_APPROVED_DATE' and 'PO_REL_LINE_FIRST_APPRO_DATE'
+            df_filtered = df[df['FIRST_PO_APPROVED_DATE'].notna() & df['PO_REL_LINE_FIRST_APPRO_DATE'].notna()]
+
+            # Drop final useless columns
+            df_filtered.drop(['FIRST_PO_APPROVED_DATE', 'PO_REL_LINE_FIRST_APPRO_DATE'], axis=1,
+                             inplace=True)
+
+    # Delete duplicate IDs, keeping the first occurrence
+    df_filtered.drop_duplicates(subset=['ID'], keep='first', inplace=True)
+
+    return df_filtered
+
+
+def read_and_format_extract(file_path, df_type, cache_directory=None, cache_max_size=2 * 1024 ** 3, as_of=None):
+    """
+    Reads an Excel extract and formats it. This function is run by the worker processes of the parallel mode of
+    `main.py`, so it only receives picklable arguments and does not access the database
+
+    :param file_path: The path of the Excel file to be read
+    :param df_type: The extraction type, which determines the read specification and the formatting
+    :param cache_directory: The directory of the `ExtractCache` to be used, or None to always parse the Excel file
+    :param cache_max_size: The maximum size of the cache in bytes
+    :param as_of: The date of the extract given to `format_extract`, the current date by default
+    :return: tuple: The formatted DataFrame and the read report of `read_extract`, with the metrics of the read and
+    format stages under 'metrics'
+    """
+
+    cache = ExtractCache(cache_directory, cache_max_size) if cache_directory else None
+
+    # Measured here since the stages may run in a worker process, the records are written by the main process
+    with measure("read_extract", df_type) as read_metrics:
+        df_excel, read_report = read_extract(file_path, df_type, cache=cache)
+        read_metrics['rows_out'] = len(df_excel)
+
+    with measure("format_extract", df_type, rows_in=len(df_excel)) as format_metrics:
+        df_formatted = format_extract(df_excel, df_type, as_of=as_of)
+        format_metrics['rows_out'] = len(df_formatted)
+
+    read_report['metrics'] = [read_metrics, format_metrics]
+    return df_formatted, read_report
@@ -0,0 +1,69 @@
+import os
+import re
+from datetime import date, datetime
+
+# Dates found in the names of the archived extracts: 2024-03-31, 2024_03_31, 20240331, or 31-03-2024 as in French
+date_patterns = [
+    (re.compile(r"(?<!\d)(\d{4})[-_.]?(\d{2})[-_.]?(\d{2})(?!\d)"), (0, 1, 2)),
+    (re.compile(r"(?<!\d)(\d{2})[-_.](\d{2})[-_.](\d{4})(?!\d)"), (2, 1, 0)),
+]
+
+
+def extract_date(file_path):
+    """
+    Finds the date of an extract in its file name, or uses the date of its last modification when the name does not
+    contain one
+
+    :param file_path: The path of the extract file
+    :return: datetime.date: The date of the extract
+    """
+
+    file_name = os.path.basename(file_path)
+    for pattern, (year, month, day) in date_patterns:
+        for match in pattern.finditer(file_name):
+            parts = match.groups()
+            try:
+                return date(int(parts[year]), int(parts[month]), int(parts[day]))
+            except ValueError:
+                # Digits which are not a date, such as a project number
+                continue
+
+    return datetime.fromtimestamp(os.path.getmtime(file_path)).date()
+
+
+def find_historical_extracts(folders_path, file_types, since=None, until=None):
+    """
+    Finds every archived extract of the directories, not only the most recent one of each key, in the order in which
+    they must be replayed: by extract date, then Histo, Backlog and Navy as in a run of `main.py`, then by
+    modification time for the files of the same key and date
+
+    :param folders_path: The directory of each key, as in `main.py`
+    :param file_types: The extraction type of each key, as in `main.py`
+    :param since: The first extract date to be kept, or None
+    :param until: The last extract date to be kept, or None
+
+    :return: list: (extract date, file path, extraction type) tuples
+    """
+
+    key_order = {key: position for position, key in enumerate(file_types)}
+    extracts = {}
+
+    # The keys sharing a directory list it once
+    for directory in dict.fromkeys(folders_path.values()):
+        if not os.path.isdir(directory):
+            continue
+
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                # Lock files of Excel and hidden files are not extracts
+                if not entry.is_file() or entry.name.startswith(('~$', '.')):
+                    continue
+                for key, folder in folders_path.items():
+                    if folder == directory and key in entry.name:
+                        extracts[entry.path] = (extract_date(entry.path), key_order[key], entry.stat().st_mtime_ns,
+                                                file_types[key])
+                        break
+
+    ordered_paths = sorted(extracts, key=lambda path: extracts[path][:3])
+    return [(extracts[path][0], path, extracts[path][3]) for path in ordered_paths
+            if (since is None or extracts[path][0] >= since) and (until is None or extracts[path][0] <= until)]
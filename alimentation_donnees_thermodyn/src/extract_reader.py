@@ -0,0 +1,168 @@
+import os
+from itertools import islice
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from src.lists_initialisation import read_specs
+pd.options.mode.copy_on_write = True
+
+
+def read_extract(file_path, df_type, cache=None):
+    """
+    Reads an Excel extract according to the read specification of its source. The columns deleted by
+    `formatting_dataframe` are skipped by the reader, so they are never parsed nor held in memory
+
+    :param file_path: The path of the Excel file to be read
+    :param df_type: The extraction type, which determines the read specification to be applied
+    :param cache: An optional `ExtractCache`, from which the extract is loaded if the same file was already parsed
+
+    :return: tuple: The DataFrame read and a dictionary reporting the columns and the estimated bytes skipped
+    """
+
+    # A file already parsed is loaded from its Parquet copy instead of the Excel file, the file being hashed once for
+    # the lookup and the store of its entry
+    fingerprint = None
+    if cache is not None:
+        fingerprint = cache.fingerprint(file_path)
+        df, report = cache.load(file_path, df_type, fingerprint)
+        if df is not None:
+            report['cache_hit'] = True
+            return df, report
+
+    spec = read_specs[df_type]
+    columns_to_skip = set(spec['columns_to_skip'])
+
+    # The reader calls `usecols` once per header column, which records the columns actually present and skipped
+    skipped_columns = []
+
+    def keep_column(column):
+        if column in columns_to_skip:
+            skipped_columns.append(column)
+            return False
+        return True
+
+    # Date columns with an explicit format, the others are Excel dates converted by the reader
+    date_formats = {column: date_format for column, date_format in spec['date_formats'].items() if date_format}
+
+    df = pd.read_excel(file_path, header=0, usecols=keep_column, dtype=spec['dtype'],
+                       parse_dates=list(spec['date_formats']), date_format=date_formats or None)
+
+    # The skipped bytes are estimated from the average in-memory size of the columns read
+    bytes_read = int(df.memory_usage(index=False, deep=True).sum())
+    bytes_per_column = bytes_read / len(df.columns) if len(df.columns) else 0
+
+    report = {
+        'source': df_type,
+        'file_size': os.path.getsize(file_path),
+        'rows': len(df),
+        'columns_read': len(df.columns),
+        'columns_skipped': len(skipped_columns),
+        'skipped_columns': skipped_columns,
+        'bytes_read': bytes_read,
+        'estimated_bytes_skipped': int(bytes_per_column * len(skipped_columns)),
+        'cache_hit': False,
+    }
+
+    if cache is not None:
+        cache.store(file_path, df_type, df, report, fingerprint)
+
+    return df, report
+
+
+def key_column_dtypes(worksheet, key_columns):
+    """
+    Infers the types `pandas.read_excel` gives to the key columns of a whole sheet, by a first pass over its rows:
+    text or mixed columns are objects, numeric columns are floats when one of their values is missing or decimal
+
+    :param worksheet: The read-only openpyxl worksheet
+    :param key_columns: The names of the columns used to build the ID
+    :return: dict: The dtype of each key column present in the sheet
+    """
+
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, ())
+    positions = {column: header.index(column) for column in key_columns if column in header}
+    kinds = {column: set() for column in positions}
+
+    # Empty lines are read as missing values, except at the end of the sheet where `pandas.read_excel` drops them
+    pending_empty_line = False
+    for row in rows:
+        if all(value is None for value in row):
+            pending_empty_line = True
+            continue
+
+        for column, position in positions.items():
+            value = row[position] if position < len(row) else None
+            if value is None or pending_empty_line:
+                kinds[column].add('missing')
+            if value is not None:
+                is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+                kinds[column].add(('integer' if float(value).is_integer() else 'float') if is_number else 'other')
+        pending_empty_line = False
+
+    return {column: object if 'other' in column_kinds else
+            'float64' if column_kinds & {'missing', 'float'} or not column_kinds else 'int64'
+            for column, column_kinds in kinds.items()}
+
+
+def iter_extract_chunks(file_path, df_type, chunk_size=50000):
+    """
+    Reads an Excel extract by chunks of rows, with the same read specification as `read_extract`. The workbook is
+    streamed by openpyxl in read-only mode, so only one chunk of rows is held in memory at a time. The type of each
+    column is inferred per chunk, except for the key columns which are given the type inferred for the whole file
+    by `key_column_dtypes`, so that the IDs are those of `read_extract`
+
+    :param file_path: The path of the Excel file to be read
+    :param df_type: The extraction type, which determines the read specification to be applied
+    :param chunk_size: The number of rows of each chunk
+
+    :return: generator: The DataFrame of each chunk
+    """
+
+    spec = read_specs[df_type]
+    columns_to_skip = set(spec['columns_to_skip'])
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        key_dtypes = key_column_dtypes(workbook.worksheets[0], spec['key_columns'])
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+
+        # Positions of the columns read, the skipped columns are never converted to Python objects
+        header = next(rows, ())
+        positions = [position for position, column in enumerate(header)
+                     if column is not None and column not in columns_to_skip]
+        columns = [header[position] for position in positions]
+
+        while True:
+            chunk = [[row[position] if position < len(row) else None for position in positions]
+                     for row in islice(rows, chunk_size)]
+            if not chunk:
+                break
+
+            df = pd.DataFrame(chunk, columns=columns)
+            # Empty lines of the sheet are ignored, as by `pandas.read_excel`
+            df = df.dropna(how='all')
+
+            # Empty cells are NaN, as read by `pandas.read_excel`, rather than None
+            df = df.mask(df.isna(), np.nan)
+
+            for column, dtype in key_dtypes.items():
+                if dtype is object:
+                    # Integral numbers of a mixed column are integers, as converted by `pandas.read_excel`
+                    df[column] = pd.Series([int(value) if isinstance(value, float) and value.is_integer() else value
+                                            for value in df[column]], index=df.index, dtype=object)
+                else:
+                    df[column] = df[column].astype(dtype)
+
+            # Text columns keep their missing values, as with the `dtype` option of `pandas.read_excel`
+            for column, column_type in spec['dtype'].items():
+                if column in df:
+                    df[column] = df[column].where(df[column].isna(), df[column].astype(column_type))
+
+            for column, date_format in spec['date_formats'].items():
+                if column in df:
+                    df[column] = pd.to_datetime(df[column], format=date_format)
+
+            yield df
+    finally:
+        workbook.close()
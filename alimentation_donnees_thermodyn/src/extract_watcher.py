@@ -0,0 +1,94 @@
+import os
+import time
+
+
+class ExtractWatcher:
+    def __init__(self, folders_path, file_types, settle_seconds=30):
+        """
+        Watches the extract directories by polling. A directory is only listed again when its modification time
+        changes, that is when a file is added, renamed or removed, and only the extract files are then checked. A file
+        is reported once its size and modification time have not changed for `settle_seconds`, so that an extract
+        still being written or copied is not read
+
+        :param folders_path: The directory of each key, as in `main.py`
+        :param file_types: The extraction type of each key, as in `main.py`
+        :param settle_seconds: The time during which a file must not change before it is reported
+        """
+
+        self.folders_path = folders_path
+        self.file_types = file_types
+        self.settle_seconds = settle_seconds
+
+        # Modification time of each directory at its last listing, and the extract files found in it
+        self.directory_mtimes = {}
+        self.listings = {}
+
+        # (size, modification time) of each extract file when it was first seen with them, and since when
+        self.signatures = {}
+
+    def list_directory(self, directory):
+        """
+        Lists the extract files of a directory, reusing the previous listing when the directory has not changed
+
+        :param directory: The directory to be listed
+        :return: list: (file path, extraction type) tuples
+        """
+
+        try:
+            directory_mtime = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            return []
+
+        if self.directory_mtimes.get(directory) != directory_mtime:
+            listing = []
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    # Lock files of Excel and hidden files are not extracts
+                    if not entry.is_file() or entry.name.startswith(('~$', '.')):
+                        continue
+                    for key, folder in self.folders_path.items():
+                        if folder == directory and key in entry.name:
+                            listing.append((entry.path, self.file_types[key]))
+                            break
+
+            self.listings[directory] = listing
+            self.directory_mtimes[directory] = directory_mtime
+
+        return self.listings[directory]
+
+    def settled_files(self, now=None):
+        """
+        Returns the extract files which have not changed for `settle_seconds`
+
+        :param now: The current time, `time.monotonic()` by default
+        :return: list: (file path, extraction type, size, modification time in nanoseconds) tuples
+        """
+
+        now = time.monotonic() if now is None else now
+        settled = []
+        present = set()
+
+        for directory in dict.fromkeys(self.folders_path.values()):
+            for file_path, df_type in self.list_directory(directory):
+                try:
+                    file_stat = os.stat(file_path)
+                except FileNotFoundError:
+                    continue
+
+                present.add(file_path)
+                signature = (file_stat.st_size, file_stat.st_mtime_ns)
+
+                # The debounce starts again each time the file changes
+                previous_signature, since = self.signatures.get(file_path, (None, now))
+                if signature != previous_signature:
+                    self.signatures[file_path] = (signature, now)
+                    since = now
+
+                if now - since >= self.settle_seconds:
+                    settled.append((file_path, df_type, *signature))
+
+        # Files removed from the directories are forgotten
+        for file_path in set(self.signatures) - present:
+            del self.signatures[file_path]
+
+        return settled
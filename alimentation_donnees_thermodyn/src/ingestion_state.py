@@ -0,0 +1,96 @@
+import os
+import sqlite3
+from datetime import datetime
+
+
+class IngestionState:
+    def __init__(self, state_path="./state/ingestion_state.sqlite3", max_attempts=3):
+        """
+        Local SQLite store of the extract files already processed by the watch service, so that a file is ingested
+        once even when the service restarts. A file is identified by its path, size and modification time, so a file
+        overwritten with a new version is processed again
+
+        :param state_path: The path of the SQLite database file
+        :param max_attempts: The number of times a file which failed to be ingested is tried again
+        """
+
+        self.max_attempts = max_attempts
+
+        # Create the state directory if it doesn't already exist
+        state_directory = os.path.dirname(state_path)
+        if state_directory:
+            os.makedirs(state_directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(state_path)
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS processed_files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    df_type TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    processed_at TEXT NOT NULL
+                )
+            """)
+
+    def is_processed(self, path, size, mtime_ns):
+        """
+        Checks whether this version of a file does not need to be processed any more: it has been ingested or
+        superseded by a more recent file, or it failed too many times
+
+        :param path: The path of the file
+        :param size: The size of the file in bytes
+        :param mtime_ns: The modification time of the file in nanoseconds
+        :return: bool: True if the file must not be processed
+        """
+
+        row = self.connection.execute(
+            "SELECT status, attempts FROM processed_files WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (path, size, mtime_ns)).fetchone()
+
+        if row is None:
+            return False
+
+        status, attempts = row
+        return status != 'failed' or attempts >= self.max_attempts
+
+    def last_ingested_mtime(self, df_type):
+        """
+        Returns the modification time of the most recent file of an extraction type already ingested, so that an older
+        file arriving late is not ingested over newer data
+
+        :param df_type: The extraction type
+        :return: int: The modification time in nanoseconds, or None if no file of this type was ingested
+        """
+
+        return self.connection.execute(
+            "SELECT max(mtime_ns) FROM processed_files WHERE df_type = ? AND status = 'ingested'",
+            (df_type,)).fetchone()[0]
+
+    def mark(self, path, size, mtime_ns, df_type, status):
+        """
+        Records the outcome of the processing of a file
+
+        :param path: The path of the file
+        :param size: The size of the file in bytes
+        :param mtime_ns: The modification time of the file in nanoseconds
+        :param df_type: The extraction type of the file
+        :param status: 'ingested', 'superseded' when a more recent file of the same type was ingested instead, or
+        'failed'
+        """
+
+        # The failed attempts are counted for the same version of the file only
+        row = self.connection.execute(
+            "SELECT attempts FROM processed_files WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (path, size, mtime_ns)).fetchone()
+        attempts = (row[0] if row else 0) + 1
+
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO processed_files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, size, mtime_ns, df_type, status, attempts, datetime.now().isoformat(timespec='seconds')))
+
+    def close(self):
+        self.connection.close()
@@ -29,3 +29,30 @@ navy_check_column_to_delete = ['PO_CURRENT_BUYER', 'PO_CURRENT_SPA_SFM', 'PO_CRE
                                'SHIP_CLOSURE_STATUS', 'SHIPMENT_NUM']
 
 navy_check_column_for_ID = ['PO', 'LINE_NUM', 'RELEASE_NUM', 'DIST_PROJECT']
+
+# Excel read specifications #
+# 'columns_to_skip' are never parsed by the reader, 'dtype' forces the type of text columns and 'date_formats' lists the
+# date columns parsed by the reader (None when the cell is an Excel date)
+# The columns used to build the ID keep the type inferred by the reader so that the IDs stay identical, 'key_columns'
+# lists them so that a file read by chunks gives them the type inferred for the whole file
+
+read_specs = {
+    'histo_perfo': {
+        'columns_to_skip': histo_perfo_column_to_delete,
+        'dtype': {'CURR_PO_SUPPLIER': str, 'PO_LINE_DESCRIPTION': str, 'CURRENT_STATUS': str},
+        'date_formats': {'LAST_EDM_MANAGEMENT_DATE': None},
+        'key_columns': histo_perfo_column_for_ID,
+    },
+    'full_backlog_data': {
+        'columns_to_skip': full_backlog_data_column_to_delete,
+        'dtype': {'VENDOR_NAME': str},
+        'date_formats': {},
+        'key_columns': full_backlog_data_column_for_ID,
+    },
+    'navy_check': {
+        'columns_to_skip': navy_check_column_to_delete,
+        'dtype': {'CURR_VENDOR_NAME': str},
+        'date_formats': {'MAX_RECEIVING_DATE': '%d/%m/%Y'},
+        'key_columns': navy_check_column_for_ID,
+    },
+}
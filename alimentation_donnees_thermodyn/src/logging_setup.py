@@ -0,0 +1,147 @@
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+from datetime import datetime
+
+# Logger shared by every DatabaseManager and the scripts
+logger_name = 'DataManager'
+
+# Listener of the configured logging, None until `configure_logging` is called
+logging_state = {'listener': None, 'queue_handler': None, 'log_directory': None}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats each record as a JSON object on one line, with the `extra` fields passed to the logging call
+    """
+
+    # Attributes of every LogRecord, the other attributes come from `extra`
+    record_attributes = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in self.record_attributes})
+
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class InProcessQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts the records on the queue as they are, for a listener thread of the same process
+    """
+
+    def prepare(self, record):
+        # The default `prepare` formats the record in the calling thread, which is only needed by another process
+        return record
+
+
+def gzip_rotator(source, destination):
+    """
+    Compresses a rotated log file, called by the rotating handlers in the listener thread
+
+    :param source: The path of the log file which has just been rotated
+    :param destination: The path of the compressed file
+    """
+
+    with open(source, 'rb') as source_file, gzip.open(destination, 'wb') as destination_file:
+        shutil.copyfileobj(source_file, destination_file)
+    os.remove(source)
+
+
+def rotating_file_handler(path, level, formatter, max_bytes, backup_count):
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                   encoding='utf-8', delay=True)
+    handler.setLevel(level)
+    handler.setFormatter(formatter)
+
+    # The rotated files are compressed, as info_<date>.log.1.gz
+    handler.namer = lambda name: f"{name}.gz"
+    handler.rotator = gzip_rotator
+    return handler
+
+
+def configure_logging(log_directory="./logs", log_format="text", level=logging.INFO, max_bytes=10 * 1024 ** 2,
+                      backup_count=10):
+    """
+    Configures the 'DataManager' logger once per process, with log files written by a background `QueueListener`
+
+    :param log_directory: The directory of the INFO and ERROR log files
+    :param log_format: 'text' for 'time - level - message' lines, 'json' for one JSON object per line
+    :param level: The lowest level written to the INFO file, logging.DEBUG to also write the debug records
+    :param max_bytes: The size above which a log file is rotated
+    :param backup_count: The number of compressed rotated files kept per log file
+
+    :return: logging.Logger: The 'DataManager' logger
+    """
+
+    # Calling it again returns the configured logger without adding handlers
+    logger = logging.getLogger(logger_name)
+    if logging_state['listener'] is not None:
+        return logger
+
+    # Create the directories for log files if they don't already exist
+    os.makedirs(f'{log_directory}/INFO', exist_ok=True)
+    os.makedirs(f'{log_directory}/ERROR', exist_ok=True)
+
+    # Current date for naming log files
+    current_date = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+
+    if log_format == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+    # Log files for INFO and for ERROR, written by the listener thread only
+    file_handlers = [
+        rotating_file_handler(f'{log_directory}/INFO/info_{current_date}.log', level, formatter, max_bytes,
+                              backup_count),
+        rotating_file_handler(f'{log_directory}/ERROR/error_{current_date}.log', logging.ERROR, formatter,
+                              max_bytes, backup_count),
+    ]
+
+    # The logger only enqueues the records, they are formatted and written in the listener thread. The records below
+    # the level are dropped by the logger itself, before being created
+    log_queue = queue.SimpleQueue()
+    queue_handler = InProcessQueueHandler(log_queue)
+    logger.addHandler(queue_handler)
+    logger.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, *file_handlers, respect_handler_level=True)
+    listener.start()
+
+    logging_state.update(listener=listener, queue_handler=queue_handler, log_directory=log_directory)
+
+    # The remaining records are written when the process exits
+    atexit.unregister(stop_logging)
+    atexit.register(stop_logging)
+    return logger
+
+
+def stop_logging():
+    """
+    Writes the queued records, then stops the listener and closes the log files
+    """
+
+    listener = logging_state['listener']
+    if listener is None:
+        return
+
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+    logging.getLogger(logger_name).removeHandler(logging_state['queue_handler'])
+    logging_state.update(listener=None, queue_handler=None, log_directory=None)
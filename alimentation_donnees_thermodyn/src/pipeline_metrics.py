@@ -0,0 +1,200 @@
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, the peak memory is then not recorded
+    resource = None
+
+# Metrics exported to the Prometheus textfile: (record key, metric name, help text)
+prometheus_metrics = [
+    ('wall_seconds', 'thermodyn_etl_stage_wall_seconds', 'Wall time of the stage in seconds'),
+    ('cpu_seconds', 'thermodyn_etl_stage_cpu_seconds', 'CPU time of the process during the stage in seconds'),
+    ('rows_in', 'thermodyn_etl_stage_rows_in', 'Number of rows given to the stage'),
+    ('rows_out', 'thermodyn_etl_stage_rows_out', 'Number of rows produced by the stage'),
+    ('peak_rss_bytes', 'thermodyn_etl_stage_peak_rss_bytes', 'Peak resident memory of the process during the stage'),
+    ('process_peak_rss_bytes', 'thermodyn_etl_stage_process_peak_rss_bytes',
+     'Peak resident memory of the process since it started, at the end of the stage'),
+]
+
+# Highest peak resident memory of the process before the last reset of its peak
+process_peak_before_reset = 0
+
+# Peak resident memory reached by each stage being measured in this process before the last reset, the innermost last,
+# or None for the stages whose peak could not be reset
+open_stage_peaks = []
+
+
+def current_peak_memory():
+    """
+    Returns the peak resident memory of the current process since it started or since the last `reset_peak_memory`
+
+    :return: int: The peak resident set size in bytes, or None when it cannot be measured on this platform
+    """
+
+    if resource is None:
+        return None
+
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+def peak_memory():
+    """
+    Returns the peak resident memory of the current process since it started, including the peaks before the resets
+
+    :return: int: The peak resident set size in bytes, or None when it cannot be measured on this platform
+    """
+
+    peak = current_peak_memory()
+    return None if peak is None else max(peak, process_peak_before_reset)
+
+
+def reset_peak_memory():
+    """
+    Resets the peak resident memory of the current process, only possible on Linux through /proc/self/clear_refs
+
+    :return: bool: True if the peak has been reset
+    """
+
+    global process_peak_before_reset
+
+    peak = current_peak_memory()
+    if peak is None or not sys.platform.startswith('linux'):
+        return False
+
+    # The peak reached until now is kept for `peak_memory` and for the stages being measured
+    process_peak_before_reset = max(process_peak_before_reset, peak)
+    for stage_peak in open_stage_peaks:
+        if stage_peak is not None:
+            stage_peak['peak'] = max(stage_peak['peak'], peak)
+
+    try:
+        with open('/proc/self/clear_refs', 'w', encoding='ascii') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        return False
+
+    return True
+
+
+@contextmanager
+def measure(stage, source=None, rows_in=None):
+    """
+    Measures the wall time, CPU time and peak memory of a block of code, without writing the record
+
+    :param stage: The name of the stage
+    :param source: The extraction type processed by the stage, if any
+    :param rows_in: The number of rows given to the stage, if known
+
+    :return: dict: The record of the stage, filled when the block ends
+    """
+
+    record = {'stage': stage, 'source': source, 'rows_in': rows_in, 'rows_out': None, 'status': 'ok'}
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+
+    # The peak of the process is reset so that the peak of this stage does not include those of the previous stages
+    stage_peak = {'peak': 0} if reset_peak_memory() else None
+    open_stage_peaks.append(stage_peak)
+
+    try:
+        yield record
+    except Exception:
+        record['status'] = 'error'
+        raise
+    finally:
+        record['wall_seconds'] = round(time.perf_counter() - start_wall, 6)
+        record['cpu_seconds'] = round(time.process_time() - start_cpu, 6)
+        open_stage_peaks.pop()
+        # The peak of the stage is unknown when the peak of the process cannot be reset on this platform
+        record['peak_rss_bytes'] = max(stage_peak['peak'], current_peak_memory()) if stage_peak is not None else None
+        record['process_peak_rss_bytes'] = peak_memory()
+        record['pid'] = os.getpid()
+
+
+class PipelineMetrics:
+    def __init__(self, metrics_directory="./logs/METRICS", prometheus_path=None):
+        """
+        Collects the metrics of the stages of an ETL run, appended as JSON lines as soon as each stage ends
+
+        :param metrics_directory: The directory of the JSON-lines files, next to the INFO and ERROR logs
+        :param prometheus_path: The path of the textfile read by the node_exporter textfile collector, or None
+        """
+
+        self.run_id = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        self.prometheus_path = prometheus_path
+        self.records = []
+
+        # Create the metrics directory if it doesn't already exist
+        os.makedirs(metrics_directory, exist_ok=True)
+        self.metrics_path = os.path.join(metrics_directory, f'metrics_{self.run_id}.jsonl')
+
+    @contextmanager
+    def stage(self, stage, source=None, rows_in=None):
+        """
+        Measures a stage with `measure` and records it when it ends, even if it fails
+
+        :param stage: The name of the stage
+        :param source: The extraction type processed by the stage, if any
+        :param rows_in: The number of rows given to the stage, if known
+
+        :return: dict: The record of the stage, to be completed by the block
+        """
+
+        try:
+            with measure(stage, source, rows_in) as record:
+                yield record
+        finally:
+            self.record(record)
+
+    def record(self, record):
+        """
+        Adds the record of a stage to the run and appends it to the JSON-lines file
+
+        :param record: The record of a stage, as built by `measure`
+        """
+
+        record = {'run_id': self.run_id, 'timestamp': datetime.now().isoformat(timespec='seconds'), **record}
+        self.records.append(record)
+
+        with open(self.metrics_path, 'a', encoding='utf-8') as metrics_file:
+            metrics_file.write(json.dumps(record, default=str) + '\n')
+
+    def write_prometheus(self):
+        """
+        Writes the metrics of the run to the Prometheus textfile, if one is configured
+
+        :return: bool: True if the textfile has been written, False otherwise
+        """
+
+        if not self.prometheus_path:
+            return False
+
+        lines = []
+        for key, metric, help_text in prometheus_metrics:
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} gauge')
+            for record in self.records:
+                if record.get(key) is None:
+                    continue
+                labels = f'stage="{record["stage"]}",source="{record["source"] or ""}"'
+                lines.append(f'{metric}{{{labels}}} {record[key]}')
+
+        lines.append('# HELP thermodyn_etl_last_run_timestamp_seconds End time of the last ETL run')
+        lines.append('# TYPE thermodyn_etl_last_run_timestamp_seconds gauge')
+        lines.append(f'thermodyn_etl_last_run_timestamp_seconds {time.time():.0f}')
+
+        # Replaced atomically, the collector never reads a partial file
+        temporary_path = f'{self.prometheus_path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as textfile:
+            textfile.write('\n'.join(lines) + '\n')
+        os.replace(temporary_path, self.prometheus_path)
+
+        return True
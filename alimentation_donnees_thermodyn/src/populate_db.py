@@ -41,6 +41,6 @@ df_excel['CONSULTANT'] = (df_excel['CONSULTANT'].str.normalize('NFKD').str.encod
 # df_excel['STATUT'] = df_excel['STATUT'].fillna("En cours")
 
 # Put data into the PostgreSQL database
-db_manager.dataframe_to_sql(df_excel, table_name='documents')
+db_manager.dataframe_to_sql(df_excel, table_name='documents', loader='copy')
 
 print("Données importées")
@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+from src.documents_schema import DocumentsSchema
+from src.logging_setup import logger_name
+pd.options.mode.copy_on_write = True
+
+
+class BatchTracker:
+    def __init__(self, checkpoint, key):
+        """
+        Batches of a write already applied to the database, recorded in the checkpoint of a run so that a resumed run
+        does not apply them again
+
+        :param checkpoint: The RunCheckpoint of the run
+        :param key: The key of the write in the checkpoint, which must include the batch size
+        """
+
+        self.checkpoint = checkpoint
+        self.key = key
+
+    def is_applied(self, batch_number):
+        return batch_number in self.checkpoint.manifest['batches'].get(self.key, [])
+
+    def mark_applied(self, batch_number):
+        self.checkpoint.manifest['batches'].setdefault(self.key, []).append(batch_number)
+        self.checkpoint.write_manifest()
+
+
+class RunCheckpoint:
+    def __init__(self, checkpoint_directory="./checkpoints", run_id=None, files=None, settings=None, schema=None):
+        """
+        Checkpoint of an ETL run: the output of each completed stage is persisted under the run ID, with a manifest
+        of the completed stages and of the applied batches, so that a failed run can be resumed from where it stopped
+
+        :param checkpoint_directory: The directory holding one subdirectory per run
+        :param run_id: The ID of the run to be resumed, or None to start a new run
+        :param files: The (file path, extraction type) tuples of a new run, a resumed run keeps its own files
+        :param settings: The JSON settings of a new run which a resumed run must reuse, such as the chunk size
+        :param schema: The DocumentsSchema of the frames, the documents table by default
+        """
+
+        self.checkpoint_directory = checkpoint_directory
+        self.schema = schema or DocumentsSchema()
+        self.logger = logging.getLogger(logger_name)
+        self.run_id = run_id or datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        self.run_directory = os.path.join(checkpoint_directory, self.run_id)
+        self.manifest_path = os.path.join(self.run_directory, "manifest.json")
+
+        if run_id is not None:
+            with open(self.manifest_path, encoding='utf-8') as manifest_file:
+                self.manifest = json.load(manifest_file)
+        else:
+            os.makedirs(self.run_directory, exist_ok=True)
+            self.manifest = {'run_id': self.run_id, 'status': 'running',
+                             'files': [list(extract_file) for extract_file in files or []],
+                             'settings': settings or {}, 'stages': {}, 'batches': {}}
+            self.write_manifest()
+
+    @property
+    def files(self):
+        return [tuple(extract_file) for extract_file in self.manifest['files']]
+
+    @property
+    def settings(self):
+        return self.manifest['settings']
+
+    @staticmethod
+    def latest_unfinished_run(checkpoint_directory="./checkpoints"):
+        """
+        Finds the most recent run which did not finish
+
+        :param checkpoint_directory: The directory holding one subdirectory per run
+        :return: str: The ID of the run, or None if every run finished
+        """
+
+        if not os.path.exists(checkpoint_directory):
+            return None
+
+        # The run IDs are timestamps, so their order is the order of the runs
+        for run_id in sorted(os.listdir(checkpoint_directory), reverse=True):
+            manifest_path = os.path.join(checkpoint_directory, run_id, "manifest.json")
+            if not os.path.exists(manifest_path):
+                continue
+            with open(manifest_path, encoding='utf-8') as manifest_file:
+                if json.load(manifest_file)['status'] != 'finished':
+                    return run_id
+
+        return None
+
+    def write_manifest(self):
+        """
+        Writes the manifest atomically, so that a run interrupted while writing it can still be resumed
+        """
+
+        temporary_path = f"{self.manifest_path}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=2, default=str)
+        os.replace(temporary_path, self.manifest_path)
+
+    def is_completed(self, stage_key):
+        return stage_key in self.manifest['stages']
+
+    def complete(self, stage_key, frames=None, **info):
+        """
+        Marks a stage as completed, after having persisted its output DataFrames
+
+        :param stage_key: The key of the stage, for example 'navy_check.formatted'
+        :param frames: The output DataFrames of the stage by name, or None if the stage has no output to keep
+        :param info: Other JSON values to keep with the stage
+        """
+
+        frame_files = {}
+        for name, frame in (frames or {}).items():
+            frame_path = os.path.join(self.run_directory, f"{stage_key}.{name}.parquet")
+            if not self.write_frame(frame, frame_path, f"{stage_key}.{name}"):
+                # The stage is then done again on resume
+                return
+            frame_files[name] = frame_path
+
+        self.manifest['stages'][stage_key] = {'completed_at': datetime.now().isoformat(timespec='seconds'),
+                                              'frames': frame_files, **info}
+        self.write_manifest()
+
+    def write_frame(self, frame, frame_path, frame_key):
+        """
+        Writes a frame to Parquet. A frame which Arrow cannot convert, such as a column mixing numbers and texts, is
+        written coerced to the types of the table when the coercion loses no value, coercing it again being then
+        without effect when the stage is resumed
+
+        :param frame: The DataFrame to be written
+        :param frame_path: The path of the Parquet file
+        :param frame_key: The stage key and name of the frame, for the log
+        :return: bool: True if the frame has been written
+        """
+
+        try:
+            frame.to_parquet(frame_path)
+            return True
+        except (pa.ArrowException, ValueError, TypeError) as e:
+            self.logger.warning(f"The {frame_key} frame cannot be converted to Parquet, it is coerced to the types of "
+                                f"the {self.schema.table_name} table: {e}")
+
+        coerced, issues = self.schema.coerce(frame)
+        if issues['type']:
+            self.logger.warning(f"The {frame_key} frame is not kept in the checkpoint, the columns "
+                                f"{', '.join(issues['type'])} have values which cannot be coerced")
+        else:
+            try:
+                coerced.to_parquet(frame_path)
+                return True
+            except (pa.ArrowException, ValueError, TypeError) as e:
+                self.logger.warning(f"The {frame_key} frame is not kept in the checkpoint: {e}")
+
+        # A partly written file would be loaded on resume
+        if os.path.exists(frame_path):
+            os.remove(frame_path)
+        return False
+
+    def load(self, stage_key):
+        """
+        Loads the output of a completed stage
+
+        :param stage_key: The key of the stage
+        :return: tuple: The output DataFrames by name and the other values kept with the stage
+        """
+
+        stage = dict(self.manifest['stages'][stage_key])
+        frames = {name: pd.read_parquet(frame_path) for name, frame_path in stage.pop('frames').items()}
+        return frames, stage
+
+    def batches(self, key):
+        """
+        Returns the tracker of the batches applied by a write of the run
+
+        :param key: The key of the write, which must include the batch size
+        :return: BatchTracker: The tracker of the write
+        """
+
+        return BatchTracker(self, key)
+
+    def finish(self):
+        """
+        Marks the run as finished and removes its persisted frames, only the manifest is kept
+        """
+
+        self.manifest['status'] = 'finished'
+        self.write_manifest()
+
+        for file_name in os.listdir(self.run_directory):
+            if file_name.endswith('.parquet'):
+                os.remove(os.path.join(self.run_directory, file_name))
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+from benchmarks.run_benchmarks import compare_with_baseline, prepare_database, run_size
+from benchmarks.synthetic_extracts import generate_extract
+from src import DatabaseManager
+from src.extract_formatting import format_extract
+from src.lists_initialisation import navy_check_column_to_delete, histo_perfo_column_for_ID
+
+
+class TestSyntheticExtracts(unittest.TestCase):
+    def test_generated_extracts_are_formatted(self):
+        # The generated files have the columns of the real ones and give rows to every source
+        for df_type in ['histo_perfo', 'full_backlog_data', 'navy_check']:
+            df = generate_extract(df_type, 1000)
+            self.assertEqual(len(df), 1000)
+            self.assertFalse(format_extract(df, df_type).empty)
+
+        self.assertTrue(set(navy_check_column_to_delete) <= set(generate_extract('navy_check', 10).columns))
+        self.assertEqual(list(generate_extract('histo_perfo', 10).columns[:4]), histo_perfo_column_for_ID)
+
+    def test_same_seed_same_extract(self):
+        first = generate_extract('histo_perfo', 100, seed=1)
+        self.assertTrue(first.equals(generate_extract('histo_perfo', 100, seed=1)))
+
+    def test_sources_share_rows(self):
+        # Backlog starts within the Histo rows so that it updates part of them
+        histo_ids = set(format_extract(generate_extract('histo_perfo', 1000), 'histo_perfo')['ID'])
+        backlog_ids = set(format_extract(generate_extract('full_backlog_data', 1000), 'full_backlog_data')['ID'])
+        self.assertTrue(histo_ids & backlog_ids)
+        self.assertTrue(backlog_ids - histo_ids)
+
+
+class TestRunSize(unittest.TestCase):
+    def test_database_stages_on_sqlite(self):
+        # Every stage runs in-process on an embedded database, without writing the Excel files
+        with tempfile.TemporaryDirectory() as working_directory:
+            dbname = os.path.join(working_directory, 'benchmark.sqlite3')
+            prepare_database(dbname, backend='sqlite')
+            db_manager = DatabaseManager(dbname, declared_schema=True, backend='sqlite')
+
+            records = run_size(200, 0, db_manager, working_directory)
+            db_manager.engine.dispose()
+
+        self.assertEqual({record['status'] for record in records}, {'ok'})
+        self.assertIn(('navy_check', 'store_row_hashes'), {(record['source'], record['stage']) for record in records})
+
+
+class TestCompareWithBaseline(unittest.TestCase):
+    def test_regressions_flagged(self):
+        baseline = {'10000': {'navy_check.format_extract': 1.0, 'navy_check.detect_changes': 0.01}}
+        results = {'10000': {'navy_check.format_extract': 1.5, 'navy_check.detect_changes': 0.03,
+                             'navy_check.store_row_hashes': 2.0}}
+
+        # The short stage is within the noise and the new stage has no baseline
+        self.assertEqual(compare_with_baseline(results, baseline, 0.25, 0.05),
+                         [('10000', 'navy_check.format_extract', 1.0, 1.5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
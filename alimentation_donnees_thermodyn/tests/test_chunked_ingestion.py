@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+from src.chunked_ingestion import SeenIds, iter_formatted_chunks
+from src.extract_formatting import read_and_format_extract
+from src.extract_reader import iter_extract_chunks, read_extract
+
+
+class TestChunkedIngestion(unittest.TestCase):
+    def setUp(self):
+        # Navy Check extract with a duplicate ID in another chunk, a deleted column and a dd/mm/yyyy date
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.directory.name, 'Navy.xlsx')
+        pd.DataFrame({'PO': [439089107, 439089108, 439089109, 439089107, 439089110],
+                      'LINE_NUM': [67, 41, 1, 67, 2], 'RELEASE_NUM': [110, 151, 1, 110, 3],
+                      'DIST_PROJECT': ['SMP0390', '1PE0039', 'X', 'SMP0390', 'Y'],
+                      'CURR_VENDOR_NAME': ['CORREGE 916115', 'H ZOBEL SAS', 'X', 'OTHER', 'Y'],
+                      'MAX_RECEIVING_DATE': ['09/02/2022', '31/08/2023', None, '01/01/2024', '02/02/2024'],
+                      'FIRST_PO_APPROVED_DATE': ['2022-01-01'] * 5,
+                      'PO_REL_LINE_FIRST_APPRO_DATE': ['2022-01-01'] * 5,
+                      'PO_CURRENT_BUYER': ['x'] * 5}).to_excel(self.file_path, index=False)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_chunks_read_like_the_whole_file(self):
+        df, _ = read_extract(self.file_path, 'navy_check')
+        chunks = list(iter_extract_chunks(self.file_path, 'navy_check', chunk_size=2))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), df)
+
+    def test_duplicates_removed_across_chunks(self):
+        df_formatted, _ = read_and_format_extract(self.file_path, 'navy_check')
+        chunks = list(iter_formatted_chunks(self.file_path, 'navy_check', chunk_size=2))
+
+        # The duplicate of the first row is in the second chunk and is dropped, as with the whole file
+        self.assertEqual([rows_read for _, rows_read in chunks], [2, 2, 1])
+        df_chunked = pd.concat([chunk for chunk, _ in chunks])
+        self.assertEqual(list(df_chunked['ID']), list(df_formatted['ID']))
+        self.assertEqual(list(df_chunked['FOURNISSEUR']), list(df_formatted['FOURNISSEUR']))
+
+    def test_ids_independent_of_the_chunks(self):
+        # Release missing in the second chunk only, which reads its releases as floats
+        df = pd.read_excel(self.file_path)
+        df.loc[2, 'RELEASE_NUM'] = None
+        df.to_excel(self.file_path, index=False)
+
+        df_formatted, _ = read_and_format_extract(self.file_path, 'navy_check')
+        df_chunked = pd.concat([chunk for chunk, _ in iter_formatted_chunks(self.file_path, 'navy_check',
+                                                                             chunk_size=2)])
+
+        # The releases of the whole file are floats, whose text is kept in the IDs of the chunks without a missing
+        # release, and the duplicate of the first row keeps the same ID and is dropped
+        self.assertEqual(list(df_formatted['ID'])[:2], ['43908910767110.0SMP0390', '43908910841151.01PE0039'])
+        self.assertEqual(list(df_chunked['ID']), list(df_formatted['ID']))
+        self.assertEqual(len(df_chunked), 4)
+
+    def test_seen_ids(self):
+        seen_ids = SeenIds()
+
+        self.assertEqual(list(seen_ids.first_occurrences(pd.Series(['a', 'b', 'a']))), [True, True, False])
+        self.assertEqual(list(seen_ids.first_occurrences(pd.Series(['b', 'c']))), [False, True])
+        self.assertEqual(len(seen_ids), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import numpy as np
+import pandas as pd
+from src import build_composite_key, build_key_from_values, key_surrogate
+
+
+class TestCompositeKey(unittest.TestCase):
+    def setUp(self):
+        self.key_columns = ['PO', 'LINE', 'RELEASE', 'PROJECT_NUM']
+
+    def test_build_composite_key(self):
+        # Order number read as float because of a missing value, release mixing numbers and text
+        df = pd.DataFrame({'PO': [439089107.0, 439089107.0, np.nan], 'LINE': [67, 41, 1],
+                           'RELEASE': [110, 'A1', 2], 'PROJECT_NUM': ['SMP0390', None, 'X']}).dropna(subset=['PO'])
+
+        # Same ID as the concatenation of `astype(int).astype(str)` and `astype(str)`
+        expected = (df['PO'].astype(int).astype(str) + df['LINE'].astype(int).astype(str) +
+                    df['RELEASE'].astype(str) + df['PROJECT_NUM'].astype(str))
+
+        pd.testing.assert_series_equal(build_composite_key(df, self.key_columns), expected)
+
+    def test_float_release_text(self):
+        # A release read as float keeps its decimal in the ID, as in the IDs already in the database
+        df = pd.DataFrame({'PO': [439089107], 'LINE': [67], 'RELEASE': [110.0], 'PROJECT_NUM': ['SMP0390']})
+
+        self.assertEqual(list(build_composite_key(df, self.key_columns)), ['43908910767110.0SMP0390'])
+
+    def test_build_key_from_values(self):
+        values = {'NUMERO_COMMANDE': '439089107', 'LIGNE': '67', 'RELEASE': '110', 'NUMERO_PROJET': 'SMP0390',
+                  'FOURNISSEUR': 'CORREGE 916115'}
+
+        self.assertEqual(build_key_from_values(values), '43908910767110SMP0390')
+
+    def test_key_surrogate(self):
+        keys = pd.Series(['43908910767110SMP0390', '43908910741151SMP0390', '43908910767110SMP0390'])
+        surrogates = key_surrogate(keys)
+
+        self.assertEqual(surrogates.dtype, np.int64)
+        self.assertEqual(surrogates[0], surrogates[2])
+        self.assertNotEqual(surrogates[0], surrogates[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,14 @@
+import json
+import os
+import tempfile
 import unittest
+from decimal import Decimal
 import pandas as pd
 import sqlalchemy
 from sqlalchemy import create_engine, MetaData, Table, String, Column, Integer, delete
 from src import DatabaseManager
+from src.documents_schema import DocumentsSchema
+from src.run_checkpoint import RunCheckpoint
 
 
 class TestDatabaseManager(unittest.TestCase):
@@ -12,9 +18,18 @@ class TestDatabaseManager(unittest.TestCase):
         self.password = 'thermodyn'
         self.host = 'localhost'
         self.conn_string = f"postgresql+psycopg://{self.user}:{self.password}@{self.host}/{self.dbname}"
+        self.connection_options = {'dbname': self.dbname, 'user': self.user, 'password': self.password,
+                                   'host': self.host}
+
+        # The PostgreSQL tests need the server, the same tests run on SQLite without it
+        try:
+            with create_engine(self.conn_string).connect():
+                pass
+        except sqlalchemy.exc.OperationalError:
+            self.skipTest("PostgreSQL server not available")
 
         # Initializing a DatabaseManager instance for tests
-        self.db_manager = DatabaseManager(dbname=self.dbname, user=self.user, password=self.password, host=self.host)
+        self.db_manager = DatabaseManager(**self.connection_options)
 
         self.table_name = 'test'
 
@@ -37,7 +52,7 @@ class TestDatabaseManager(unittest.TestCase):
             with connection.begin() as transaction:
                 try:
                     # Prépare et exécute la requête SQL pour supprimer tous les enregistrements de la table test
-                    delete_query = sqlalchemy.text(f"DELETE FROM public.{self.table_name}")
+                    delete_query = sqlalchemy.text(f"DELETE FROM {self.table_name}")
                     connection.execute(delete_query)
                     # Validation de la transaction
                     transaction.commit()
@@ -73,6 +88,26 @@ class TestDatabaseManager(unittest.TestCase):
         for col in df.columns:
             self.assertTrue(all(result[col] == df[col]), f"Column '{col}' is different")
 
+    def test_dataframe_to_sql_copy(self):
+        # Creating a DataFrame from the provided data, with a missing value to check NULL handling
+        df = pd.DataFrame(self.data)
+        df.loc[1, 'CONSULTANT'] = None
+
+        # Convert both date columns to datetime for df
+        df['DATE_RECEPTION_MATERIEL'] = pd.to_datetime(df['DATE_RECEPTION_MATERIEL'])
+        df['DATE_OBTENTION_DOC'] = pd.to_datetime(df['DATE_OBTENTION_DOC'])
+
+        # Transfer the DataFrame with the COPY loader, one row per chunk to go through several chunks
+        self.db_manager.dataframe_to_sql(df, self.table_name, loader="copy", chunk_size=1)
+
+        # Checking if the data has been correctly added to the table
+        result = self.db_manager.select_from_table(self.table_name)
+        result['DATE_RECEPTION_MATERIEL'] = pd.to_datetime(result['DATE_RECEPTION_MATERIEL'])
+        result['DATE_OBTENTION_DOC'] = pd.to_datetime(result['DATE_OBTENTION_DOC'])
+
+        pd.testing.assert_frame_equal(result[df.columns].sort_values('ID').reset_index(drop=True),
+                                      df.sort_values('ID').reset_index(drop=True))
+
     def test_select_from_table(self):
         # Creating a DataFrame from the provided data
         df = pd.DataFrame(self.data)
@@ -98,6 +133,109 @@ class TestDatabaseManager(unittest.TestCase):
         for col in df.columns:
             self.assertTrue(all(result[col] == df[col]), f"Column '{col}' is different")
 
+    def test_select_from_table_arrow(self):
+        # Adding data to the table, with a missing value and an empty string to check the NULL handling
+        df = pd.DataFrame(self.data)
+        df.loc[0, 'FOURNISSEUR'] = 'CORREGE, 916115'
+        df.loc[1, 'CONSULTANT'] = None
+        df.loc[1, 'RELEASE'] = ''
+        df['DATE_RECEPTION_MATERIEL'] = pd.to_datetime(df['DATE_RECEPTION_MATERIEL'])
+        df['DATE_OBTENTION_DOC'] = pd.to_datetime(df['DATE_OBTENTION_DOC'])
+        df.to_sql(self.table_name, self.engine, index=False, if_exists='append')
+
+        # The Arrow reader returns the same rows as the ORM reader
+        expected = self.db_manager.select_from_table(self.table_name).sort_values('ID').reset_index(drop=True)
+        result = self.db_manager.select_from_table(self.table_name, reader="arrow").sort_values('ID').reset_index(
+            drop=True)
+        pd.testing.assert_frame_equal(result, expected)
+
+        # Projection of a single column
+        ids = self.db_manager.read_arrow_table(self.table_name, columns=['ID'])
+        self.assertEqual(ids.column_names, ['ID'])
+        self.assertEqual(sorted(ids.column('ID').to_pylist()), sorted(self.data['ID']))
+
+        # Filtered slice, by a value and by a list of values
+        result = self.db_manager.select_from_table(self.table_name, columns=['ID', 'CONSULTANT'],
+                                                   where={'CONSULTANT': 'Karen'}, reader="arrow")
+        self.assertEqual(result.to_dict('records'), [{'ID': '43908910767110', 'CONSULTANT': 'Karen'}])
+        result = self.db_manager.select_from_table(self.table_name, columns=['ID'],
+                                                   where={'LIGNE': [41, 99]}, reader="arrow")
+        self.assertEqual(result['ID'].tolist(), ['43908910741151'])
+
+        # Missing values are selected with None
+        result = self.db_manager.read_arrow_table(self.table_name, columns=['ID'], where={'CONSULTANT': None})
+        self.assertEqual(result.column('ID').to_pylist(), ['43908910741151'])
+
+        # The rows are streamed by batches of `batch_rows`
+        batches = list(self.db_manager.stream_record_batches(self.table_name, columns=['ID'], batch_rows=1))
+        self.assertEqual([batch.num_rows for batch in batches], [1, 1])
+
+    def test_select_existing_ids(self):
+        # Adding data to the table for testing purposes
+        df = pd.DataFrame(self.data)
+        df['DATE_RECEPTION_MATERIEL'] = pd.to_datetime(df['DATE_RECEPTION_MATERIEL'])
+        df['DATE_OBTENTION_DOC'] = pd.to_datetime(df['DATE_OBTENTION_DOC'])
+        df.to_sql(self.table_name, self.engine, index=False, if_exists='append')
+
+        # Incoming IDs with one existing ID, one new ID, one duplicate and one missing value
+        ids = pd.Series(['43908910767110', '43904538716391', '43904538716391', None])
+
+        # Only the IDs present in the table are returned
+        result = self.db_manager.select_existing_ids(ids, self.table_name)
+
+        self.assertEqual(result, {'43908910767110'})
+
+    def test_get_table(self):
+        # The table is reflected once, then taken from the cache until it is invalidated
+        table = self.db_manager.get_table(self.table_name)
+        self.assertIs(self.db_manager.get_table(self.table_name), table)
+
+        self.db_manager.invalidate_tables(self.table_name)
+        self.assertIsNot(self.db_manager.get_table(self.table_name), table)
+        self.assertEqual(self.db_manager.get_table(self.table_name).c.keys(), table.c.keys())
+
+    def test_declared_schema(self):
+        # The declared documents table has the columns and types of the reflected one
+        declared_manager = DatabaseManager(**self.connection_options, declared_schema=True)
+        declared_table = declared_manager.get_table('documents')
+        reflected_table = self.db_manager.get_table('documents')
+
+        self.assertEqual(declared_table.c.keys(), reflected_table.c.keys())
+        for column in reflected_table.c:
+            self.assertEqual(str(declared_table.c[column.name].type), str(column.type))
+            self.assertEqual(declared_table.c[column.name].primary_key, column.primary_key)
+
+    def test_detect_changes(self):
+        source = 'test_detect_changes'
+        df = pd.DataFrame(self.data)
+
+        try:
+            # First ingestion, every row is new
+            df_delta, row_hashes, counts = self.db_manager.detect_changes(df, source)
+            self.assertEqual(counts, {'new': 2, 'changed': 0, 'unchanged': 0, 'vanished': 0})
+            self.assertEqual(len(df_delta), 2)
+            self.db_manager.store_row_hashes(row_hashes, source)
+
+            # Second ingestion with one changed row, one unchanged row, one new row and one vanished row
+            df_next = pd.DataFrame(self.data)
+            df_next.loc[0, 'FOURNISSEUR'] = 'CORREGE'
+            df_next.loc[1, 'ID'] = '43904538716391'
+            df_next = pd.concat([df_next, pd.DataFrame(self.data).iloc[[1]]], ignore_index=True)
+
+            df_delta, row_hashes, counts = self.db_manager.detect_changes(df_next, source)
+            self.assertEqual(counts, {'new': 1, 'changed': 1, 'unchanged': 1, 'vanished': 0})
+            self.assertEqual(sorted(df_delta['ID']), ['43904538716391', '43908910767110'])
+            self.db_manager.store_row_hashes(row_hashes, source)
+
+            # Third ingestion without the first row, which has vanished
+            df_delta, _, counts = self.db_manager.detect_changes(df_next.iloc[1:], source)
+            self.assertEqual(counts, {'new': 0, 'changed': 0, 'unchanged': 2, 'vanished': 1})
+            self.assertTrue(df_delta.empty)
+        finally:
+            with self.engine.begin() as connection:
+                connection.execute(sqlalchemy.text('DELETE FROM ingestion_hashes WHERE "SOURCE" = :source'),
+                                   {'source': source})
+
     def test_concatenated_dataframes(self):
         # Sample data for DataFrame loaded from Excel
         df_excel_data = {'ID': ['43904538716391', '4390453872408'], 'CONSULTANT': ['Thomas', 'Estelle'],
@@ -187,6 +325,147 @@ class TestDatabaseManager(unittest.TestCase):
         pd.testing.assert_frame_equal(df_updated.sort_values('ID').reset_index(drop=True),
                                       expected_result.sort_values('ID').reset_index(drop=True))
 
+    def test_bulk_update_database_from_dataframe(self):
+        # Sample data for DataFrame loaded from Excel, with a missing value to check NaN handling
+        df_excel_data = {'ID': ['43904538716391', '43908910741151'], 'CONSULTANT': ['Thomas', None],
+                         'NUMERO_PROJET': ['1B60062', '-'], 'NUMERO_COMMANDE': [439080808, 439080815],
+                         'LIGNE': [87, 34], 'RELEASE': ['456', '812'], 'ORIGINE_DOC': ['Mail', 'ISPO'],
+                         'FOURNISSEUR': ['NUOVO PIGNONE SRL', 'CTA FRANCE SAS'],
+                         'DATE_RECEPTION_MATERIEL': ['2025-07-23', '2020-09-30'],
+                         'DATE_OBTENTION_DOC': ['2018-04-11', None]}
+        df_excel = pd.DataFrame(df_excel_data)
+        df_excel['DATE_RECEPTION_MATERIEL'] = pd.to_datetime(df_excel['DATE_RECEPTION_MATERIEL'])
+        df_excel['DATE_OBTENTION_DOC'] = pd.to_datetime(df_excel['DATE_OBTENTION_DOC'])
+
+        # Sample data for existing database table
+        df_result = pd.DataFrame(self.data)
+        df_result['DATE_RECEPTION_MATERIEL'] = pd.to_datetime(df_result['DATE_RECEPTION_MATERIEL'])
+        df_result['DATE_OBTENTION_DOC'] = pd.to_datetime(df_result['DATE_OBTENTION_DOC'])
+        df_result.to_sql(self.table_name, self.engine, index=False, if_exists='append')
+
+        # Call the method to be tested with one row per batch to go through several batches
+        self.db_manager.update_database_from_dataframe(df_excel, self.table_name, mode="bulk", batch_size=1)
+
+        df_updated = self.db_manager.select_from_table(self.table_name)
+        df_updated['DATE_RECEPTION_MATERIEL'] = pd.to_datetime(df_updated['DATE_RECEPTION_MATERIEL'])
+        df_updated['DATE_OBTENTION_DOC'] = pd.to_datetime(df_updated['DATE_OBTENTION_DOC'])
+
+        expected_result_data = {'ID': ['43908910767110', '43908910741151'], 'CONSULTANT': ['Karen', None],
+                                'NUMERO_PROJET': ['SMP0390', '-'], 'NUMERO_COMMANDE': [439089107, 439080815],
+                                'LIGNE': [67, 34], 'RELEASE': ['110', '812'], 'ORIGINE_DOC': ['ISP', 'ISPO'],
+                                'FOURNISSEUR': ['CORREGE 916115', 'CTA FRANCE SAS'],
+                                'DATE_RECEPTION_MATERIEL': ['2022-02-09', '2020-09-30'],
+                                'DATE_OBTENTION_DOC': ['2021-02-11', None]}
+        expected_result = pd.DataFrame(expected_result_data)
+        expected_result['DATE_RECEPTION_MATERIEL'] = pd.to_datetime(expected_result['DATE_RECEPTION_MATERIEL'])
+        expected_result['DATE_OBTENTION_DOC'] = pd.to_datetime(expected_result['DATE_OBTENTION_DOC'])
+
+        pd.testing.assert_frame_equal(df_updated.sort_values('ID').reset_index(drop=True),
+                                      expected_result.sort_values('ID').reset_index(drop=True))
+
+    def test_bulk_update_with_batch_tracker(self):
+        df_result = pd.DataFrame(self.data)
+        df_result['DATE_RECEPTION_MATERIEL'] = pd.to_datetime(df_result['DATE_RECEPTION_MATERIEL'])
+        df_result['DATE_OBTENTION_DOC'] = pd.to_datetime(df_result['DATE_OBTENTION_DOC'])
+        df_result.to_sql(self.table_name, self.engine, index=False, if_exists='append')
+
+        # The first batch was applied by a previous attempt of the run, so only the second one is applied again
+        df_update = pd.DataFrame({'ID': ['43908910767110', '43908910741151'], 'CONSULTANT': ['Elise', 'Elise']})
+        with tempfile.TemporaryDirectory() as checkpoint_directory:
+            batch_tracker = RunCheckpoint(checkpoint_directory).batches('test.update.1')
+            batch_tracker.mark_applied(1)
+
+            self.assertTrue(self.db_manager.update_database_from_dataframe(df_update, self.table_name, mode="bulk",
+                                                                           batch_size=1, batch_tracker=batch_tracker))
+            self.assertTrue(batch_tracker.is_applied(2))
+
+        df_updated = self.db_manager.select_from_table(self.table_name).sort_values('ID')
+        self.assertEqual(list(df_updated['CONSULTANT']), ['Elise', 'Karen'])
+
+    def test_validate_rows(self):
+        source = 'test_validate_rows'
+        df = pd.DataFrame(self.data)
+        df.loc[0, 'FOURNISSEUR'] = 'X' * 101
+        df.loc[1, 'DATE_OBTENTION_DOC'] = 'not a date'
+
+        try:
+            # Only the valid rows are returned, the invalid ones are recorded with their reasons and values
+            df_next = pd.concat([df, pd.DataFrame({'ID': ['43904538716391'], 'LIGNE': [87]})], ignore_index=True)
+            result = self.db_manager.validate_rows(df_next, source)
+            self.assertEqual(list(result['ID']), ['43904538716391'])
+
+            quarantined = pd.read_sql(sqlalchemy.text('SELECT * FROM ingestion_quarantine WHERE "SOURCE" = :source '
+                                                      'ORDER BY "ID"'), self.engine, params={'source': source})
+            self.assertEqual(list(quarantined['ID']), ['43908910741151', '43908910767110'])
+            self.assertEqual(list(quarantined['REASONS']), ["DATE_OBTENTION_DOC: not a valid date",
+                                                            "FOURNISSEUR: longer than 100 characters"])
+            self.assertEqual(json.loads(quarantined['ROW_DATA'][0])['DATE_OBTENTION_DOC'], 'not a date')
+        finally:
+            with self.engine.begin() as connection:
+                connection.execute(sqlalchemy.text('DELETE FROM ingestion_quarantine WHERE "SOURCE" = :source'),
+                                   {'source': source})
+
+    def test_arrow_reader_text_fallback(self):
+        # Numeric column, which has no Arrow type in `arrow_types` and is read as text
+        table = Table('test_arrow_numeric', MetaData(), Column('ID', String(25), primary_key=True),
+                      Column('AMOUNT', sqlalchemy.Numeric(10, 2)))
+        table.create(self.engine)
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(table.insert(), [{'ID': 'a', 'AMOUNT': Decimal('12.50')},
+                                                    {'ID': 'b', 'AMOUNT': None}])
+
+            result = self.db_manager.select_from_table('test_arrow_numeric', reader="arrow").sort_values('ID')
+            self.assertEqual(float(result['AMOUNT'].iloc[0]), 12.5)
+            self.assertIsNone(result['AMOUNT'].iloc[1])
+        finally:
+            table.drop(self.engine)
+
+    def test_ingestion_lock(self):
+        # A second run cannot take the lock while the first one holds it, and can once it is released
+        other_manager = DatabaseManager(**self.connection_options)
+        with self.db_manager.ingestion_lock() as acquired:
+            self.assertTrue(acquired)
+            with other_manager.ingestion_lock() as other_acquired:
+                self.assertFalse(other_acquired)
+        with other_manager.ingestion_lock() as other_acquired:
+            self.assertTrue(other_acquired)
+
+
+class TestDatabaseManagerSQLite(TestDatabaseManager):
+    """
+    Same tests on an embedded SQLite database, which needs no server
+    """
+
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.dbname = os.path.join(self.temporary_directory.name, 'cellule_doc.sqlite3')
+        self.conn_string = f"sqlite:///{self.dbname}"
+        self.connection_options = {'dbname': self.dbname, 'backend': 'sqlite'}
+
+        self.db_manager = DatabaseManager(**self.connection_options)
+
+        self.table_name = 'test'
+
+        self.data = {'ID': ['43908910767110', '43908910741151'], 'CONSULTANT': ['Karen', 'Aurélie'],
+                     'NUMERO_PROJET': ['SMP0390', '1PE0039'], 'NUMERO_COMMANDE': [439089107, 439089107],
+                     'LIGNE': [67, 41], 'RELEASE': ['110', '151'], 'ORIGINE_DOC': ['ISP', 'Mail'],
+                     'FOURNISSEUR': ['CORREGE 916115', 'H ZOBEL SAS'],
+                     'DATE_RECEPTION_MATERIEL': ['2022-02-09', '2023-08-31'],
+                     'DATE_OBTENTION_DOC': ['2021-02-11', '2023-07-15']}
+
+        # Creating the test and documents tables of the SQL script in the SQLite database
+        self.engine = create_engine(self.conn_string)
+        self.metadata = MetaData()
+        DocumentsSchema('test').to_table(self.metadata)
+        DocumentsSchema('documents').to_table(self.metadata)
+        self.metadata.create_all(bind=self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.db_manager.engine.dispose()
+        self.temporary_directory.cleanup()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+from src.documents_schema import DocumentsSchema
+
+
+class TestDocumentsSchema(unittest.TestCase):
+    def setUp(self):
+        self.schema = DocumentsSchema()
+
+    def test_columns_from_create_table(self):
+        # Types, lengths and primary key are read from SQL/create_table.sql
+        self.assertEqual(self.schema.primary_key, ['ID'])
+        self.assertEqual(self.schema.columns['ID'], {'type': 'varchar', 'length': 25, 'nullable': False})
+        self.assertEqual(self.schema.columns['NUMERO_COMMANDE']['type'], 'bigint')
+        self.assertEqual(self.schema.columns['LIGNE']['type'], 'integer')
+        self.assertEqual(self.schema.columns['HOROD_ATTENTE_DOC']['type'], 'date')
+        self.assertEqual(self.schema.columns['RELEASE']['length'], 5)
+
+    def test_unsupported_column(self):
+        # A column of a type which is not supported stops the reading of the script instead of being left out
+        with tempfile.TemporaryDirectory() as directory:
+            sql_path = os.path.join(directory, 'create_table.sql')
+            with open(sql_path, 'w', encoding='utf-8') as sql_file:
+                sql_file.write('CREATE TABLE public.notes\n(\n    "ID" character varying(25) NOT NULL,\n'
+                               '    "NOTE" text,\n    PRIMARY KEY ("ID")\n);\n')
+
+            with self.assertRaisesRegex(ValueError, 'NOTE'):
+                DocumentsSchema('notes', sql_path)
+
+    def test_coerce(self):
+        # Only the columns present are coerced, the others are left untouched
+        df = pd.DataFrame({'ID': ['43908910767110SMP0390', '43908910741151X'],
+                           'NUMERO_COMMANDE': ['439089107', 'not a number'], 'LIGNE': [67.0, None],
+                           'RELEASE': [110.0, None], 'FOURNISSEUR': ['CORREGE 916115', 'X' * 101],
+                           'HOROD_ATTENTE_DOC': ['2024-01-02', None],
+                           'DATE_RECEPTION_MATERIEL': pd.to_datetime(['2022-02-09 10:30', None]),
+                           'OTHER': [1, 2]})
+
+        result, issues = self.schema.coerce(df)
+
+        self.assertEqual(list(result['NUMERO_COMMANDE']), [439089107, pd.NA])
+        self.assertEqual(str(result['LIGNE'].dtype), 'Int64')
+        self.assertEqual(list(result['RELEASE']), ['110', None])
+        self.assertEqual(result['HOROD_ATTENTE_DOC'][0], pd.Timestamp('2024-01-02'))
+        self.assertEqual(result['DATE_RECEPTION_MATERIEL'][0], pd.Timestamp('2022-02-09'))
+        self.assertEqual(list(result['OTHER']), [1, 2])
+
+        # The value which cannot be converted and the text too long for its column are reported
+        self.assertEqual(list(issues['type']), ['NUMERO_COMMANDE'])
+        self.assertEqual(list(issues['type']['NUMERO_COMMANDE']), [1])
+        self.assertEqual(list(issues['length']['FOURNISSEUR']), [1])
+
+    def test_validate(self):
+        df = pd.DataFrame({'ID': ['A1', 'B2', 'A1', None, 'C3'],
+                           'NUMERO_COMMANDE': ['439089107', 'not a number', '1', '2', '3'],
+                           'FOURNISSEUR': ['CORREGE', 'X' * 101, 'CORREGE', 'ZOBEL', 'CTA'],
+                           'DATE_OBTENTION_DOC': ['2024-01-02', '2024-01-03', None, None, '2024-13-45']})
+
+        result, reasons = self.schema.validate(df)
+
+        # Every row is coerced, the reasons are only given for the invalid rows
+        self.assertEqual(len(result), len(df))
+        self.assertEqual(list(reasons.index), [1, 2, 3, 4])
+        self.assertEqual(reasons[1], "NUMERO_COMMANDE: not a valid bigint; FOURNISSEUR: longer than 100 characters")
+        self.assertEqual(reasons[2], "ID: duplicate")
+        self.assertEqual(reasons[3], "ID: missing")
+        self.assertEqual(reasons[4], "DATE_OBTENTION_DOC: not a valid date")
+
+    def test_validate_duplicated_index(self):
+        # Rows of two concatenated DataFrames, whose labels are repeated
+        df = pd.concat([pd.DataFrame({'ID': ['A1', 'B2'], 'LIGNE': ['1', 'x']}),
+                        pd.DataFrame({'ID': ['C3', 'D4'], 'LIGNE': ['3', '4']})])
+
+        result, reasons = self.schema.validate(df)
+
+        # Only the invalid row is reported, not the other row with the same label
+        self.assertEqual(list(result.index), [0, 1, 0, 1])
+        self.assertEqual(list(result['ID']), ['A1', 'B2', 'C3', 'D4'])
+        self.assertEqual(len(reasons), 1)
+        self.assertEqual(reasons.iloc[0], "LIGNE: not a valid integer")
+
+    def test_validate_valid_rows(self):
+        _, reasons = self.schema.validate(pd.DataFrame({'ID': ['A1', 'B2'], 'LIGNE': [1, 2]}))
+        self.assertTrue(reasons.empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
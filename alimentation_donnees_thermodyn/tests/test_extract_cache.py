@@ -0,0 +1,98 @@
+import os
+import tempfile
+import time
+import unittest
+import pandas as pd
+from src import ExtractCache, read_extract
+from src.lists_initialisation import read_specs
+
+
+class TestExtractCache(unittest.TestCase):
+    def setUp(self):
+        # Temporary directories for the Excel files and for the cache
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ExtractCache(os.path.join(self.temp_dir.name, 'cache'))
+
+        self.df = pd.DataFrame({'PO': [439089107, 439089108], 'VENDOR_NAME': ['CORREGE 916115', None],
+                                'ACTUAL_MAT_DELIVERY_DATE': pd.to_datetime(['2022-02-09', None])})
+        self.report = {'source': 'full_backlog_data', 'rows': 2, 'cache_hit': False}
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def create_file(self, file_name, content):
+        file_path = os.path.join(self.temp_dir.name, file_name)
+        with open(file_path, 'wb') as file:
+            file.write(content)
+        return file_path
+
+    def test_store_and_load(self):
+        file_path = self.create_file('Backlog.xlsx', b'first extract')
+
+        # Nothing is cached before the first store
+        self.assertEqual(self.cache.load(file_path, 'full_backlog_data'), (None, None))
+
+        self.assertTrue(self.cache.store(file_path, 'full_backlog_data', self.df, self.report))
+        df, report = self.cache.load(file_path, 'full_backlog_data')
+
+        pd.testing.assert_frame_equal(df, self.df)
+        self.assertEqual(report, self.report)
+
+        # The entry is keyed by the extraction type and by the file content
+        self.assertEqual(self.cache.load(file_path, 'navy_check'), (None, None))
+        with open(file_path, 'wb') as file:
+            file.write(b'second extract')
+        self.assertEqual(self.cache.load(file_path, 'full_backlog_data'), (None, None))
+
+    def test_evict_least_recently_used(self):
+        first_path = self.create_file('Backlog_1.xlsx', b'first extract')
+        second_path = self.create_file('Backlog_2.xlsx', b'second extract')
+
+        self.cache.store(first_path, 'full_backlog_data', self.df, self.report)
+        entry_size = sum(os.path.getsize(os.path.join(self.cache.cache_directory, file_name))
+                         for file_name in os.listdir(self.cache.cache_directory))
+
+        # The cache can only hold one entry, so storing the second one evicts the first one
+        self.cache.max_size = entry_size
+        time.sleep(0.01)
+        self.cache.store(second_path, 'full_backlog_data', self.df, self.report)
+
+        self.assertEqual(self.cache.load(first_path, 'full_backlog_data'), (None, None))
+        self.assertIsNotNone(self.cache.load(second_path, 'full_backlog_data')[0])
+
+    def test_keyed_by_read_specification(self):
+        file_path = self.create_file('Backlog.xlsx', b'first extract')
+        self.cache.store(file_path, 'full_backlog_data', self.df, self.report)
+
+        # A change of the read specification makes the entries parsed with the previous one unreachable
+        dtype = read_specs['full_backlog_data']['dtype']
+        read_specs['full_backlog_data']['dtype'] = {**dtype, 'PO': str}
+        try:
+            self.assertEqual(self.cache.load(file_path, 'full_backlog_data'), (None, None))
+        finally:
+            read_specs['full_backlog_data']['dtype'] = dtype
+        self.assertIsNotNone(self.cache.load(file_path, 'full_backlog_data')[0])
+
+    def test_file_hashed_once_per_read(self):
+        file_path = os.path.join(self.temp_dir.name, 'Backlog.xlsx')
+        pd.DataFrame({'PO': [439089107], 'VENDOR_NAME': ['CORREGE 916115']}).to_excel(file_path, index=False)
+
+        # Cache counting the fingerprints computed
+        fingerprints = []
+
+        class CountingCache(ExtractCache):
+            def fingerprint(self, file_path, block_size=1024 * 1024):
+                fingerprints.append(file_path)
+                return ExtractCache.fingerprint(file_path, block_size)
+
+        cache = CountingCache(self.cache.cache_directory)
+
+        # A cache miss looks up then stores the entry with the same fingerprint, then a hit only looks it up
+        self.assertFalse(read_extract(file_path, 'full_backlog_data', cache=cache)[1]['cache_hit'])
+        self.assertEqual(len(fingerprints), 1)
+        self.assertTrue(read_extract(file_path, 'full_backlog_data', cache=cache)[1]['cache_hit'])
+        self.assertEqual(len(fingerprints), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
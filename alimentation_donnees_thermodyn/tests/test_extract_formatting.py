@@ -0,0 +1,55 @@
+import datetime
+import unittest
+import pandas as pd
+from src.extract_formatting import format_extract
+
+
+class TestFormatExtract(unittest.TestCase):
+    def test_format_navy_check(self):
+        # Navy Check extract already read without its deleted columns, with a duplicate and a non approved line
+        df = pd.DataFrame({'PO': [439089107, 439089107, 439089107, None], 'LINE_NUM': [67, 67, 41, 1],
+                           'RELEASE_NUM': [110, 110, 151, 1], 'DIST_PROJECT': ['SMP0390', 'SMP0390', '1PE0039', 'X'],
+                           'CURR_VENDOR_NAME': ['CORREGE 916115', 'CORREGE 916115', 'H ZOBEL SAS', 'X'],
+                           'MAX_RECEIVING_DATE': pd.to_datetime(['2022-02-09', '2022-02-09', '2023-08-31', None]),
+                           'FIRST_PO_APPROVED_DATE': ['2022-01-01', '2022-01-01', None, '2022-01-01'],
+                           'PO_REL_LINE_FIRST_APPRO_DATE': ['2022-01-01', '2022-01-01', '2022-01-01', '2022-01-01']})
+
+        result = format_extract(df, 'navy_check')
+
+        self.assertEqual(list(result['ID']), ['43908910767110SMP0390'])
+        self.assertEqual(list(result['DATE_RECEPTION_MATERIEL']), [pd.Timestamp('2022-02-09')])
+        self.assertEqual(list(result['FOURNISSEUR']), ['CORREGE 916115'])
+        self.assertNotIn('FIRST_PO_APPROVED_DATE', result.columns)
+
+    def test_format_full_backlog_data(self):
+        # Lines without material reception are filtered out, the new lines are dated later with the database
+        df = pd.DataFrame({'PO': [439089107, 439089107], 'LINE': [67, 41], 'RELEASE': [110, 151],
+                           'PROJECT_NUM': ['SMP0390', '1PE0039'], 'VENDOR_NAME': ['CORREGE 916115', 'H ZOBEL SAS'],
+                           'ACTUAL_MAT_DELIVERY_DATE': pd.to_datetime(['2022-02-09', None])})
+
+        result = format_extract(df, 'full_backlog_data')
+
+        self.assertEqual(list(result['ID']), ['43908910767110SMP0390'])
+        self.assertNotIn('HOROD_ATTENTE_DOC', result.columns)
+
+    def test_format_histo_perfo_as_of(self):
+        # Histo extract of 2023, with a line approved ten days before the extract and one still in approval
+        df = pd.DataFrame({'PO_NUMBER': [439089107, 439089107], 'PO_LINE_NUMBER': [67, 41],
+                           'RELEASE_NUMBER': [110, 151], 'PO_JOB': ['SMP0390', '1PE0039'],
+                           'CURR_PO_SUPPLIER': ['CORREGE 916115', 'H ZOBEL SAS'], 'PO_LINE_DESCRIPTION': ['A', 'B'],
+                           'FIRST_MAT_DELIVERY_DATE': pd.to_datetime(['2023-02-01', None]),
+                           'FIRST_ISP': pd.to_datetime([None, None]), 'CURRENT_STATUS': ['APPROVED', 'In Approval'],
+                           'LAST_EDM_MANAGEMENT_DATE': pd.to_datetime(['2023-03-05', '2023-03-01'])})
+
+        # Formatted today, the approval is older than 14 days and the line is dropped
+        self.assertEqual(list(format_extract(df.copy(), 'histo_perfo')['ID']), ['439089107411511PE0039'])
+
+        # Formatted as of the extract date, the line is kept and validated on that date
+        result = format_extract(df.copy(), 'histo_perfo', as_of=datetime.date(2023, 3, 15))
+        self.assertEqual(list(result['ID']), ['439089107411511PE0039', '43908910767110SMP0390'])
+        self.assertEqual(list(result['HOROD_CONTROLE_VALIDE_SYSTEME'].isna()), [True, False])
+        self.assertEqual(result['HOROD_CONTROLE_VALIDE_SYSTEME'].iloc[1], pd.Timestamp('2023-03-15'))
+
+
+if __name__ == '__main__':
+    unittest.main()
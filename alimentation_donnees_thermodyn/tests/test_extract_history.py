@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+from datetime import date, datetime
+from src.extract_history import extract_date, find_historical_extracts
+
+
+class TestExtractHistory(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.folder = self.directory.name
+        self.folders_path = {'Histo': self.folder, 'Backlog': self.folder, 'Navy': self.folder}
+        self.file_types = {'Histo': 'histo_perfo', 'Backlog': 'full_backlog_data', 'Navy': 'navy_check'}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, modification_time=None):
+        path = os.path.join(self.folder, name)
+        with open(path, 'w') as extract_file:
+            extract_file.write('a')
+        if modification_time is not None:
+            timestamp = datetime.fromisoformat(modification_time).timestamp()
+            os.utime(path, (timestamp, timestamp))
+        return path
+
+    def test_extract_date(self):
+        self.assertEqual(extract_date(self.write('Backlog_2024-03-31.xlsx')), date(2024, 3, 31))
+        self.assertEqual(extract_date(self.write('Backlog_20240229.xlsx')), date(2024, 2, 29))
+        self.assertEqual(extract_date(self.write('Navy 31.01.2024.xlsx')), date(2024, 1, 31))
+
+        # Digits which are not a date, then the modification time without date in the name
+        self.assertEqual(extract_date(self.write('Histo_12345678_2024_01_15.xlsx')), date(2024, 1, 15))
+        self.assertEqual(extract_date(self.write('Histo_perfo.xlsx', '2023-12-01T10:00:00')), date(2023, 12, 1))
+
+    def test_replay_order(self):
+        self.write('Navy_2024-01-31.xlsx')
+        self.write('Backlog_2024-02-29.xlsx')
+        self.write('Backlog_2024-01-31.xlsx')
+        self.write('Histo_perfo_2024-01-31.xlsx')
+        self.write('Navy.xlsx', '2024-02-15T08:00:00')
+        # Lock file of Excel and file of no extraction type
+        self.write('~$Navy_2024-01-31.xlsx')
+        self.write('other_2024-01-31.xlsx')
+
+        extracts = find_historical_extracts(self.folders_path, self.file_types)
+        self.assertEqual([(extract_day, os.path.basename(path), df_type) for extract_day, path, df_type in extracts],
+                         [(date(2024, 1, 31), 'Histo_perfo_2024-01-31.xlsx', 'histo_perfo'),
+                          (date(2024, 1, 31), 'Backlog_2024-01-31.xlsx', 'full_backlog_data'),
+                          (date(2024, 1, 31), 'Navy_2024-01-31.xlsx', 'navy_check'),
+                          (date(2024, 2, 15), 'Navy.xlsx', 'navy_check'),
+                          (date(2024, 2, 29), 'Backlog_2024-02-29.xlsx', 'full_backlog_data')])
+
+    def test_date_range(self):
+        for day in ('2024-01-31', '2024-02-29', '2024-03-31'):
+            self.write(f'Backlog_{day}.xlsx')
+
+        extracts = find_historical_extracts(self.folders_path, self.file_types, since=date(2024, 2, 1),
+                                            until=date(2024, 3, 1))
+        self.assertEqual([extract_day for extract_day, _, _ in extracts], [date(2024, 2, 29)])
+
+    def test_missing_directory(self):
+        self.assertEqual(find_historical_extracts({'Histo': os.path.join(self.folder, 'missing')},
+                                                  {'Histo': 'histo_perfo'}), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
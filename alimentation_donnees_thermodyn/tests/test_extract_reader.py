@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+from src import read_extract
+from src.lists_initialisation import navy_check_column_to_delete, navy_check_column_for_ID
+
+
+class TestReadExtract(unittest.TestCase):
+    def setUp(self):
+        # Temporary directory holding the generated Excel file
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.temp_dir.name, 'Navy_check.xlsx')
+
+        # Navy Check extract with the ID columns, two kept columns and the columns to be deleted
+        self.data = {'PO': [439089107, 439089107], 'LINE_NUM': [67, 41], 'RELEASE_NUM': [110, 151],
+                     'DIST_PROJECT': ['SMP0390', '1PE0039'], 'CURR_VENDOR_NAME': ['CORREGE 916115', 'H ZOBEL SAS'],
+                     'MAX_RECEIVING_DATE': ['09/02/2022', '31/08/2023']}
+        df = pd.DataFrame(self.data)
+        for column in navy_check_column_to_delete:
+            df[column] = 'useless'
+        df.to_excel(self.file_path, index=False)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_read_extract(self):
+        df, report = read_extract(self.file_path, 'navy_check')
+
+        # The deleted columns are never read
+        self.assertEqual(list(df.columns), list(self.data))
+        self.assertEqual(report['columns_skipped'], len(navy_check_column_to_delete))
+        self.assertEqual(report['skipped_columns'], navy_check_column_to_delete)
+        self.assertGreater(report['estimated_bytes_skipped'], 0)
+
+        # The date column is parsed with its explicit format and the ID columns keep their inferred type
+        self.assertEqual(list(df['MAX_RECEIVING_DATE']), [pd.Timestamp('2022-02-09'), pd.Timestamp('2023-08-31')])
+        self.assertEqual(list(df[navy_check_column_for_ID[2]].astype(str)), ['110', '151'])
+
+
+if __name__ == '__main__':
+    unittest.main()
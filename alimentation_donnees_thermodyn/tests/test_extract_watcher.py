@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+from src.extract_watcher import ExtractWatcher
+
+
+class TestExtractWatcher(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.folder = self.directory.name
+        self.watcher = ExtractWatcher({'Histo': self.folder, 'Navy': self.folder},
+                                      {'Histo': 'histo_perfo', 'Navy': 'navy_check'}, settle_seconds=30)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, content):
+        with open(os.path.join(self.folder, name), 'w') as extract_file:
+            extract_file.write(content)
+
+    def test_file_reported_once_settled(self):
+        self.write('Histo_perfo.xlsx', 'a')
+        # Lock file of Excel and file of no extraction type
+        self.write('~$Histo_perfo.xlsx', 'a')
+        self.write('other.xlsx', 'a')
+
+        self.assertEqual(self.watcher.settled_files(now=0), [])
+        self.assertEqual(self.watcher.settled_files(now=29), [])
+        settled = self.watcher.settled_files(now=30)
+        self.assertEqual([(os.path.basename(path), df_type) for path, df_type, _, _ in settled],
+                         [('Histo_perfo.xlsx', 'histo_perfo')])
+
+    def test_debounce_restarts_when_the_file_changes(self):
+        self.write('Navy.xlsx', 'a')
+        self.watcher.settled_files(now=0)
+
+        # Still being written
+        self.write('Navy.xlsx', 'ab')
+        self.assertEqual(self.watcher.settled_files(now=31), [])
+        self.assertEqual(self.watcher.settled_files(now=60), [])
+        self.assertEqual(len(self.watcher.settled_files(now=61)), 1)
+
+    def test_directory_listed_again_when_it_changes(self):
+        self.watcher.settled_files(now=0)
+        self.assertEqual(self.watcher.listings[self.folder], [])
+
+        self.write('Histo_perfo.xlsx', 'a')
+        os.utime(self.folder, ns=(0, os.stat(self.folder).st_mtime_ns + 1))
+        self.watcher.settled_files(now=1)
+        self.assertEqual(len(self.watcher.listings[self.folder]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from src.ingestion_state import IngestionState
+from watch_extracts import mark_superseded_files, select_files_to_ingest
+
+
+class TestIngestionState(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.state = IngestionState(os.path.join(self.directory.name, 'state', 'state.sqlite3'), max_attempts=2)
+
+    def tearDown(self):
+        self.state.close()
+        self.directory.cleanup()
+
+    def test_ingested_file(self):
+        self.assertFalse(self.state.is_processed('/extracts/Navy.xlsx', 10, 1))
+        self.state.mark('/extracts/Navy.xlsx', 10, 1, 'navy_check', 'ingested')
+        self.assertTrue(self.state.is_processed('/extracts/Navy.xlsx', 10, 1))
+
+        # The same file overwritten with a new version is processed again
+        self.assertFalse(self.state.is_processed('/extracts/Navy.xlsx', 12, 2))
+
+    def test_failed_file_tried_again(self):
+        self.state.mark('/extracts/Navy.xlsx', 10, 1, 'navy_check', 'failed')
+        self.assertFalse(self.state.is_processed('/extracts/Navy.xlsx', 10, 1))
+        self.state.mark('/extracts/Navy.xlsx', 10, 1, 'navy_check', 'failed')
+        self.assertTrue(self.state.is_processed('/extracts/Navy.xlsx', 10, 1))
+
+    def test_select_files_to_ingest(self):
+        # Only the most recent Histo file is ingested, in the order of the extraction types
+        settled_files = [('/extracts/Navy.xlsx', 'navy_check', 10, 5),
+                         ('/extracts/Histo_1.xlsx', 'histo_perfo', 10, 1),
+                         ('/extracts/Histo_2.xlsx', 'histo_perfo', 10, 2)]
+
+        selected, older_files = select_files_to_ingest(settled_files, self.state)
+
+        self.assertEqual([file_path for file_path, _, _, _ in selected],
+                         ['/extracts/Histo_2.xlsx', '/extracts/Navy.xlsx'])
+        self.assertEqual(older_files, [('/extracts/Histo_1.xlsx', 'histo_perfo', 10, 1)])
+
+        # The older file is only superseded once the most recent one has been ingested
+        self.state.mark('/extracts/Histo_2.xlsx', 10, 2, 'histo_perfo', 'failed')
+        mark_superseded_files(older_files, self.state)
+        self.assertFalse(self.state.is_processed('/extracts/Histo_1.xlsx', 10, 1))
+
+        self.state.mark('/extracts/Histo_2.xlsx', 10, 2, 'histo_perfo', 'ingested')
+        mark_superseded_files(older_files, self.state)
+        self.assertTrue(self.state.is_processed('/extracts/Histo_1.xlsx', 10, 1))
+
+    def test_late_older_file_skipped(self):
+        self.state.mark('/extracts/Histo_2.xlsx', 10, 2, 'histo_perfo', 'ingested')
+
+        # A file older than the last one ingested is not ingested, even when it is the only new one
+        selected, older_files = select_files_to_ingest([('/extracts/Histo_1.xlsx', 'histo_perfo', 10, 1),
+                                                        ('/extracts/Navy.xlsx', 'navy_check', 10, 1)], self.state)
+
+        self.assertEqual([file_path for file_path, _, _, _ in selected], ['/extracts/Navy.xlsx'])
+        self.assertEqual([file_path for file_path, _, _, _ in older_files], ['/extracts/Histo_1.xlsx'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import glob
+import gzip
+import json
+import logging
+import os
+import tempfile
+import unittest
+from src.logging_setup import configure_logging, stop_logging, logging_state
+
+
+class TestLoggingSetup(unittest.TestCase):
+    def setUp(self):
+        # The logging of the other tests is stopped, then configured again by their next DatabaseManager
+        stop_logging()
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.log_directory = self.temporary_directory.name
+
+    def tearDown(self):
+        stop_logging()
+        self.temporary_directory.cleanup()
+
+    def test_configured_once(self):
+        # Configuring again does not add handlers, so each line is written once
+        logger = configure_logging(self.log_directory)
+        handler_count = len(logger.handlers)
+        self.assertIs(configure_logging(self.log_directory), logger)
+        self.assertEqual(len(logger.handlers), handler_count)
+
+        logger.info("only once")
+        logger.error("an error")
+        logger.debug("not written")
+        stop_logging()
+
+        info_lines = open(glob.glob(f'{self.log_directory}/INFO/*.log')[0], encoding='utf-8').read().splitlines()
+        error_lines = open(glob.glob(f'{self.log_directory}/ERROR/*.log')[0], encoding='utf-8').read().splitlines()
+        self.assertEqual(len(info_lines), 2)
+        self.assertTrue(info_lines[0].endswith("INFO - only once"))
+        self.assertEqual(len(error_lines), 1)
+
+    def test_debug_level(self):
+        logger = configure_logging(self.log_directory, level=logging.DEBUG)
+        logger.debug("debug record")
+        stop_logging()
+
+        self.assertIn("DEBUG - debug record", open(glob.glob(f'{self.log_directory}/INFO/*.log')[0],
+                                                   encoding='utf-8').read())
+
+    def test_json_format(self):
+        logger = configure_logging(self.log_directory, log_format="json")
+        logger.info("batch applied", extra={'batch': 3, 'rows': 10000})
+        stop_logging()
+
+        entry = json.loads(open(glob.glob(f'{self.log_directory}/INFO/*.log')[0], encoding='utf-8').readline())
+        self.assertEqual((entry['level'], entry['message'], entry['batch'], entry['rows']),
+                         ('INFO', "batch applied", 3, 10000))
+
+    def test_rotated_files_compressed(self):
+        logger = configure_logging(self.log_directory, max_bytes=200, backup_count=2)
+        for line in range(20):
+            logger.info(f"line {line}")
+        stop_logging()
+
+        # Only the last lines are kept, in the current file and in two compressed files
+        rotated_files = sorted(glob.glob(f'{self.log_directory}/INFO/*.log.*.gz'))
+        self.assertEqual(len(rotated_files), 2)
+        with gzip.open(rotated_files[0], 'rt', encoding='utf-8') as rotated_file:
+            self.assertIn("INFO - line", rotated_file.read())
+        self.assertFalse(glob.glob(f'{self.log_directory}/INFO/*.log.1'))
+
+    def test_stop_logging(self):
+        configure_logging(self.log_directory)
+        stop_logging()
+
+        self.assertIsNone(logging_state['listener'])
+        self.assertFalse([handler for handler in logging.getLogger('DataManager').handlers
+                          if isinstance(handler, logging.handlers.QueueHandler)])
+        self.assertTrue(os.path.isdir(f'{self.log_directory}/ERROR'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+import unittest
+from src.pipeline_metrics import PipelineMetrics, measure, reset_peak_memory
+
+
+class TestPipelineMetrics(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.prometheus_path = os.path.join(self.directory.name, 'etl.prom')
+        self.metrics = PipelineMetrics(metrics_directory=self.directory.name, prometheus_path=self.prometheus_path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_stage_written_as_json_line(self):
+        with self.metrics.stage("format_extract", "navy_check", rows_in=3) as stage:
+            stage['rows_out'] = 2
+
+        # A failing stage is recorded as well before the exception goes up
+        with self.assertRaises(ValueError):
+            with self.metrics.stage("detect_changes", "navy_check"):
+                raise ValueError
+
+        with open(self.metrics.metrics_path, encoding='utf-8') as metrics_file:
+            records = [json.loads(line) for line in metrics_file]
+
+        self.assertEqual([record['stage'] for record in records], ["format_extract", "detect_changes"])
+        self.assertEqual((records[0]['rows_in'], records[0]['rows_out'], records[0]['status']), (3, 2, 'ok'))
+        self.assertEqual(records[1]['status'], 'error')
+        self.assertGreaterEqual(records[0]['wall_seconds'], 0)
+        self.assertIn('cpu_seconds', records[0])
+        self.assertIn('peak_rss_bytes', records[0])
+
+    @unittest.skipUnless(reset_peak_memory(), "The peak memory of the process cannot be reset on this platform")
+    def test_peak_memory_per_stage(self):
+        with measure("outer") as outer:
+            with measure("heavy") as heavy:
+                data = b'x' * (200 * 1024 * 1024)
+                del data
+            with measure("light") as light:
+                pass
+
+        # The light stage does not report the peak of the heavy one before it, the enclosing stage does
+        self.assertGreater(heavy['peak_rss_bytes'], light['peak_rss_bytes'] + 150 * 1024 * 1024)
+        self.assertGreaterEqual(outer['peak_rss_bytes'], heavy['peak_rss_bytes'])
+        self.assertGreaterEqual(light['process_peak_rss_bytes'], heavy['peak_rss_bytes'])
+
+    def test_write_prometheus(self):
+        with self.metrics.stage("read_extract", "histo_perfo") as stage:
+            stage['rows_out'] = 50
+
+        self.assertTrue(self.metrics.write_prometheus())
+
+        with open(self.prometheus_path, encoding='utf-8') as textfile:
+            content = textfile.read()
+
+        self.assertIn('# TYPE thermodyn_etl_stage_wall_seconds gauge', content)
+        self.assertIn('thermodyn_etl_stage_rows_out{stage="read_extract",source="histo_perfo"} 50', content)
+        self.assertFalse(os.path.exists(f'{self.prometheus_path}.tmp'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+from src.run_checkpoint import RunCheckpoint
+
+
+class TestRunCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.files = [('/extracts/Histo.xlsx', 'histo_perfo'), ('/extracts/Navy.xlsx', 'navy_check')]
+        self.checkpoint = RunCheckpoint(self.directory.name, files=self.files, settings={'chunk_rows': None})
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_resume_from_completed_stages(self):
+        df = pd.DataFrame({'ID': ['43908910767110SMP0390'], 'LIGNE': pd.array([67], dtype='Int64'),
+                           'DATE_RECEPTION_MATERIEL': pd.to_datetime(['2022-02-09'])})
+        self.checkpoint.complete('histo_perfo.formatted', frames={'rows': df})
+        self.checkpoint.complete('histo_perfo.inserted')
+
+        # A new instance with the run ID reads the manifest written by the failed attempt
+        run_id = RunCheckpoint.latest_unfinished_run(self.directory.name)
+        self.assertEqual(run_id, self.checkpoint.run_id)
+        resumed = RunCheckpoint(self.directory.name, run_id)
+
+        self.assertEqual(resumed.files, self.files)
+        self.assertEqual(resumed.settings, {'chunk_rows': None})
+        self.assertTrue(resumed.is_completed('histo_perfo.inserted'))
+        self.assertFalse(resumed.is_completed('histo_perfo.updated'))
+        frames, _ = resumed.load('histo_perfo.formatted')
+        pd.testing.assert_frame_equal(frames['rows'], df)
+
+    def test_batches(self):
+        batch_tracker = self.checkpoint.batches('navy_check.update.10000')
+        batch_tracker.mark_applied(1)
+
+        resumed_tracker = RunCheckpoint(self.directory.name, self.checkpoint.run_id).batches('navy_check.update.10000')
+        self.assertTrue(resumed_tracker.is_applied(1))
+        self.assertFalse(resumed_tracker.is_applied(2))
+        # Batches of another size hold other rows
+        self.assertFalse(self.checkpoint.batches('navy_check.update.5000').is_applied(1))
+
+    def test_frame_coerced_to_the_table(self):
+        # Numbers and texts in the same column cannot be converted by Arrow as they are
+        df = pd.DataFrame({'ID': ['a', 'b'], 'LIGNE': [67, '68']})
+        with self.assertLogs('DataManager', level='WARNING'):
+            self.checkpoint.complete('histo_perfo.formatted', frames={'rows': df})
+
+        self.assertTrue(self.checkpoint.is_completed('histo_perfo.formatted'))
+        frames, _ = self.checkpoint.load('histo_perfo.formatted')
+        self.assertEqual(frames['rows']['LIGNE'].tolist(), [67, 68])
+
+    def test_frame_not_kept(self):
+        # The text cannot be coerced to an integer, the stage is then done again on resume
+        df = pd.DataFrame({'ID': ['a', 'b'], 'LIGNE': [67, 'x']})
+        with self.assertLogs('DataManager', level='WARNING') as logs:
+            self.checkpoint.complete('histo_perfo.formatted', frames={'rows': df})
+
+        self.assertIn('histo_perfo.formatted.rows', logs.output[-1])
+        self.assertFalse(self.checkpoint.is_completed('histo_perfo.formatted'))
+        self.assertEqual(os.listdir(self.checkpoint.run_directory), ['manifest.json'])
+
+    def test_finish(self):
+        self.checkpoint.complete('histo_perfo.formatted', frames={'rows': pd.DataFrame({'ID': ['a']})})
+        self.checkpoint.finish()
+
+        self.assertIsNone(RunCheckpoint.latest_unfinished_run(self.directory.name))
+        self.assertEqual(os.listdir(self.checkpoint.run_directory), ['manifest.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import argparse
+import signal
+import time
+import main
+from src import DatabaseManager, PipelineMetrics
+from src.extract_watcher import ExtractWatcher
+from src.ingestion_state import IngestionState
+
+# Time between two scans of the extract directories
+poll_interval = 10
+
+# Time during which an extract must not change before it is ingested, to let the export or the copy finish
+settle_seconds = 30
+
+# Local store of the extract files already processed
+state_path = "./state/ingestion_state.sqlite3"
+
+
+def select_files_to_ingest(settled_files, state):
+    """
+    Selects the settled extract files which have not been processed yet. Only the most recent file of each extraction
+    type is ingested, and only when it is more recent than the last file of its type already ingested, so that an
+    extract arriving late never overwrites newer data. Nothing is recorded here: the older files are marked as
+    superseded by `mark_superseded_files`, under the ingestion lock
+
+    :param settled_files: (file path, extraction type, size, modification time) tuples of `ExtractWatcher`
+    :param state: The IngestionState of the service
+
+    :return: tuple: The (file path, extraction type, size, modification time) tuples to be ingested, in the order of
+    `main.file_types`, and those of the older new files
+    """
+
+    new_files = [settled_file for settled_file in settled_files if not state.is_processed(settled_file[0],
+                                                                                           *settled_file[2:])]
+
+    # Most recent new file of each extraction type, if it is more recent than the last one ingested
+    most_recent_files = {}
+    older_files = []
+    for settled_file in sorted(new_files, key=lambda settled_file: settled_file[3]):
+        last_ingested_mtime = state.last_ingested_mtime(settled_file[1])
+        if last_ingested_mtime is not None and settled_file[3] < last_ingested_mtime:
+            older_files.append(settled_file)
+            continue
+
+        if settled_file[1] in most_recent_files:
+            older_files.append(most_recent_files[settled_file[1]])
+        most_recent_files[settled_file[1]] = settled_file
+
+    # Histo, then Backlog, then Navy, as in a full run
+    return ([most_recent_files[df_type] for df_type in main.file_types.values() if df_type in most_recent_files],
+            older_files)
+
+
+def mark_superseded_files(older_files, state):
+    """
+    Records as superseded the older files for which a more recent file of the same type has been ingested. The older
+    files of a type whose most recent file failed stay new, and are selected again once it is given up
+
+    :param older_files: The older files returned by `select_files_to_ingest`
+    :param state: The IngestionState of the service
+    """
+
+    for file_path, df_type, size, mtime_ns in older_files:
+        last_ingested_mtime = state.last_ingested_mtime(df_type)
+        if last_ingested_mtime is not None and mtime_ns < last_ingested_mtime:
+            state.mark(file_path, size, mtime_ns, df_type, 'superseded')
+
+
+def run_once(watcher, state, db_manager, workers, delta, chunk_rows=None):
+    """
+    Ingests the new extract files found by the watcher, if no other ingestion holds the lock
+
+    :param watcher: The ExtractWatcher of the service
+    :param state: The IngestionState of the service
+    :param db_manager: The DatabaseManager of the database
+    :param workers: The number of worker processes parsing the files
+    :param delta: Whether only the new and changed rows are written
+    :param chunk_rows: The number of rows read at once, or None to load each file at once
+
+    :return: int: The number of files ingested
+    """
+
+    files_to_ingest, older_files = select_files_to_ingest(watcher.settled_files(), state)
+    if not files_to_ingest and not older_files:
+        return 0
+
+    with db_manager.ingestion_lock() as acquired:
+        # The files stay new, so they are tried again at the next scan
+        if not acquired:
+            db_manager.logger.info("Another ingestion is running, the new extracts will be loaded later")
+            return 0
+
+        # Files older than the last ingested extract of their type, arrived late, are only recorded
+        if not files_to_ingest:
+            mark_superseded_files(older_files, state)
+            db_manager.logger.info(f"{len(older_files)} extracts older than the last ones ingested are skipped")
+            return 0
+
+        start_time = time.time()
+        metrics = PipelineMetrics(prometheus_path=main.metrics_textfile)
+
+        results = main.ingest_files(db_manager, metrics, [(file_path, df_type)
+                                                          for file_path, df_type, _, _ in files_to_ingest],
+                                    workers, delta, chunk_rows)
+
+        for file_path, df_type, size, mtime_ns in files_to_ingest:
+            state.mark(file_path, size, mtime_ns, df_type, 'ingested' if results[file_path] else 'failed')
+        mark_superseded_files(older_files, state)
+
+        execution_time = time.time() - start_time
+        metrics.record({'stage': 'run', 'source': None, 'wall_seconds': round(execution_time, 6)})
+        metrics.write_prometheus()
+        db_manager.logger.info(f"{sum(results.values())} of {len(results)} new extracts ingested in "
+                               f"{execution_time} secondes")
+
+    return sum(results.values())
+
+
+def watch(workers, delta, chunk_rows=None, once=False):
+    """
+    Watches the extract directories and ingests each new extract once it has finished being written, until the
+    service is stopped by SIGINT or SIGTERM
+
+    :param workers: The number of worker processes parsing the files
+    :param delta: Whether only the new and changed rows are written
+    :param chunk_rows: The number of rows read at once, or None to load each file at once
+    :param once: Whether to scan a single time, the files must then already be settled
+    """
+
+    db_manager = DatabaseManager(main.db_name, main.db_user, main.db_password, main.db_host,
+                                 declared_schema=main.declared_schema, backend=main.db_backend,
+                                 log_format=main.log_format)
+    watcher = ExtractWatcher(main.folders_path, main.file_types, 0 if once else settle_seconds)
+    state = IngestionState(state_path)
+
+    # The current scan and ingestion finish before the service stops
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.append(signum))
+
+    db_manager.logger.info(f"Watching {', '.join(dict.fromkeys(main.folders_path.values()))}")
+    try:
+        while not stopping:
+            try:
+                run_once(watcher, state, db_manager, workers, delta, chunk_rows)
+            except Exception as e:
+                # A failed scan does not stop the service, it is tried again at the next one
+                db_manager.logger.error(f"An error occurred while watching the extracts: {e}")
+
+            if once:
+                break
+
+            # Sleeps by steps of one second to stop quickly
+            for _ in range(poll_interval):
+                if stopping:
+                    break
+                time.sleep(1)
+    finally:
+        state.close()
+        db_manager.logger.info("Extract watching stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watches the extract directories and loads each new extract")
+    parser.add_argument("--workers", type=int, default=main.parse_workers,
+                        help="Number of worker processes parsing and formatting the extracts (1 to disable)")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="Rewrite every row of the extracts instead of the new and changed rows only")
+    parser.add_argument("--chunk-size", type=int, default=main.chunk_size,
+                        help="Stream each extract by chunks of this many rows instead of loading it at once")
+    parser.add_argument("--once", action="store_true", help="Scan the directories a single time and exit")
+    args = parser.parse_args()
+
+    watch(args.workers, main.delta_ingestion and not args.full_refresh, args.chunk_size, args.once)
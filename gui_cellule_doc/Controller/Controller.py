@@ -1,7 +1,12 @@
 import datetime
+import time
 from tkinter import filedialog
 import pandas as pd
 from Model.Model import Session, Documents
+from Model.Paginator import KeysetPaginator
+from Model.DocumentCache import DocumentCache
+from Model.CompositeKey import build_key_from_values
+from Controller.QueryExecutor import QueryExecutor
 from Model.ModelView import Thomas, Aurelie, Karen, Estelle, Elise, Elodie, Florent, Raphael, Null
 from Views.EditView import EditView
 from Views.MainView import MainView
@@ -20,6 +25,18 @@ views_dict = {
     "RAPHAEL": Raphael
 }
 
+# Number of documents read at once, the table reading the following ones as the user scrolls
+page_size = 500
+
+# The views and filters are computed on a local copy of the documents table, without querying the database
+use_document_cache = True
+
+# Minimum time between two checks that the local copy is still up to date, in seconds
+cache_revalidate_seconds = 10
+
+# Time after which the local copy is read again even if its signature is unchanged, when the signature is a heuristic
+cache_refetch_seconds = 300
+
 
 class Controller:
     def __init__(self):
@@ -27,8 +44,21 @@ class Controller:
         self.add_window = None
         self.session = Session()
         self.window = MainView(views_dict.keys(), controller=self)
-        self.items_id_map = {}
+        # Document ID of each item in view, kept up to date by the table as it is scrolled
+        self.items_id_map = self.window.table.items_id_map
+        # Paginator of the documents displayed, replaced by each refresh of the table
+        self.paginator = None
+        # The queries of the table run in worker threads, the window showing when some are running
+        self.executor = QueryExecutor(self.window, Session, on_busy=self.window.set_busy)
+        # Local copy of the documents table, loaded in the background, and the last time it was checked
+        self.cache = DocumentCache() if use_document_cache else None
+        self.cache_checked = None
+        # Displays again the documents shown from the local copy, when the copy changes
+        self.redisplay = None
+        # View, sort and filters of the documents displayed, to place the documents changed by the GUI in the table
+        self.displayed = None
         self.initialize_data()
+        self.revalidate_cache(force=True)
 
     def initialize_data(self):
         """
@@ -37,17 +67,8 @@ class Controller:
         table, while the ID is used to maintain correspondence with the interface elements.
         """
 
-        # Retrieve all records from the 'documents' table using the SQLAlchemy session
-        data = self.session.query(Documents).all()
-
-        # Extracts data from each document in preparation for insertion into the GUI
-        # documents is a list of lists, where each sub-list contains the values of a document
-        documents = [[getattr(p, col) for col in Documents.__table__.columns.keys()] for p in data]
-
-        for document in documents:
-            # Insertion of the project in the graphic table, omitting the ID from the displayed value
-            item = self.window.table.insert('', 'end', values=document[1:])
-            self.items_id_map[item] = document[0]
+        # The first page of the 'documents' table is displayed, the following ones are read as the user scrolls
+        self.refresh_table("Tous les documents")
 
     def retrieve_project_id(self, item):
         """
@@ -69,12 +90,13 @@ class Controller:
         :param doc_id: The identifier of the project to be updated, in string form
         :param new_values: A dictionary containing the names of the columns to be updated as keys,
                               and the new values for these columns as values
+        :return: list: The persisted row of the project, the ID first, or None if it has not been updated
         """
 
         # Check parameter types to avoid type or format errors
         if not isinstance(str(doc_id), str) or not isinstance(new_values, dict):
             print("The `doc_id` and/or `new_values` parameters are invalid")
-            return
+            return None
 
         try:
             # Search for the Document object corresponding to the ID supplied
@@ -89,7 +111,10 @@ class Controller:
 
                 # Save changes to the database
                 self.session.commit()
+                row = self.document_row(document)
+                self.patch_cache(str(doc_id), row)
                 print("The project has been successfully updated")
+                return row
             else:
                 print(f"Aucun projet trouvé avec l'ID {str(doc_id)}")
         except Exception as e:
@@ -97,32 +122,29 @@ class Controller:
             self.session.rollback()
             print(f"Erreur lors de la mise à jour du projet : {e}")
 
+        return None
+
     def add_data(self, new_values):
         """
         Adds a new project to the database using the values supplied in the dictionary, with a custom ID created by
-        concatenating certain fields
+        concatenating certain fields with `build_key_from_values`
 
         :param new_values: A dictionary containing the names of the columns as keys, and the values for these columns
         as values
+        :return: list: The persisted row of the new project, the ID first, or None if it has not been added
         """
 
         # Checking the parameter type to avoid type or format errors
         if not isinstance(new_values, dict):
             print("Le paramètre `new_values` est invalide")
-            return
+            return None
 
         try:
             # Create a new instance of the Document object
             new_document = Documents()
 
-            # Creation of personalised IDs from specific fields
-            id_parts = []
-            for field in ["NUMERO_COMMANDE", "LIGNE", "RELEASE", "NUMERO_PROJET"]:
-                part = new_values.get(field, '')
-                if part:  # Ensures that only non-empty fields are included
-                    id_parts.append(str(part))
-
-            custom_id = "".join(id_parts)
+            # Creation of personalised IDs from the order, line, release and project fields, as for the extracts
+            custom_id = build_key_from_values(new_values)
             if hasattr(new_document, 'ID'):
                 new_document.ID = custom_id
             else:
@@ -138,12 +160,28 @@ class Controller:
             # Add the new instance to the session and save it in the database
             self.session.add(new_document)
             self.session.commit()
+            row = self.document_row(new_document)
+            self.patch_cache(None, row)
             print("Le nouveau projet a été ajouté avec succès, ID:", custom_id)
+            return row
         except Exception as e:
             # Cancellation of changes in the event of an error
             self.session.rollback()
             print(f"Erreur lors de l'ajout du nouveau projet : {e}")
 
+        return None
+
+    @staticmethod
+    def document_row(document):
+        """
+        Returns a document as a row of the table, as read by the paginator and the local copy
+
+        :param document: The Documents object, as persisted
+        :return: list: The values of the columns, the ID first
+        """
+
+        return [getattr(document, column) for column in Documents.__table__.columns.keys()]
+
     def display_modification_form(self, doc_id, values, selected_view):
         """
         Displays a form window for modifying information on a specific document
@@ -177,27 +215,252 @@ class Controller:
         # This blocks interaction with the main window while the adding window is open
         self.add_window.grab_set()
 
-    def refresh_table(self, view_name="Tous les documents", data=None):
+    def refresh_table(self, view_name="Tous les documents", query=None, sort_column=None, descending=False,
+                      cached_filters=None):
         """
-        Refreshes the data displayed in the user interface table. This method retrieves the latest data from the
-        `documents` table in the database and updates the table display in the GUI interface
+        Refreshes the data displayed in the user interface table. When the local copy of the `documents` table is up
+        to date, the documents are selected in it at once. Otherwise this method retrieves the first page of the
+        latest data from the database in the background and updates the table display in the GUI interface once it
+        is ready. The following pages are read as the user scrolls, and the documents are counted separately. A
+        refresh supersedes the requests of the previous one which have not been displayed yet
 
         :param view_name: Refresh the table with the view selected by the user
-        :param data: This is the data to be searched for in the database
+        :param query: The query of the documents to be displayed, all the documents of the view by default
+        :param sort_column: The name of the column by which the documents are sorted, the ID alone by default
+        :param descending: Whether the sort column is sorted in descending order
+        :param cached_filters: The filters of `query` as functions of the `DocumentCache`, each one returning the mask
+        of the documents it keeps
         """
 
         # Retrieves the view class corresponding to the given name
         view_class = views_dict[view_name]
+        self.displayed = (view_class, sort_column, descending, cached_filters)
+
+        # The requests of the documents displayed until now are no longer needed
+        self.executor.cancel("page")
+        self.executor.cancel("count")
+
+        if self.cache is not None and self.cache.usable:
+            start_time = time.perf_counter()
+            self.executor.cancel("table")
+            self.paginator = None
+
+            # Selection of the documents in the local copy, by the same filters as the query
+            mask = self.cache.view_mask(view_class)
+            for cached_filter in cached_filters or []:
+                mask = mask & cached_filter(self.cache)
+            rows = self.cache.select(mask, sort_column, descending)
 
-        if data is None:
+            self.window.display_data(rows)
+            self.window.display_count(len(rows))
+            print(f"{view_name} depuis le cache : {(time.perf_counter() - start_time) * 1000:.0f} ms")
+
+            self.redisplay = lambda: self.refresh_table(view_name, query, sort_column, descending, cached_filters)
+            self.revalidate_cache()
+            return
+
+        self.redisplay = None
+        if query is None:
             # Query to obtain all entries in the `Documents` table in the database
-            data = self.session.query(view_class).all()
+            query = self.session.query(view_class)
+
+        paginator = KeysetPaginator(query, view_class, sort_column, descending, page_size)
+        self.paginator = paginator
+
+        self.executor.submit(f"Première page de {view_name}", paginator.next_page,
+                             lambda rows: self.display_first_page(view_name, paginator, rows), channel="table")
+
+    def display_first_page(self, view_name, paginator, rows):
+        """
+        Displays the first page of a refresh of the table, then counts its documents in the background
+
+        :param view_name: The view selected by the user
+        :param paginator: The paginator of the documents
+        :param rows: The rows of the first page
+        """
+
+        # Update data display in the main window with the first page, the next ones being requested by the table
+        self.window.display_data(rows, more_rows=None if paginator.complete
+                                 else lambda: self.load_next_page(paginator))
 
-        # Construction of a list of lists containing the field values for each document, ready for display
-        documents = [[getattr(p, col) for col in view_class.__table__.columns.keys()] for p in data]
+        # The total is only needed for the scrollbar and the counter, so it does not delay the first page
+        if paginator.complete:
+            self.window.display_count(len(rows))
+        else:
+            self.executor.submit(f"Comptage de {view_name}", paginator.count, self.window.display_count,
+                                 channel="count")
+
+    def load_next_page(self, paginator):
+        """
+        Reads the next page of the documents displayed in the background and adds it to the table
 
-        # Update data display in the main window
-        self.window.display_data(documents)
+        :param paginator: The paginator of the table when the page was requested
+        """
+
+        def append_page(rows):
+            # The table may have been refreshed with other documents since the page was requested
+            if paginator is self.paginator:
+                self.window.table.append_rows(rows, complete=paginator.complete)
+
+        def release_table(error):
+            # The page is requested again the next time the user scrolls near the end of the loaded rows
+            if paginator is self.paginator:
+                self.window.table.loading = False
+
+        self.executor.submit("Page suivante", paginator.next_page, append_page, channel="page", on_error=release_table)
+
+    def patch_table(self, previous_id, row):
+        """
+        Updates the table after a document has been modified or added by the GUI, by removing, replacing or inserting
+        its row alone instead of refreshing the whole view. The row is placed at its position in the order of the
+        documents displayed, and the scroll position and the selection are kept
+
+        :param previous_id: The ID of the modified document, None for a new document
+        :param row: The persisted row of the document, as returned by `modify_data` or `add_data`
+        """
+
+        if self.displayed is None:
+            return
+
+        view_class, sort_column, descending, cached_filters = self.displayed
+        table = self.window.table
+
+        removed = previous_id is not None and table.remove_row(previous_id)
+
+        # The document is displayed again only if it still belongs to the view and to its filters
+        inserted = False
+        if self.row_displayed(row, view_class, cached_filters):
+            index = self.row_position(table.rows, row, sort_column, descending)
+
+            # A row after the loaded pages will be read with its page
+            if index < len(table.rows) or table.more_rows is None:
+                table.insert_row(row, index)
+                inserted = True
+
+        # With pages left to read, the document may have been counted without being loaded, so the view is counted
+        # again by the database
+        if self.paginator is not None and table.more_rows is not None:
+            self.executor.submit("Comptage des documents", self.paginator.count, self.window.display_count,
+                                 channel="count")
+        else:
+            self.window.adjust_count(inserted - removed)
+
+    @staticmethod
+    def row_displayed(row, view_class, cached_filters):
+        """
+        Checks whether a row belongs to a view and to its filters, with the kernels of a copy holding only this row
+
+        :param row: The row of the document, the ID first
+        :param view_class: The table or view class displayed
+        :param cached_filters: The filters of the documents displayed, as given to `refresh_table`
+        :return: bool: Whether the row is displayed
+        """
+
+        single_row = DocumentCache.from_rows([row])
+        mask = single_row.view_mask(view_class)
+        for cached_filter in cached_filters or []:
+            mask = mask & cached_filter(single_row)
+        return bool(mask[0])
+
+    @staticmethod
+    def row_position(rows, row, sort_column=None, descending=False):
+        """
+        Finds the index of a row among rows sorted as by the `KeysetPaginator`: by the sort column with the missing
+        values last, then by ID
+
+        :param rows: The sorted rows
+        :param row: The row to be placed
+        :param sort_column: The name of the column by which the rows are sorted, the ID alone by default
+        :param descending: Whether the sort column is sorted in descending order
+        :return: int: The index at which the row is inserted
+        """
+
+        column_index = Documents.__table__.columns.keys().index(sort_column) if sort_column else None
+
+        def follows(other):
+            # Whether `other` comes after `row` in the order of the rows
+            if column_index is not None and other[column_index] != row[column_index]:
+                value, other_value = row[column_index], other[column_index]
+                if value is None or other_value is None:
+                    return other_value is None
+                return other_value < value if descending else other_value > value
+            return other[0] > row[0]
+
+        # Binary search of the first row following the new one
+        low, high = 0, len(rows)
+        while low < high:
+            middle = (low + high) // 2
+            if follows(rows[middle]):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def revalidate_cache(self, force=False, redisplay=True):
+        """
+        Checks in the background that the local copy of the `documents` table is up to date, by comparing the
+        signature of the table, and loads the table again if it has changed or if the signature is a heuristic and
+        the copy was read more than `cache_refetch_seconds` ago
+
+        :param force: Whether to check even if the copy was checked less than `cache_revalidate_seconds` ago
+        :param redisplay: Whether the documents displayed are selected again in the copy once it has been loaded again
+        """
+
+        if self.cache is None:
+            return
+
+        now = time.monotonic()
+        if not force and self.cache_checked is not None and now - self.cache_checked < cache_revalidate_seconds:
+            return
+        self.cache_checked = now
+
+        # A heuristic signature may miss a change, so the copy is also read again after some time
+        known_signature = self.cache.signature
+        fetched = self.cache.fetched
+        if not self.cache.exact and fetched is not None and now - fetched >= cache_refetch_seconds:
+            known_signature = None
+
+        self.executor.submit("Validation du cache des documents",
+                             lambda session: self.cache.fetch(session, known_signature),
+                             lambda snapshot: self.install_cache(snapshot, redisplay), channel="cache")
+
+    def install_cache(self, snapshot, redisplay=True):
+        """
+        Replaces the local copy of the `documents` table with the table loaded again, in the main loop
+
+        :param snapshot: The table read by `DocumentCache.fetch`, None when it had not changed
+        :param redisplay: Whether the documents displayed from the previous copy are selected again in the new one
+        """
+
+        if snapshot is None:
+            return
+
+        self.cache.install(snapshot)
+
+        # The documents displayed from the previous copy are selected again in the new one
+        if redisplay and self.redisplay is not None:
+            self.redisplay()
+
+    def patch_cache(self, previous_id, row):
+        """
+        Applies a change of a document by the GUI to the local copy, then loads the copy again in the background to
+        catch up with the other changes of the table, without displaying the documents again
+
+        :param previous_id: The ID of the modified document, None for a new document
+        :param row: The persisted row of the document
+        """
+
+        if self.cache is None:
+            return
+
+        # A copy being loaded may have been read before the change
+        self.executor.cancel("cache")
+        if self.cache.usable:
+            self.cache.patch(previous_id, row)
+            self.revalidate_cache(force=True, redisplay=False)
+        else:
+            self.cache.invalidate()
+            self.revalidate_cache(force=True)
 
     def search_bar(self, filter_value, view_name="Tous les documents"):
         """
@@ -215,22 +478,22 @@ class Controller:
         # Initialize the basic query on the document table
         query = self.session.query(view_class)
 
-        # Determines the type of filtering value and adjusts the query accordingly
+        # Determines the type of filtering value and adjusts the query, and the filter of the local copy, accordingly
         if filter_value.isdigit():
             # If the filter value is numeric, it is considered an order number
             query = query.filter(view_class.NUMERO_COMMANDE == int(filter_value))
+            cached_filter = lambda cache: cache.equals('NUMERO_COMMANDE', int(filter_value))
         elif any(char.isdigit() for char in filter_value):
             # If the value is alphanumeric, it is considered a project number
             query = query.filter(view_class.NUMERO_PROJET.contains(filter_value))
+            cached_filter = lambda cache: cache.contains('NUMERO_PROJET', filter_value)
         else:
             # If the value contains spaces or specific characters, consider it a supplier name
             query = query.filter(view_class.FOURNISSEUR.contains(filter_value))
+            cached_filter = lambda cache: cache.contains('FOURNISSEUR', filter_value)
 
-        # Execute query and retrieve filtered results
-        filtered_results = query.all()
-
-        # Update user interface with filtered data
-        self.refresh_table(view_name, filtered_results)
+        # Update user interface with the first page of the filtered data
+        self.refresh_table(view_name, query, cached_filters=[cached_filter])
 
     def get_statut_values(self):
         """
@@ -259,10 +522,10 @@ class Controller:
         view_class = views_dict[view_name]
 
         #  Filter data based on 'STATUT' according to the value specified.
-        filtered_data = self.session.query(view_class).filter_by(STATUT=filter_value).all()
+        query = self.session.query(view_class).filter_by(STATUT=filter_value)
 
         # Refreshes the table displayed in the user interface according to the selected view and filtered status data
-        self.refresh_table(view_name, filtered_data)
+        self.refresh_table(view_name, query, cached_filters=[lambda cache: cache.equals('STATUT', filter_value)])
 
     def filter_by_date(self, date_column=None, status_condition=None, reverse_sort=False, days_limit=None,
                        filter_empty_date=None, view_name="Tous les documents"):
@@ -283,12 +546,14 @@ class Controller:
         # Set the current date
         today = datetime.date.today()
 
-        # Initializes the query on the view class
+        # Initializes the query on the view class, and the same filters for the local copy
         query = self.session.query(view_class)
+        cached_filters = []
 
         # Applies a status filter if a condition is specified
         if status_condition:
             query = query.filter_by(STATUT=status_condition)
+            cached_filters.append(lambda cache: cache.equals('STATUT', status_condition))
 
         # Applies a filter based on the limit in days, if specified
         if days_limit is not None:
@@ -299,22 +564,18 @@ class Controller:
             date_filter = getattr(view_class, date_column) <= target_date if not reverse_sort else (
                     getattr(view_class, date_column) >= target_date)
             query = query.filter(date_filter)
+            cached_filters.append(lambda cache: cache.on_or_before(date_column, target_date) if not reverse_sort
+                                  else cache.on_or_after(date_column, target_date))
 
         # Filter to exclude records with an empty date, if specified
         if filter_empty_date:
             # Filters out records where the specified column is null
             query = query.filter(getattr(view_class, filter_empty_date).is_(None))
+            cached_filters.append(lambda cache: cache.is_null(filter_empty_date))
 
-        # Sorting by date if a date_column is specified for sorting
-        if date_column:
-            query = query.order_by(
-                getattr(view_class, date_column).desc() if reverse_sort else getattr(view_class, date_column))
-
-        # Executes the query and retrieves the filtered results
-        results = query.all()
-
-        # Refreshes the table with the results obtained
-        self.refresh_table(view_name, results)
+        # Refreshes the table with the results obtained, sorted by date if a date_column is specified for sorting
+        self.refresh_table(view_name, query, sort_column=date_column, descending=reverse_sort,
+                           cached_filters=cached_filters)
 
     def extract_data(self, view_name):
         """
@@ -326,14 +587,6 @@ class Controller:
         # Retrieves the view class corresponding to the given name
         view_class = views_dict[view_name]
 
-        # Query to obtain all entries in the selected view in the database
-        data = self.session.query(view_class).all()
-
-        # Construction of a list of lists containing the field values for each document, ready for display
-        documents = [[getattr(p, col) for col in view_class.__table__.columns.keys()] for p in data]
-
-        df = pd.DataFrame(documents)
-
         # Open the dialog box to save the file
         filename = filedialog.asksaveasfilename(
             defaultextension='.csv',
@@ -342,12 +595,24 @@ class Controller:
         )
 
         # Checks whether the user has cancelled the operation
-        if filename:
-            # Export data in CSV format (UTF8)
-            df.to_csv(filename, index=False, encoding='utf-8-sig')
-            print(f"Les données ont été exportées avec succès dans le fichier {filename}")
-        else:
+        if not filename:
             print("Export annulé.")
+            return
+
+        # All the entries of the selected view in the database, read page by page as lists of field values
+        paginator = KeysetPaginator(self.session.query(view_class), view_class, page_size=page_size)
+
+        def export(session):
+            documents = [row for page in iter(lambda: paginator.next_page(session), []) for row in page]
+
+            # Export data in CSV format (UTF8)
+            pd.DataFrame(documents).to_csv(filename, index=False, encoding='utf-8-sig')
+            return filename
+
+        # The view is read and written in the background, the table staying usable meanwhile
+        self.executor.submit(f"Export de {view_name}", export,
+                             lambda exported: print(f"Les données ont été exportées avec succès dans le fichier "
+                                                    f"{exported}"), channel="export")
 
     def run(self):
         """
@@ -358,3 +623,6 @@ class Controller:
 
         # Starts the window's main event loop
         self.window.mainloop()
+
+        # The queries still running are interrupted once the window is closed
+        self.executor.shutdown()
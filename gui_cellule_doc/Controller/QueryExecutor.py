@@ -0,0 +1,177 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class QueryExecutor:
+    def __init__(self, window, session_factory, max_workers=2, poll_interval=30, on_busy=None):
+        """
+        Runs the queries of the controller in worker threads, so that the Tk main loop never waits on the database.
+        Each query receives its own session, and its result is handed to its callback from the main loop by polling
+        with `after()`, since the Tk widgets can only be used from the main thread. A new request on a channel
+        supersedes the previous one: it is cancelled if it has not started, interrupted in the database if it is
+        running, and its result is dropped in any case
+
+        :param window: The Tk window whose main loop receives the results
+        :param session_factory: The sessionmaker giving a session to each query
+        :param max_workers: The number of queries run at the same time
+        :param poll_interval: The time between two checks of the finished queries, in milliseconds
+        :param on_busy: Function called with True when queries start running and False when none is left
+        """
+
+        self.window = window
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.on_busy = on_busy
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='query')
+
+        # Finished queries, put by the workers and read by the main loop
+        self.results = queue.SimpleQueue()
+
+        # Current request of each channel, and the requests not delivered yet
+        self.channels = {}
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.polling = False
+
+    def submit(self, name, function, callback, channel=None, on_error=None):
+        """
+        Runs a query in a worker thread, then calls its callback with the result from the main loop
+
+        :param name: The name of the request, used to report its timing
+        :param function: The function running the query, called with a session of its own
+        :param callback: The function called with the result of `function`, in the main loop
+        :param channel: The channel of the request, whose previous request is superseded, or None
+        :param on_error: The function called with the exception if the query fails, in the main loop, or None
+        :return: dict: The request, which can be given to `cancel`
+        """
+
+        if channel is not None:
+            self.cancel(channel)
+
+        request = {'name': name, 'callback': callback, 'on_error': on_error, 'channel': channel,
+                   'submitted': time.perf_counter(), 'cancelled': False, 'connection': None}
+        if channel is not None:
+            self.channels[channel] = request
+        self.pending.add(id(request))
+        request['future'] = self.executor.submit(self.run, request, function)
+
+        if not self.polling:
+            self.polling = True
+            if self.on_busy is not None:
+                self.on_busy(True)
+            self.window.after(self.poll_interval, self.poll)
+
+        return request
+
+    def run(self, request, function):
+        """
+        Runs the query of a request with a new session, in a worker thread
+
+        :param request: The request
+        :param function: The function running the query
+        """
+
+        started = time.perf_counter()
+        result = error = None
+        session = self.session_factory()
+        try:
+            # The connection is kept so that the query can be interrupted if the request is superseded
+            with self.lock:
+                cancelled = request['cancelled']
+                if not cancelled:
+                    request['connection'] = session.connection().connection.dbapi_connection
+
+            if not cancelled:
+                result = function(session)
+        except Exception as e:
+            error = e
+        finally:
+            with self.lock:
+                request['connection'] = None
+            session.close()
+
+        self.results.put((request, result, error, started, time.perf_counter()))
+
+    def cancel(self, channel):
+        """
+        Cancels the current request of a channel, if it has not been delivered yet
+
+        :param channel: The channel of the request
+        """
+
+        request = self.channels.pop(channel, None)
+        if request is None or request['cancelled']:
+            return
+
+        with self.lock:
+            request['cancelled'] = True
+
+            # A query already running is interrupted in the database: psycopg cancels it, sqlite3 interrupts it
+            connection = request['connection']
+            if connection is not None:
+                interrupt = getattr(connection, 'cancel', None) or getattr(connection, 'interrupt', None)
+                if interrupt is not None:
+                    try:
+                        interrupt()
+                    except Exception as e:
+                        logger.warning(f"Impossible d'interrompre la requête {request['name']} : {e}")
+
+        # A request which has not started is removed from the queue of the workers
+        if request['future'].cancel():
+            self.pending.discard(id(request))
+
+    def poll(self):
+        """
+        Delivers the finished requests to their callbacks, in the main loop, and polls again while requests remain
+        """
+
+        while True:
+            try:
+                request, result, error, started, finished = self.results.get_nowait()
+            except queue.Empty:
+                break
+
+            self.pending.discard(id(request))
+            if self.channels.get(request['channel']) is request:
+                del self.channels[request['channel']]
+
+            # The results of the superseded requests are dropped, even when they finished
+            if request['cancelled']:
+                logger.debug(f"{request['name']} : annulée après {(finished - started) * 1000:.0f} ms")
+                continue
+
+            logger.debug(f"{request['name']} : {(finished - started) * 1000:.0f} ms "
+                         f"(après {(started - request['submitted']) * 1000:.0f} ms d'attente)")
+            callback = request['callback']
+            if error is not None:
+                logger.error(f"Erreur lors de la requête {request['name']} : {error}", exc_info=error)
+                # The caller may have to undo what it did while waiting for the result, such as a loading state
+                callback, result = request['on_error'], error
+                if callback is None:
+                    continue
+
+            try:
+                callback(result)
+            except Exception as e:
+                logger.exception(f"Erreur lors de l'affichage du résultat de {request['name']} : {e}")
+
+        if self.pending:
+            self.window.after(self.poll_interval, self.poll)
+        else:
+            self.polling = False
+            if self.on_busy is not None:
+                self.on_busy(False)
+
+    def shutdown(self):
+        """
+        Cancels the requests which have not been delivered and stops the worker threads
+        """
+
+        for channel in list(self.channels):
+            self.cancel(channel)
+        self.executor.shutdown(wait=True, cancel_futures=True)
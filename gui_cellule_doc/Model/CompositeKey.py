@@ -0,0 +1,12 @@
+import importlib.util
+import os
+
+# The document IDs are built by the module of the extract loading package, loaded alone from its file
+composite_key_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..',
+                                  'alimentation_donnees_thermodyn', 'src', 'composite_key.py')
+
+spec = importlib.util.spec_from_file_location('thermodyn_composite_key', composite_key_path)
+composite_key = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(composite_key)
+
+build_key_from_values = composite_key.build_key_from_values
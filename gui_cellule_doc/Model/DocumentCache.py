@@ -0,0 +1,211 @@
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func, text, Date
+from Model.Model import Documents
+
+
+class DocumentCache:
+    def __init__(self):
+        """
+        Copy of the `documents` table held in memory as pandas columns, so that the views, filters and sorts of the
+        table are computed by vectorised kernels without querying the database. The copy is revalidated against a
+        signature of the table read by `read_signature`
+        """
+
+        # Rows as read from the database, the ID first, and the same values as columns for the kernels
+        self.rows = []
+        self.frame = None
+        self.signature = None
+        # Time at which the table was read, from `time.monotonic`
+        self.fetched = None
+
+        # Rank of each row in the order of the IDs, and the ranks of the values of the columns already sorted
+        self.id_rank = None
+        self.ranks = {}
+
+        # Set when the database has been changed by the GUI, until the copy is loaded again
+        self.stale = False
+
+    @property
+    def usable(self):
+        return self.frame is not None and not self.stale
+
+    @property
+    def exact(self):
+        return self.signature is not None and self.signature[0] == 'version'
+
+    @staticmethod
+    def read_signature(session):
+        """
+        Reads the signature of the `documents` table. It is the counter of the `documents_version` table, incremented
+        by a trigger on each statement changing the table, when the database has it. Otherwise the row count and, on
+        PostgreSQL, the highest transaction ID of the rows are only a heuristic: the transaction IDs wrap around, so an
+        update may not raise the highest one, and an update of a row with a delete of another keeps the row count
+
+        :param session: The session used to read it
+        :return: tuple: ('version', the counter), or ('heuristic', the row count, the highest transaction ID or None)
+        """
+
+        if session.get_bind().dialect.name == "postgresql":
+            if session.execute(text("SELECT to_regclass('public.documents_version')")).scalar() is not None:
+                return 'version', session.execute(text('SELECT "VERSION" FROM documents_version')).scalar()
+            return ('heuristic',
+                    *session.execute(text('SELECT count(*), max(xmin::text::bigint) FROM documents')).one())
+
+        return 'heuristic', session.execute(select(func.count()).select_from(Documents.__table__)).scalar(), None
+
+    def fetch(self, session, known_signature=None):
+        """
+        Reads the `documents` table if its signature differs from the known one. This method only reads, so that it
+        can run in a worker thread, the copy being replaced by `install` in the main thread
+
+        :param session: The session used to read the table
+        :param known_signature: The signature of the copy held, None to always read the table
+        :return: dict: The rows and the columns read with their signature, or None when the table has not changed
+        """
+
+        signature = self.read_signature(session)
+        if known_signature is not None and signature == known_signature:
+            return None
+
+        rows = [list(row) for row in session.execute(select(*Documents.__table__.columns))]
+        return {'rows': rows, 'frame': self.build_frame(rows), 'id_rank': self.rank_ids(rows), 'signature': signature,
+                'fetched': time.monotonic()}
+
+    @staticmethod
+    def build_frame(rows):
+        """
+        Builds the columns of the kernels from rows of the `documents` table
+
+        :param rows: The rows, each one a list of the values of the columns with the ID first
+        :return: pandas.DataFrame: The columns, with the dates as datetime64 columns where a missing date is NaT
+        """
+
+        columns = Documents.__table__.columns
+        frame = pd.DataFrame(rows, columns=columns.keys())
+        for column in columns:
+            if isinstance(column.type, Date):
+                frame[column.key] = pd.to_datetime(frame[column.key])
+
+        return frame
+
+    @staticmethod
+    def rank_ids(rows):
+        id_rank = np.empty(len(rows), dtype=np.int64)
+        id_rank[np.argsort(np.array([row[0] for row in rows], dtype=object), kind='stable')] = np.arange(len(rows))
+        return id_rank
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Builds a copy holding only the given rows, to apply the kernels to rows which are not in the local copy
+
+        :param rows: The rows, each one a list of the values of the columns with the ID first
+        :return: DocumentCache: The copy
+        """
+
+        cache = cls()
+        cache.install({'rows': rows, 'frame': cls.build_frame(rows), 'id_rank': cls.rank_ids(rows),
+                       'signature': None, 'fetched': None})
+        return cache
+
+    def install(self, snapshot):
+        """
+        Replaces the copy with the table read by `fetch`
+
+        :param snapshot: The result of `fetch`
+        """
+
+        self.rows, self.frame = snapshot['rows'], snapshot['frame']
+        self.id_rank, self.signature = snapshot['id_rank'], snapshot['signature']
+        self.fetched = snapshot['fetched']
+        self.ranks = {}
+        self.stale = False
+
+    def patch(self, previous_id, row):
+        """
+        Applies a change made by the GUI to the copy, without reading the table again. The signature is forgotten,
+        so that the next revalidation reads the table and its new signature
+
+        :param previous_id: The ID of the changed document, None for a new document
+        :param row: The persisted row of the document, the ID first
+        """
+
+        positions = np.flatnonzero(self.frame['ID'].to_numpy() == previous_id) if previous_id is not None else []
+        if len(positions):
+            self.rows[positions[0]] = row
+            self.frame.loc[positions[0]] = self.build_frame([row]).iloc[0]
+        else:
+            self.rows.append(row)
+            self.frame = pd.concat([self.frame, self.build_frame([row])], ignore_index=True)
+
+        self.id_rank = self.rank_ids(self.rows)
+        self.ranks = {}
+        self.signature = None
+
+    def invalidate(self):
+        """
+        Marks the copy as outdated, after a change of the table, until it is loaded again
+        """
+
+        self.stale = True
+        self.signature = None
+
+    def view_mask(self, view_class):
+        """
+        Selects the rows of a view, as defined in create_table.sql: the view of each consultant selects the documents,
+        the 'null' view the documents without consultant, and the `documents` table all of them
+
+        :param view_class: The table or view class
+        :return: numpy.ndarray: Whether each row is in the view
+        """
+
+        if view_class is Documents:
+            return np.ones(len(self.rows), dtype=bool)
+        if view_class.__tablename__ == 'null':
+            return self.is_null('CONSULTANT')
+        return self.equals('CONSULTANT', view_class.__tablename__)
+
+    def equals(self, column, value):
+        return (self.frame[column] == value).to_numpy()
+
+    def contains(self, column, value):
+        # Case-sensitive, like the SQL LIKE of `contains`, and False for the missing values
+        return self.frame[column].str.contains(value, regex=False, na=False).to_numpy(dtype=bool)
+
+    def is_null(self, column):
+        return self.frame[column].isna().to_numpy()
+
+    def on_or_before(self, column, day):
+        return (self.frame[column] <= pd.Timestamp(day)).to_numpy()
+
+    def on_or_after(self, column, day):
+        return (self.frame[column] >= pd.Timestamp(day)).to_numpy()
+
+    def select(self, mask, sort_column=None, descending=False):
+        """
+        Returns the rows selected by a mask, in the order of the `KeysetPaginator` of the database: by the sort column
+        with the missing values last, then by ID
+
+        :param mask: Whether each row is selected, combined from the kernels
+        :param sort_column: The name of the column by which the rows are sorted, the ID alone by default
+        :param descending: Whether the sort column is sorted in descending order
+        :return: list: The selected rows, each one a list of the values of the columns with the ID first
+        """
+
+        positions = np.flatnonzero(mask)
+
+        if sort_column is None:
+            order = np.argsort(self.id_rank[positions], kind='stable')
+        else:
+            if sort_column not in self.ranks:
+                self.ranks[sort_column] = self.frame[sort_column].rank(method='dense').to_numpy()
+            ranks = self.ranks[sort_column][positions]
+            missing = np.isnan(ranks)
+            keys = np.where(missing, 0, -ranks if descending else ranks)
+
+            # np.lexsort sorts by its last key first
+            order = np.lexsort((self.id_rank[positions], keys, missing))
+
+        return [self.rows[position] for position in positions[order]]
@@ -0,0 +1,102 @@
+from sqlalchemy import and_, or_
+
+
+class KeysetPaginator:
+    def __init__(self, query, view_class, sort_column=None, descending=False, page_size=500):
+        """
+        Reads the documents of a query page by page, by seeking past the (sort column, ID) key of the last row read
+        instead of using an offset, so that each page costs the same however far the user has scrolled. The rows are
+        read as tuples of columns rather than ORM objects
+
+        :param query: The query of the documents, with its filters
+        :param view_class: The table or view class queried
+        :param sort_column: The name of the column by which the documents are sorted, the ID alone by default
+        :param descending: Whether the sort column is sorted in descending order
+        :param page_size: The number of rows read at once
+        """
+
+        self.view_class = view_class
+        self.sort_column = getattr(view_class, sort_column) if sort_column else None
+        self.descending = descending
+        self.page_size = page_size
+
+        # All the columns of the view, the ID first as in the table of the GUI
+        self.columns = view_class.__table__.columns.keys()
+        self.query = query.order_by(None).with_entities(*[getattr(view_class, column) for column in self.columns])
+
+        # Key of the last row read, None before the first page
+        self.last_key = None
+        self.complete = False
+
+    def order_by(self):
+        """
+        Returns the order of the pages. The documents without a value in the sort column come last whatever the
+        direction, and the ID makes the order total so that no row is skipped or read twice
+
+        :return: list: The ORDER BY clauses
+        """
+
+        if self.sort_column is None:
+            return [self.view_class.ID]
+
+        sort_order = self.sort_column.desc() if self.descending else self.sort_column.asc()
+        return [sort_order.nulls_last(), self.view_class.ID]
+
+    def seek(self, last_value, last_id):
+        """
+        Builds the condition of the rows following a key in the order of the pages
+
+        :param last_value: The value of the sort column of the last row read
+        :param last_id: The ID of the last row read
+        :return: The SQLAlchemy condition
+        """
+
+        if self.sort_column is None:
+            return self.view_class.ID > last_id
+
+        if last_value is None:
+            # Only the rows without a value remain, ordered by ID
+            return and_(self.sort_column.is_(None), self.view_class.ID > last_id)
+
+        following_value = self.sort_column < last_value if self.descending else self.sort_column > last_value
+        return or_(following_value, and_(self.sort_column == last_value, self.view_class.ID > last_id),
+                   self.sort_column.is_(None))
+
+    def next_page(self, session=None):
+        """
+        Reads the rows following the last page read
+
+        :param session: The session used to read the page, another one than that of the query when reading from
+        another thread
+        :return: list: The rows, each one a list of the values of the columns with the ID first, empty once all the
+        rows have been read
+        """
+
+        if self.complete:
+            return []
+
+        query = self.query if session is None else self.query.with_session(session)
+        if self.last_key is not None:
+            query = query.filter(self.seek(*self.last_key))
+
+        rows = [list(row) for row in query.order_by(*self.order_by()).limit(self.page_size).all()]
+
+        # A page shorter than the page size is the last one
+        self.complete = len(rows) < self.page_size
+        if rows:
+            sort_value = rows[-1][self.columns.index(self.sort_column.key)] if self.sort_column is not None else None
+            self.last_key = (sort_value, rows[-1][self.columns.index('ID')])
+
+        return rows
+
+    def count(self, session=None):
+        """
+        Counts the rows of the query, all pages included
+
+        :param session: The session used to count, another one than that of the query when counting from another
+        thread
+        :return: int: The number of rows
+        """
+
+        query = self.query if session is None else self.query.with_session(session)
+        return query.order_by(None).count()
@@ -134,8 +134,11 @@ class AddView(ctk.CTkToplevel):
 
         if all_fields_valid:
             # Only proceed to add data if all required fields are valid
-            self.controller.add_data(new_values)
-            self.controller.refresh_table(self.view_name)
+            row = self.controller.add_data(new_values)
+
+            # Only the new document is inserted in the table, if it belongs to the documents displayed
+            if row is not None:
+                self.controller.patch_table(None, row)
             self.destroy()
         else:
             messagebox.showerror("Erreur de validation",
@@ -151,7 +151,7 @@ class EditView(ctk.CTkToplevel):
     def save_modification(self):
         """
         Collects modified values from the form entries and updates the corresponding record in the database.
-        After updating, it refreshes the table display and closes the modification form
+        After updating, it updates the row of the document in the table and closes the modification form
         """
 
         # Dictionary to store new values fetched from the form entries
@@ -185,10 +185,11 @@ class EditView(ctk.CTkToplevel):
                 new_values[db_column] = entry.get() if entry.get() != '' else None
 
         # Call the controller method to update the document data in the database using the collected new values
-        self.controller.modify_data(self.id_projet, new_values)
+        row = self.controller.modify_data(self.id_projet, new_values)
 
-        # Refresh the table in the main GUI to reflect the updated data
-        self.controller.refresh_table(self.view_name)
+        # Only the row of the document is updated in the table, which keeps its scroll position and selection
+        if row is not None:
+            self.controller.patch_table(self.id_projet, row)
 
         # Close the current modification window
         self.destroy()
@@ -1,5 +1,5 @@
-from tkinter import ttk
 import customtkinter as ctk
+from Views.VirtualTable import VirtualTable
 
 
 class MainView(ctk.CTk):
@@ -59,7 +59,8 @@ class MainView(ctk.CTk):
             "Date de l'attente de la documentation", "Date de l'attente de retour interne", "Ligne invalidable",
             )
 
-        self.table = ttk.Treeview(table_conteneur, columns=columns_name, show='headings')
+        # Only the rows in view are created as items, whatever the number of documents of the view
+        self.table = VirtualTable(table_conteneur, columns=columns_name)
 
         for col in columns_name:
             self.table.heading(col, text=col, anchor="center")
@@ -74,8 +75,7 @@ class MainView(ctk.CTk):
         # Creating and positioning the vertical scrollbar
         scrollbar_vertical = ctk.CTkScrollbar(table_conteneur, orientation="vertical")
         scrollbar_vertical.pack(side="right", fill="y")
-        self.table.configure(yscrollcommand=scrollbar_vertical.set)  # Link the scrollbar with the table view
-        scrollbar_vertical.configure(command=self.table.yview)  # Associate vertical view
+        self.table.attach_scrollbar(scrollbar_vertical)  # Link the scrollbar with the rows of the table
 
         self.table.pack(expand=True, fill='both')
 
@@ -95,6 +95,14 @@ class MainView(ctk.CTk):
                                                   fg_color="#18B281", hover_color="#10725F")  # pastel green
         self.filter_status_button.pack(side=ctk.LEFT, padx=10)
 
+        # Number of documents of the table, displayed once they have been counted
+        self.count_label = ctk.CTkLabel(control_panel, text="")
+        self.count_label.pack(side=ctk.LEFT, padx=20)
+        self.document_count = None
+
+        # Busy indicator, displayed while queries are running in the background
+        self.busy_indicator = ctk.CTkProgressBar(control_panel, mode="indeterminate", width=150)
+
         # Data extraction button
         self.extract_data_button = ctk.CTkButton(control_panel, text="Extraire les données", command=self.export_data,
                                                  fg_color="#4A90E2", hover_color="#357ABD")  # pastel blue
@@ -207,20 +215,54 @@ class MainView(ctk.CTk):
         # Pass the retrieved value to the search_bar method of the controller
         self.controller.search_bar(filter_value, get_views)
 
-    def display_data(self, data):
+    def display_data(self, data, more_rows=None):
+        """
+        Replaces the data of the table with new data. Only the rows in view are displayed, the table filling its items
+        again as the user scrolls
+
+        :param data: A list of tuples or lists where each item contains the ID followed by the fields to be displayed
+        in the table.
+        :param more_rows: Function requesting the following rows when `data` is only the first page, None otherwise
+        """
+
+        # The counter is cleared until the new documents have been counted
+        self.document_count = None
+        self.count_label.configure(text="")
+        self.table.set_rows(data, more_rows=more_rows)
+
+    def set_busy(self, busy):
+        """
+        Shows or hides the busy indicator, while queries are running in the background
+
+        :param busy: Whether queries are running
+        """
+
+        if busy:
+            self.busy_indicator.pack(side=ctk.LEFT, padx=10)
+            self.busy_indicator.start()
+            self.configure(cursor="watch")
+        else:
+            self.busy_indicator.stop()
+            self.busy_indicator.pack_forget()
+            self.configure(cursor="")
+
+    def display_count(self, total):
         """
-        Clears the current data in the table and updates it with new data.
+        Displays the number of documents of the table and sizes the scrollbar accordingly
 
-        :param data: A list of tuples or lists where each item contains the fields to be displayed in the table.
+        :param total: The number of documents
         """
 
-        # Remove all existing entries from the table
-        # This prevents duplication and ensures that the table reflects the current data state
-        for i in self.table.get_children():
-            self.table.delete(i)  # Delete old data
+        self.document_count = total
+        self.table.set_total(total)
+        self.count_label.configure(text=f"{total} documents")
+
+    def adjust_count(self, change):
+        """
+        Updates the number of documents displayed after documents have been added to or removed from the table
+
+        :param change: The number of documents added, negative when documents have been removed
+        """
 
-        # Insert new data into the table
-        for row_data in data:
-            # Insertion of the project in the graphic table, omitting the ID from the displayed value
-            item = self.table.insert('', 'end', values=row_data[1:])
-            self.controller.items_id_map[item] = row_data[0]
+        if change and self.document_count is not None:
+            self.display_count(self.document_count + change)
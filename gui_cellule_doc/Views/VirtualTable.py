@@ -0,0 +1,281 @@
+import tkinter.font
+from tkinter import ttk
+
+
+class VirtualTable(ttk.Treeview):
+    # Items created below the visible rows, so that a taller window shows rows before the pool is resized
+    buffer_rows = 5
+
+    def __init__(self, master, columns, **kwargs):
+        """
+        Treeview which only creates items for the rows in view. The rows are kept as lists, and a small pool of items
+        is filled with the rows at the scroll position each time the table is scrolled, so that displaying a view does
+        not depend on its number of rows. More rows can be requested as the user scrolls towards the end of the
+        loaded ones
+
+        :param master: The parent widget
+        :param columns: The names of the displayed columns
+        """
+
+        super().__init__(master, columns=columns, show='headings', selectmode='browse', **kwargs)
+
+        # Rows of the view, each one with the document ID first, and the number of rows of the view when it is known
+        # before all of them are loaded
+        self.rows = []
+        self.total_rows = 0
+        self.more_rows = None
+        self.loading = False
+
+        # Index of the row displayed by the first item, and the items of the pool
+        self.first_row = 0
+        self.pool = []
+        self.visible_rows = 1
+
+        # Document ID of each item of the pool, and the ID of the selected row, kept while it is scrolled out of view
+        self.items_id_map = {}
+        self.selected_id = None
+
+        # Height of a row and of the headings, measured once the first item is displayed
+        self.row_height = tkinter.font.nametofont('TkDefaultFont').metrics('linespace') + 4
+        self.heading_height = self.row_height + 4
+
+        self.scroll_callback = None
+
+        self.bind("<Configure>", lambda event: self.render())
+        self.bind("<<TreeviewSelect>>", self.on_select)
+        self.bind("<MouseWheel>", lambda event: self.scroll_rows(-3 if event.delta > 0 else 3))
+        self.bind("<Button-4>", lambda event: self.scroll_rows(-3))
+        self.bind("<Button-5>", lambda event: self.scroll_rows(3))
+        self.bind("<Up>", lambda event: self.move_selection(-1))
+        self.bind("<Down>", lambda event: self.move_selection(1))
+        self.bind("<Prior>", lambda event: self.move_selection(-self.visible_rows))
+        self.bind("<Next>", lambda event: self.move_selection(self.visible_rows))
+
+    def attach_scrollbar(self, scrollbar):
+        """
+        Links a vertical scrollbar to the rows of the table instead of the items of the Treeview
+
+        :param scrollbar: The vertical scrollbar
+        """
+
+        self.scroll_callback = scrollbar.set
+        scrollbar.configure(command=self.yview)
+
+    def set_rows(self, rows, total=None, more_rows=None):
+        """
+        Replaces the rows of the table and scrolls back to the first one
+
+        :param rows: The rows loaded, each one a list with the document ID first and the displayed values
+        :param total: The number of rows of the view, when more rows than `rows` will be loaded
+        :param more_rows: Function called without argument when the user scrolls near the end of the loaded rows,
+        which requests the following rows and passes them to `append_rows`. None when all the rows are loaded
+        """
+
+        self.rows = list(rows)
+        self.total_rows = total if total is not None else len(self.rows)
+        self.more_rows = more_rows
+        self.loading = False
+        self.first_row = 0
+        self.selected_id = None
+        self.render()
+
+    def append_rows(self, rows, complete=False):
+        """
+        Adds the rows requested by `more_rows` after the loaded ones
+
+        :param rows: The following rows of the view
+        :param complete: Whether these are the last rows of the view
+        """
+
+        self.rows.extend(rows)
+        self.total_rows = max(self.total_rows, len(self.rows))
+        self.loading = False
+        if complete or not rows:
+            self.more_rows = None
+            self.total_rows = len(self.rows)
+        self.render()
+
+    def row_index(self, doc_id):
+        """
+        Finds a loaded row by its document ID
+
+        :param doc_id: The ID of the document
+        :return: int: The index of the row, None if it is not loaded
+        """
+
+        return next((index for index, row in enumerate(self.rows) if row[0] == doc_id), None)
+
+    def remove_row(self, doc_id):
+        """
+        Removes the row of a document, keeping the rows in view and the selection
+
+        :param doc_id: The ID of the document
+        :return: bool: True if the row was loaded and has been removed
+        """
+
+        index = self.row_index(doc_id)
+        if index is None:
+            return False
+
+        del self.rows[index]
+        self.total_rows = max(len(self.rows), self.total_rows - 1)
+        if index < self.first_row:
+            self.first_row -= 1
+        self.render()
+        return True
+
+    def insert_row(self, row, index):
+        """
+        Inserts the row of a document, keeping the rows in view and the selection
+
+        :param row: The row, a list with the document ID first and the displayed values
+        :param index: The index of the row among the loaded rows
+        """
+
+        self.rows.insert(index, row)
+        self.total_rows += 1
+        if index < self.first_row:
+            self.first_row += 1
+        self.render()
+
+    def set_total(self, total):
+        """
+        Sets the number of rows of the view, once it has been counted
+
+        :param total: The number of rows of the view
+        """
+
+        self.total_rows = max(total, len(self.rows))
+        self.update_scrollbar()
+
+    def measure_rows(self):
+        # The displayed rows give the actual height of a row and of the headings in the current theme
+        if self.pool:
+            bbox = self.bbox(self.pool[0])
+            if bbox:
+                self.heading_height, self.row_height = bbox[1], bbox[3]
+
+        height = self.winfo_height() - self.heading_height
+        self.visible_rows = max(1, height // max(1, self.row_height))
+
+    def render(self):
+        """
+        Fills the pool of items with the rows at the scroll position, creating or deleting items only when the number
+        of rows in view changes
+        """
+
+        self.measure_rows()
+        self.first_row = max(0, min(self.first_row, self.total_rows - self.visible_rows))
+
+        # Rows displayed by the pool, fewer at the end of the view
+        displayed_rows = self.rows[self.first_row:self.first_row + self.visible_rows + self.buffer_rows]
+
+        while len(self.pool) < len(displayed_rows):
+            self.pool.append(self.insert('', 'end'))
+        while len(self.pool) > len(displayed_rows):
+            item = self.pool.pop()
+            self.items_id_map.pop(item, None)
+            self.delete(item)
+
+        selected_item = None
+        for item, row in zip(self.pool, displayed_rows):
+            # Display of the document, omitting the ID from the displayed values
+            self.item(item, values=row[1:])
+            self.items_id_map[item] = row[0]
+            if row[0] == self.selected_id:
+                selected_item = item
+
+        # The selection follows its row rather than its item
+        if selected_item is not None:
+            if self.selection() != (selected_item,):
+                self.selection_set(selected_item)
+                self.focus(selected_item)
+        elif self.selection():
+            self.selection_remove(*self.selection())
+
+        # The pool always starts at the top of the Treeview, the scrolling being done by changing its values
+        self.tk.call(self._w, 'yview', 'moveto', 0)
+        self.update_scrollbar()
+
+        # More rows are requested before the end of the loaded ones is reached
+        if (self.more_rows is not None and not self.loading
+                and self.first_row + self.visible_rows + self.buffer_rows >= len(self.rows)):
+            self.loading = True
+            self.more_rows()
+
+    def update_scrollbar(self):
+        if self.scroll_callback is None:
+            return
+
+        if self.total_rows:
+            self.scroll_callback(self.first_row / self.total_rows,
+                                 min(1, (self.first_row + self.visible_rows) / self.total_rows))
+        else:
+            self.scroll_callback(0, 1)
+
+    def scroll_rows(self, count):
+        """
+        Scrolls the table by a number of rows
+
+        :param count: The number of rows, negative to scroll up
+        :return: str: 'break', so that the Treeview does not scroll its items itself
+        """
+
+        self.first_row += count
+        self.render()
+        return 'break'
+
+    def yview(self, *args):
+        """
+        Scrolls the rows as requested by the scrollbar, with the arguments of `Treeview.yview`
+
+        :return: tuple: The first and last fractions of the rows in view, without arguments
+        """
+
+        if not args:
+            if not self.total_rows:
+                return 0.0, 1.0
+            return self.first_row / self.total_rows, min(1, (self.first_row + self.visible_rows) / self.total_rows)
+
+        if args[0] == 'moveto':
+            self.first_row = int(float(args[1]) * self.total_rows)
+            self.render()
+        elif args[0] == 'scroll':
+            # Scrolls by at least one unit, the scrollbars may send fractions of a unit
+            amount = float(args[1])
+            amount = int(amount) or (1 if amount > 0 else -1)
+            self.scroll_rows(amount * self.visible_rows if args[2] == 'pages' else amount)
+
+    def on_select(self, event=None):
+        # An empty selection is only a change when the selected row is in view, otherwise its item has been reused
+        selection = self.selection()
+        if selection:
+            self.selected_id = self.items_id_map.get(selection[0])
+        elif self.selected_id in self.items_id_map.values():
+            self.selected_id = None
+
+    def move_selection(self, count):
+        """
+        Selects the row a number of rows away from the selected one, scrolling to keep it in view
+
+        :param count: The number of rows, negative to move up
+        :return: str: 'break', so that the Treeview does not move its focus itself
+        """
+
+        if not self.rows:
+            return 'break'
+
+        row_ids = [row[0] for row in self.rows[self.first_row:self.first_row + len(self.pool)]]
+        if self.selected_id in row_ids:
+            row_index = self.first_row + row_ids.index(self.selected_id) + count
+        else:
+            row_index = self.first_row
+        row_index = max(0, min(row_index, len(self.rows) - 1))
+
+        self.selected_id = self.rows[row_index][0]
+        if row_index < self.first_row:
+            self.first_row = row_index
+        elif row_index >= self.first_row + self.visible_rows:
+            self.first_row = row_index - self.visible_rows + 1
+        self.render()
+        return 'break'